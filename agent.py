@@ -0,0 +1,454 @@
+"""
+Unlock agent: keeps the vault unlocked in one process and serves it over
+a local Unix socket, similar to ssh-agent
+
+Protocol: one JSON object per line in each direction. Requests name an
+"op" plus its parameters; replies are {"ok": true, "result": ...} or
+{"ok": false, "error": "...", "locked": bool}.
+
+The socket lives in a directory only the owner can enter, so only the
+owner's processes can talk to the agent. Both ends check the directory
+before using it: under /tmp another user could have created it first and
+be listening for master passwords.
+"""
+
+import json
+import os
+import socket
+import stat
+import sys
+
+SOCKET_ENV = "SECUREPASS_AGENT_SOCK"
+
+# asyncio has no Unix socket server on Windows
+AGENT_SUPPORTED = hasattr(socket, "AF_UNIX") and sys.platform != "win32"
+
+# Operations answered while the agent is locked
+LOCKED_OPS = ("status", "unlock", "stop")
+
+# Longest request line accepted, bounds memory per connection
+MAX_REQUEST_SIZE = 1024 * 1024
+
+
+class AgentError(Exception):
+    """Error reply from the agent"""
+
+    def __init__(self, message, locked=False):
+        super().__init__(message)
+        self.locked = locked
+
+
+def default_socket_path():
+    """
+    Get the agent socket path for the current user
+    """
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime_dir:
+        import tempfile
+        runtime_dir = tempfile.gettempdir()
+    return os.path.join(runtime_dir, f"securepass-{os.getuid()}", "agent.sock")
+
+
+def check_socket_dir(directory):
+    """
+    Make sure the socket directory is private to the current user
+
+    Raises:
+        OSError: If the directory does not exist
+        AgentError: If it is not a real directory owned by the current
+            user with mode 0700
+    """
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise AgentError(f"Agent socket directory is not a directory: {directory}")
+    if info.st_uid != os.getuid():
+        raise AgentError(f"Agent socket directory is owned by another user: {directory}")
+    if stat.S_IMODE(info.st_mode) != 0o700:
+        raise AgentError(
+            f"Agent socket directory must have mode 0700, has {stat.S_IMODE(info.st_mode):o}: {directory}"
+        )
+
+
+class VaultAgent:
+    def __init__(self, vault, socket_path=None, lock_timeout=None):
+        """
+        Initialize agent
+
+        Args:
+            vault: Unlocked Vault served by the agent
+            socket_path: Socket to listen on, default_socket_path() if None
+            lock_timeout: Idle seconds before keys are wiped, from
+                security.lock_timeout if None; 0 disables it
+        """
+        self.vault = vault
+        self.socket_path = socket_path or default_socket_path()
+
+        if lock_timeout is None:
+            lock_timeout = 0
+            if vault.config.get('security', 'auto_lock', True):
+                lock_timeout = vault.config.get('security', 'lock_timeout', 300)
+        self.lock_timeout = lock_timeout
+
+        self._loop = None
+        self._server = None
+        self._lock_timer = None
+        self._stopped = None
+        # Open connections, stream writer -> handler task
+        self._clients = {}
+
+        self._ops = {
+            "status": self._op_status,
+            "unlock": self._op_unlock,
+            "lock": self._op_lock,
+            "stop": self._op_stop,
+            "list": self._op_list,
+            "has": self._op_has,
+            "get": self._op_get,
+            "search": self._op_search,
+            "add": self._op_add,
+            "delete": self._op_delete,
+            "export": self._op_export,
+            "import": self._op_import,
+            "audit": self._op_audit,
+            "breaches": self._op_breaches,
+        }
+
+    def lock(self):
+        """
+        Wipe keys and decrypted entries, the agent keeps running
+        """
+        self._cancel_lock_timer()
+        if self.vault.is_authenticated:
+            self.vault.lock()
+            print("Agent locked")
+
+    def _cancel_lock_timer(self):
+        """Stop the idle timer"""
+        if self._lock_timer is not None:
+            self._lock_timer.cancel()
+            self._lock_timer = None
+
+    def _touch(self):
+        """Restart the idle timer after activity"""
+        self._cancel_lock_timer()
+        if self.lock_timeout and self.vault.is_authenticated:
+            self._lock_timer = self._loop.call_later(self.lock_timeout, self.lock)
+
+    def _prepare_socket(self):
+        """Create the private socket directory and clear a stale socket"""
+        directory = os.path.dirname(os.path.abspath(self.socket_path))
+        os.makedirs(os.path.dirname(directory), exist_ok=True)
+        try:
+            os.mkdir(directory, 0o700)
+        except FileExistsError:
+            pass
+
+        # Never take over a directory created by someone else
+        info = os.lstat(directory)
+        if stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid():
+            os.chmod(directory, 0o700)
+        check_socket_dir(directory)
+
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.remove(self.socket_path)
+            else:
+                raise AgentError(f"An agent is already listening on {self.socket_path}")
+            finally:
+                probe.close()
+
+    async def serve(self):
+        """
+        Serve requests until stopped or interrupted
+        """
+        import asyncio
+        import signal
+        import threading
+
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+
+        self._prepare_socket()
+        self._server = await asyncio.start_unix_server(
+            self._handle_client, path=self.socket_path, limit=MAX_REQUEST_SIZE
+        )
+        os.chmod(self.socket_path, 0o600)
+
+        # Signal handlers can only be installed from the main thread
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                self._loop.add_signal_handler(signum, self._stopped.set)
+
+        self._touch()
+        print(f"Agent listening on {self.socket_path}")
+
+        try:
+            await self._stopped.wait()
+        finally:
+            self._cancel_lock_timer()
+            self._server.close()
+            # Ends the open connections and lets their handlers return
+            handlers = list(self._clients.values())
+            for writer in list(self._clients):
+                writer.close()
+            await asyncio.gather(*handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def run(self):
+        """
+        Serve requests, blocking until the agent stops
+        """
+        import asyncio
+        asyncio.run(self.serve())
+
+    async def _handle_client(self, reader, writer):
+        """Answer requests from one connection until it closes"""
+        import asyncio
+        self._clients[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Request longer than MAX_REQUEST_SIZE
+                    break
+                if not line:
+                    break
+
+                reply = await self._dispatch(line)
+                writer.write(json.dumps(reply).encode('utf-8') + b"\n")
+                await writer.drain()
+
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.pop(writer, None)
+            writer.close()
+
+    async def _dispatch(self, line):
+        """Run one request and build its reply"""
+        try:
+            request = json.loads(line)
+            op = request.get("op")
+            handler = self._ops.get(op)
+            if handler is None:
+                raise AgentError(f"Unknown operation: {op}")
+
+            if op not in LOCKED_OPS and not self.vault.is_authenticated:
+                raise AgentError("Agent is locked", locked=True)
+
+            result = handler(request)
+            if hasattr(result, "__await__"):
+                result = await result
+
+            self._touch()
+            return {"ok": True, "result": result}
+
+        except AgentError as e:
+            return {"ok": False, "error": str(e), "locked": e.locked}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}", "locked": False}
+
+    # Request handlers, see self._ops
+
+    def _op_status(self, request):
+        return {
+            "locked": not self.vault.is_authenticated,
+            "lock_timeout": self.lock_timeout
+        }
+
+    async def _op_unlock(self, request):
+        if self.vault.is_authenticated:
+            return True
+
+        # Key derivation takes long enough to stall other clients
+        success = await self._loop.run_in_executor(None, self.vault.unlock, request["password"])
+        if not success:
+            raise AgentError("Invalid password or corrupted data", locked=True)
+
+        if self.vault.resume_key_rotation() is False:
+            print("Warning: an interrupted encryption key rotation could not be completed")
+        return True
+
+    def _op_lock(self, request):
+        self.lock()
+        return True
+
+    def _op_stop(self, request):
+        self._stopped.set()
+        return True
+
+    def _op_list(self, request):
+        return self.vault.get_all_passwords()
+
+    def _op_has(self, request):
+        return self.vault.has_entry(request["id"])
+
+    def _op_get(self, request):
+        return self.vault.get_entry(request["id"])
+
+    def _op_search(self, request):
+        return self.vault.search(request["query"], request.get("limit"))
+
+    def _op_add(self, request):
+        return self.vault.save_entry(request["entry"])
+
+    def _op_delete(self, request):
+        return self.vault.delete_entry(request["id"])
+
+    def _op_export(self, request):
+        return self.vault.export_data(request["path"])
+
+    def _op_import(self, request):
+        return self.vault.import_data(request["path"])
+
+    async def _op_audit(self, request):
+        # The first audit scores every entry
+        return await self._loop.run_in_executor(None, self.vault.audit)
+
+    async def _op_breaches(self, request):
+        return await self._loop.run_in_executor(None, self.vault.check_breaches, request.get("corpus"))
+
+
+class AgentClient:
+    def __init__(self, socket_path=None, timeout=30.0):
+        """
+        Connect to a running agent
+
+        Offers the Vault methods the command line uses, so either can be
+        passed around. The connection is kept open, so repeated requests
+        only pay for a socket round trip.
+
+        Raises:
+            OSError: If no agent is listening
+            AgentError: If the socket directory is not private to the
+                current user
+        """
+        self.socket_path = socket_path or default_socket_path()
+        check_socket_dir(os.path.dirname(os.path.abspath(self.socket_path)))
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(self.socket_path)
+        except OSError:
+            self._sock.close()
+            raise
+        self._file = self._sock.makefile('rwb')
+
+    @classmethod
+    def connect(cls, socket_path=None):
+        """
+        Connect to the agent if one is running
+
+        Returns:
+            AgentClient: Connected client, or None
+
+        Raises:
+            AgentError: If the socket directory is not private to the
+                current user
+        """
+        if not AGENT_SUPPORTED:
+            return None
+
+        try:
+            return cls(socket_path)
+        except OSError:
+            return None
+
+    def request(self, op, **params):
+        """
+        Send one request and wait for its reply
+
+        Raises:
+            AgentError: If the agent reports an error
+        """
+        params["op"] = op
+        self._file.write(json.dumps(params).encode('utf-8') + b"\n")
+        self._file.flush()
+
+        line = self._file.readline()
+        if not line:
+            raise AgentError("Agent closed the connection")
+
+        reply = json.loads(line)
+        if not reply["ok"]:
+            raise AgentError(reply["error"], reply.get("locked", False))
+        return reply["result"]
+
+    def status(self):
+        """Get the lock state and idle timeout"""
+        return self.request("status")
+
+    def unlock(self, password):
+        """Unlock the agent, False on a wrong password"""
+        try:
+            return self.request("unlock", password=password)
+        except AgentError as e:
+            if e.locked:
+                return False
+            raise
+
+    def lock(self):
+        """Make the agent wipe its keys"""
+        return self.request("lock")
+
+    def stop(self):
+        """Shut the agent down"""
+        return self.request("stop")
+
+    # Same signatures as the Vault methods
+
+    def get_all_passwords(self):
+        return self.request("list")
+
+    def has_entry(self, entry_id):
+        return self.request("has", id=entry_id)
+
+    def get_entry(self, entry_id):
+        return self.request("get", id=entry_id)
+
+    def search(self, search_term, limit=None):
+        return self.request("search", query=search_term, limit=limit)
+
+    def save_entry(self, password_data):
+        return self.request("add", entry=password_data)
+
+    def delete_entry(self, entry_id):
+        return self.request("delete", id=entry_id)
+
+    def export_data(self, file_path):
+        # The agent may run in another working directory
+        return self.request("export", path=os.path.abspath(file_path))
+
+    def import_data(self, file_path):
+        return self.request("import", path=os.path.abspath(file_path))
+
+    def audit(self):
+        return self.request("audit")
+
+    def check_breaches(self, corpus_file=None):
+        if corpus_file:
+            corpus_file = os.path.abspath(corpus_file)
+        return self.request("breaches", corpus=corpus_file)
+
+    def generate_password(self, **options):
+        import password_generator
+        return password_generator.PasswordGenerator().generate(**options)
+
+    def close(self):
+        """
+        Close the connection, the agent keeps the vault unlocked
+        """
+        try:
+            self._file.close()
+        finally:
+            self._sock.close()
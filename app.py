@@ -1,22 +1,28 @@
 """
 Main application class for SecurePass Manager
+
+Only what the login screen needs is imported up front. The vault with
+the crypto stack and the clipboard module load on first use, or in the
+background once the login screen has painted.
 """
 
 import customtkinter as ctk
 import os
+import threading
 from tkinter import messagebox
 
 # Import local modules
-import auth
-import database
 import ui
-import password_generator
-import clipboard
 import utils
 
 class SecurePassManager:
-    def __init__(self):
-        """Initialize the password manager application"""
+    def __init__(self, preload=True):
+        """
+        Initialize the password manager application
+        
+        Args:
+            preload: Open the vault in the background after the first paint
+        """
         self.app = ctk.CTk()
         self.app.title("SecurePass Manager")
         self.app.geometry("1000x700")
@@ -25,34 +31,76 @@ class SecurePassManager:
         if os.path.exists("app_icon.ico"):
             self.app.iconbitmap("app_icon.ico")
         
-        # Initialize managers
+        # Initialize managers, the vault and clipboard are opened lazily
         self.config = utils.ConfigManager()
-        self.auth_manager = auth.AuthManager(self.config)
-        self.db_manager = database.DatabaseManager()
-        self.pass_generator = password_generator.PasswordGenerator()
-        self.clipboard_manager = clipboard.ClipboardManager()
+        self._vault = None
+        self._vault_lock = threading.Lock()
+        self._entry_listeners = []
+        self._clipboard_manager = None
         self.ui_manager = ui.UIManager(self.app, self)
         
-        # Application state
-        self.is_authenticated = False
+        if preload:
+            # Idle callbacks run after the pending redraw of the login screen
+            self.app.after_idle(self._start_preload)
+        
+    @property
+    def vault(self):
+        """Vault, opened on first use"""
+        with self._vault_lock:
+            if self._vault is None:
+                import vault
+                opened = vault.Vault(self.config)
+                for callback in self._entry_listeners:
+                    opened.add_entry_listener(callback)
+                self._vault = opened
+            return self._vault
+    
+    @property
+    def clipboard_manager(self):
+        """Clipboard manager, created on first use"""
+        if self._clipboard_manager is None:
+            import clipboard
+            self._clipboard_manager = clipboard.ClipboardManager()
+        return self._clipboard_manager
+    
+    def _start_preload(self):
+        """Start loading the vault while the user types the password"""
+        threading.Thread(target=self._preload, daemon=True).start()
+    
+    def _preload(self):
+        """
+        Open the vault and import slow modules in the background
         
+        Errors are left for the first real use to report.
+        """
+        try:
+            self.vault
+            import clipboard
+        except Exception as e:
+            print(f"Error preloading: {e}")
+    
+    @property
+    def is_authenticated(self):
+        """Whether the vault is unlocked"""
+        return self._vault is not None and self._vault.is_authenticated
+    
     def authenticate(self, password, is_new_account=False):
         """
         Authenticate user with master password
         """
         try:
             if is_new_account:
-                success = self.auth_manager.create_account(password)
+                success = self.vault.create_account(password)
                 if success:
                     messagebox.showinfo("Success", "Account created successfully!")
-                    self.is_authenticated = True
                     self.ui_manager.show_main_screen()
                     return True
             else:
-                success = self.auth_manager.authenticate(password)
+                success = self.vault.unlock(password)
                 if success:
-                    self.is_authenticated = True
+                    self._resume_key_rotation()
                     self.ui_manager.show_main_screen()
+                    threading.Thread(target=self._build_search_index, daemon=True).start()
                     return True
                 else:
                     messagebox.showerror("Error", "Invalid password or corrupted data")
@@ -62,6 +110,37 @@ class SecurePassManager:
             messagebox.showerror("Error", f"Authentication failed: {str(e)}")
             return False
     
+    def _build_search_index(self):
+        """
+        Build the search index in the background after unlocking
+        
+        Errors are left for the first search to report.
+        """
+        try:
+            self.vault.build_search_index()
+        except Exception as e:
+            print(f"Error building search index: {e}")
+    
+    def _resume_key_rotation(self):
+        """
+        Finish a data key rotation interrupted before its swap
+        """
+        if self.vault.resume_key_rotation() is False:
+            messagebox.showerror(
+                "Error",
+                "An interrupted encryption key rotation could not be completed. "
+                "Your passwords are still encrypted with the previous key."
+            )
+    
+    def add_entry_listener(self, callback):
+        """
+        Register a callback for entry changes, see Vault.add_entry_listener
+        """
+        with self._vault_lock:
+            self._entry_listeners.append(callback)
+            if self._vault is not None:
+                self._vault.add_entry_listener(callback)
+    
     def save_password_entry(self, password_data):
         """
         Save a new password entry
@@ -70,18 +149,8 @@ class SecurePassManager:
             if not self.is_authenticated:
                 messagebox.showerror("Error", "Not authenticated")
                 return False
-                
-            # Encrypt the password data
-            encrypted_data = self.auth_manager.encrypt_data(password_data)
-            
-            # Save to database
-            entry_id = self.db_manager.save_entry(encrypted_data)
             
-            if entry_id:
-                self.ui_manager.refresh_password_list()
-                return True
-            else:
-                return False
+            return self.vault.save_entry(password_data) is not None
                 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save password: {str(e)}")
@@ -89,30 +158,23 @@ class SecurePassManager:
     
     def get_all_passwords(self):
         """
-        Get all password entries
+        Get listing metadata of all password entries
+        
+        Secrets are not included; use get_password_secrets for those.
         """
-        try:
-            if not self.is_authenticated:
-                return []
-                
-            # Get encrypted entries from database
-            encrypted_entries = self.db_manager.get_all_entries()
-            decrypted_entries = []
-            
-            # Decrypt each entry
-            for entry in encrypted_entries:
-                try:
-                    decrypted = self.auth_manager.decrypt_data(entry["data"])
-                    decrypted["id"] = entry["id"]  # Add entry ID
-                    decrypted_entries.append(decrypted)
-                except:
-                    continue  # Skip corrupted entries
-                
-            return decrypted_entries
-            
-        except Exception as e:
-            print(f"Error loading passwords: {e}")
-            return []
+        return self.vault.get_all_passwords()
+    
+    def get_password_secrets(self, entry_id):
+        """
+        Decrypt the secret payload of a single entry
+        """
+        return self.vault.get_password_secrets(entry_id)
+    
+    def get_password(self, entry_id):
+        """
+        Get the password of a single entry
+        """
+        return self.vault.get_password(entry_id)
     
     def delete_password_entry(self, entry_id):
         """
@@ -121,46 +183,25 @@ class SecurePassManager:
         try:
             if not self.is_authenticated:
                 return False
-                
-            success = self.db_manager.delete_entry(entry_id)
             
-            if success:
-                self.ui_manager.refresh_password_list()
-                return True
-            else:
-                return False
+            return self.vault.delete_entry(entry_id)
                 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to delete password: {str(e)}")
             return False
     
-    def search_passwords(self, search_term):
+    def search_passwords(self, search_term, limit=None):
         """
-        Search password entries
+        Search password entries, best match first
         """
-        try:
-            all_entries = self.get_all_passwords()
-            search_term = search_term.lower()
-            
-            matching_entries = []
-            for entry in all_entries:
-                if (search_term in entry.get('website', '').lower() or 
-                    search_term in entry.get('username', '').lower() or
-                    search_term in entry.get('url', '').lower()):
-                    matching_entries.append(entry)
-                    
-            return matching_entries
-            
-        except Exception as e:
-            print(f"Search error: {e}")
-            return []
+        return self.vault.search(search_term, limit)
     
     def generate_password(self, length=16, use_upper=True, use_lower=True, 
                          use_digits=True, use_special=True):
         """
         Generate a random password
         """
-        return self.pass_generator.generate(
+        return self.vault.generate_password(
             length=length,
             use_upper=use_upper,
             use_lower=use_lower,
@@ -168,6 +209,40 @@ class SecurePassManager:
             use_special=use_special
         )
     
+    def estimate_strength(self, password, user_inputs=()):
+        """
+        Estimate password strength
+        """
+        return self.vault.estimate_strength(password, user_inputs)
+    
+    def audit_vault(self):
+        """
+        Audit all entries for reused, similar, weak and stale passwords
+        
+        Returns:
+            dict: Audit report, or None on failure
+        """
+        try:
+            return self.vault.audit()
+        except Exception as e:
+            # Runs on a worker thread, the UI reports the failure
+            print(f"Error auditing passwords: {e}")
+            return None
+    
+    def check_breaches(self, corpus_file=None):
+        """
+        Look up stored passwords in a local breached password corpus
+        
+        Returns:
+            dict: Breach report, or None on failure
+        """
+        try:
+            return self.vault.check_breaches(corpus_file)
+        except Exception as e:
+            # Runs on a worker thread, the UI reports the failure
+            print(f"Error checking breached passwords: {e}")
+            return None
+    
     def copy_to_clipboard(self, text):
         """
         Copy text to clipboard
@@ -179,7 +254,7 @@ class SecurePassManager:
         Change master password
         """
         try:
-            success = self.auth_manager.change_master_password(new_password)
+            success = self.vault.change_master_password(new_password)
             if success:
                 messagebox.showinfo("Success", "Master password changed successfully!")
                 return True
@@ -190,12 +265,29 @@ class SecurePassManager:
             messagebox.showerror("Error", f"Failed to change password: {str(e)}")
             return False
     
+    def rotate_encryption_key(self, progress=None):
+        """
+        Re-encrypt all entries under a new data key
+        
+        Args:
+            progress: Called with the number of entries re-encrypted so far
+        
+        Returns:
+            bool: True if the vault now uses the new key
+        """
+        try:
+            return self.vault.rotate_encryption_key(progress)
+        except Exception as e:
+            # Runs on a worker thread, the UI reports the failure
+            print(f"Error rotating encryption key: {e}")
+            return False
+    
     def export_data(self, file_path):
         """
         Export encrypted data to file
         """
         try:
-            return self.db_manager.export_data(file_path)
+            return self.vault.export_data(file_path)
         except Exception as e:
             messagebox.showerror("Error", f"Export failed: {str(e)}")
             return False
@@ -205,7 +297,7 @@ class SecurePassManager:
         Import encrypted data from file
         """
         try:
-            success = self.db_manager.import_data(file_path)
+            success = self.vault.import_data(file_path)
             if success:
                 self.ui_manager.refresh_password_list()
                 return True
@@ -218,10 +310,16 @@ class SecurePassManager:
     
     def logout(self):
         """Log out user"""
-        self.is_authenticated = False
-        self.auth_manager.logout()
+        # Commits buffered writes before the session ends
+        self.vault.lock()
         self.ui_manager.show_login_screen()
     
     def run(self):
         """Run the application"""
-        self.app.mainloop()
\ No newline at end of file
+        try:
+            self.app.mainloop()
+        finally:
+            # Flushes buffered writes
+            with self._vault_lock:
+                if self._vault is not None:
+                    self._vault.close()
@@ -0,0 +1,312 @@
+"""
+Vault-wide password health audit
+
+Finds passwords reused across entries, near-duplicates such as
+"Summer2023!" and "summer2024", weak passwords and entries that have not
+been changed in a long time.
+
+Each entry's password is reduced to keyed fingerprints and a strength
+score, kept in an encrypted audit cache next to the database. Later audits
+only decrypt and rescore entries whose modified timestamp changed; reuse
+and near-duplicate groups are rebuilt from the cached fingerprints. The
+cache is written back when the vault locks.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+
+import entry_cipher
+
+AUDIT_CACHE_FILE = "audit.cache"
+AUDIT_CACHE_VERSION = 1
+
+DEFAULT_MAX_AGE_DAYS = 365
+# Entries scoring at or below this (0-4) are reported as weak
+DEFAULT_WEAK_SCORE = 2
+
+# Characters undone when comparing passwords for near-duplicates
+_UNL33T = str.maketrans("@4$5301!|7+", "aasseoiiitt")
+# Digits and symbols around the word part, e.g. "!" or "2023!"
+_AFFIXES = re.compile(r"^[\W\d_]+|[\W\d_]+$")
+
+# Shortest normalized form compared, shorter ones match too easily. It
+# must also keep at least half of the password, which rules out short
+# runs of letters inside random passwords.
+MIN_NORMALIZED_LENGTH = 4
+
+# Cached record fields, stored as a list per entry ID
+_MODIFIED, _FINGERPRINT, _NORMALIZED, _SCORE, _WARNING = range(5)
+
+
+def normalize_password(password):
+    """
+    Reduce a password to the form shared by its near-duplicates
+
+    Case, digit and symbol affixes and l33t substitutions are dropped.
+
+    Returns:
+        str: Normalized form, or None if too little of it is left
+    """
+    normalized = _AFFIXES.sub("", password.lower()).translate(_UNL33T)
+    if len(normalized) < max(MIN_NORMALIZED_LENGTH, len(password) // 2):
+        return None
+    return normalized
+
+
+class VaultAuditor:
+    def __init__(self, auth_manager, db_manager, estimate_strength,
+                 max_age_days=DEFAULT_MAX_AGE_DAYS, weak_score=DEFAULT_WEAK_SCORE):
+        """
+        Initialize auditor
+
+        Args:
+            auth_manager: Unlocked AuthManager, encrypts the audit cache
+            db_manager: Database manager holding the entries
+            estimate_strength: Callable (password, user_inputs) -> dict
+                as returned by strength.estimate_strength
+            max_age_days: Age after which an entry is reported as stale
+            weak_score: Highest score reported as weak
+        """
+        self.auth_manager = auth_manager
+        self.db_manager = db_manager
+        self.estimate_strength = estimate_strength
+        self.max_age_days = max_age_days
+        self.weak_score = weak_score
+        self.cache_file = os.path.join(db_manager.data_dir, AUDIT_CACHE_FILE)
+
+        # entry_id -> cached record, None until loaded
+        self._records = None
+        self._key = None
+        self._dirty = False
+
+        # Kept in step with the records so a report only visits findings:
+        # fingerprint -> entry IDs, per fingerprint field
+        self._buckets = {_FINGERPRINT: {}, _NORMALIZED: {}}
+        self._weak = set()
+        self._lock = threading.Lock()
+
+    def _fingerprint(self, value):
+        """Keyed hash, so the cache does not reveal equal passwords on its own"""
+        return hmac.new(self._key, value.encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+
+    def _load_cache(self):
+        """Load the persisted audit cache, starting over if it is unusable"""
+        self._records = {}
+        self._key = None
+
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'rb') as f:
+                    cache = self.auth_manager.decrypt_data(
+                        f.read(), entry_cipher.associated_data("audit", "cache")
+                    )
+                if cache.get("version") == AUDIT_CACHE_VERSION:
+                    self._key = base64.b64decode(cache["key"])
+                    self._records = cache["entries"]
+        except Exception as e:
+            # E.g. written under a data key that has since been rotated
+            print(f"Error loading audit cache, rebuilding it: {e}")
+            self._records = {}
+
+        if self._key is None:
+            self._key = os.urandom(32)
+
+        for entry_id, record in self._records.items():
+            self._index(entry_id, record)
+
+    def _index(self, entry_id, record):
+        """Add a record to the buckets"""
+        for field, buckets in self._buckets.items():
+            if record[field] is not None:
+                buckets.setdefault(record[field], set()).add(entry_id)
+        if record[_SCORE] is not None and record[_SCORE] <= self.weak_score:
+            self._weak.add(entry_id)
+
+    def _unindex(self, entry_id, record):
+        """Remove a record from the buckets"""
+        for field, buckets in self._buckets.items():
+            bucket = buckets.get(record[field])
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del buckets[record[field]]
+        self._weak.discard(entry_id)
+
+    def _set_record(self, entry_id, record):
+        """Store or, with None, drop the record of an entry"""
+        old = self._records.pop(entry_id, None)
+        if old is not None:
+            self._unindex(entry_id, old)
+        if record is not None:
+            self._records[entry_id] = record
+            self._index(entry_id, record)
+
+    def _save_cache(self):
+        """Persist the audit cache, encrypted with the vault key"""
+        import storage
+
+        try:
+            token = self.auth_manager.encrypt_data({
+                "version": AUDIT_CACHE_VERSION,
+                "key": base64.b64encode(self._key).decode('ascii'),
+                "entries": self._records
+            }, entry_cipher.associated_data("audit", "cache"))
+            storage.atomic_write(self.cache_file, token)
+        except Exception as e:
+            print(f"Error saving audit cache: {e}")
+
+    def _score_entries(self, entry_ids, metadata):
+        """
+        Decrypt and score a batch of changed entries
+
+        Returns:
+            int: Number of entries scored
+        """
+        entries = []
+        for entry_id in entry_ids:
+            entry = self.db_manager.get_entry(entry_id)
+            if entry:
+                entries.append(entry)
+            else:
+                self._set_record(entry_id, None)
+        if not entries:
+            return 0
+
+        tokens = [entry["data"] for entry in entries]
+        associated_data = [entry_cipher.associated_data(entry["id"], "data") for entry in entries]
+        payloads, errors = self.auth_manager.decrypt_many(tokens, associated_data=associated_data)
+
+        scored = 0
+        for index, (entry, payload) in enumerate(zip(entries, payloads)):
+            if payload is None:
+                print(f"Skipping corrupted entry {entry['id']} in audit: {errors.get(index)}")
+                self._set_record(entry["id"], None)
+                continue
+
+            password = payload.get("password") or ""
+            if not password:
+                self._set_record(entry["id"], [entry["modified"], None, None, None, None])
+                continue
+
+            info = metadata.get(entry["id"], {})
+            result = self.estimate_strength(password, (info.get("website"), info.get("username")))
+            normalized = normalize_password(password)
+
+            self._set_record(entry["id"], [
+                entry["modified"],
+                self._fingerprint(password),
+                self._fingerprint(normalized) if normalized else None,
+                result["score"],
+                # Only shown for weak entries
+                result["warning"] if result["score"] <= self.weak_score else None
+            ])
+            scored += 1
+
+        return scored
+
+    def audit(self, entries, modified):
+        """
+        Audit the vault
+
+        Args:
+            entries: Listing metadata of all entries, as returned by
+                Vault.get_all_passwords
+            modified: entry_id -> modified timestamp from the database
+
+        Returns:
+            dict: total, rescored, and the findings as lists of entry
+                summaries: reused and similar (groups), weak and stale
+        """
+        with self._lock:
+            if self._records is None:
+                self._load_cache()
+
+            metadata = {entry["id"]: entry for entry in entries}
+
+            # Only entries added or changed since the last audit get decrypted
+            changed = []
+            for entry_id in metadata:
+                record = self._records.get(entry_id)
+                if record is None or record[_MODIFIED] != modified.get(entry_id):
+                    changed.append(entry_id)
+
+            removed = [entry_id for entry_id in self._records if entry_id not in metadata]
+            for entry_id in removed:
+                self._set_record(entry_id, None)
+
+            rescored = self._score_entries(changed, metadata) if changed else 0
+            if changed or removed:
+                self._dirty = True
+
+            report = self._build_report(metadata)
+            report["rescored"] = rescored
+            return report
+
+    def _build_report(self, metadata):
+        """Group and filter the cached records"""
+        from strength import SCORE_LABELS
+
+        def summary(entry_id, **extra):
+            info = metadata[entry_id]
+            extra.update(id=entry_id, website=info.get("website", ""), username=info.get("username", ""))
+            return extra
+
+        weak = []
+        for entry_id in self._weak:
+            record = self._records[entry_id]
+            weak.append(summary(entry_id, score=record[_SCORE], strength=SCORE_LABELS[record[_SCORE]],
+                                warning=record[_WARNING]))
+
+        stale = []
+        now = datetime.now()
+        # Timestamps are ISO format, so they compare as strings
+        cutoff = (now - timedelta(days=self.max_age_days)).isoformat()
+        for entry_id, record in self._records.items():
+            if record[_MODIFIED] and record[_MODIFIED] <= cutoff:
+                try:
+                    age_days = (now - datetime.fromisoformat(record[_MODIFIED])).days
+                except ValueError:
+                    continue
+                stale.append(summary(entry_id, age_days=age_days))
+
+        reused = [sorted(group) for group in self._buckets[_FINGERPRINT].values() if len(group) > 1]
+
+        # Near-duplicates need at least two different passwords, identical
+        # ones are already reported as reused
+        similar = [
+            sorted(group) for group in self._buckets[_NORMALIZED].values()
+            if len(group) > 1 and len({self._records[entry_id][_FINGERPRINT] for entry_id in group}) > 1
+        ]
+
+        reused.sort(key=len, reverse=True)
+        similar.sort(key=len, reverse=True)
+        weak.sort(key=lambda item: item["score"])
+        stale.sort(key=lambda item: item["age_days"], reverse=True)
+
+        return {
+            "total": len(metadata),
+            "reused": [[summary(entry_id) for entry_id in group] for group in reused],
+            "similar": [[summary(entry_id) for entry_id in group] for group in similar],
+            "weak": weak,
+            "stale": stale,
+        }
+
+    def clear(self):
+        """
+        Save pending cache changes and drop the decrypted audit state
+
+        Must run before the vault key is dropped.
+        """
+        with self._lock:
+            if self._dirty:
+                self._save_cache()
+            self._records = None
+            self._key = None
+            self._dirty = False
+            self._buckets = {_FINGERPRINT: {}, _NORMALIZED: {}}
+            self._weak = set()
@@ -5,12 +5,94 @@ Authentication and encryption module
 import base64
 import os
 import json
+import hmac
 import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain, repeat
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC  # Fixed import
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.exceptions import InvalidKey
 
+import kdf
+import entry_cipher
+
+# Auth record format stored in config.json:
+#   1 - separate PBKDF2 password hash and key salt
+#   2 - password verifier derived from the encryption key with HKDF
+#   3 - random data key wrapped by a key-encryption key from the password
+AUTH_VERSION = 3
+
+VERIFIER_INFO = b"securepass-verifier"
+KEK_INFO = b"securepass-kek"
+
+# Batches smaller than this are processed on the calling thread. Serially
+# a batch of 20000 entries takes about half a second, while starting worker
+# processes where they are spawned rather than forked (Windows, macOS)
+# takes seconds, so only batches far larger than any usual vault pay off.
+PARALLEL_BATCH_THRESHOLD = 200000
+BATCH_CHUNK_SIZE = 500
+
+# Cipher spec of a worker process, set once by _init_worker
+_worker_cipher_spec = None
+
+
+def _serialize(data):
+    """Encode entry data for encryption"""
+    if isinstance(data, dict):
+        return json.dumps(data).encode()
+    return str(data).encode()
+
+
+def _encrypt_chunk(cipher_spec, items):
+    """Encrypt a chunk of (item, associated data) pairs, returning (ok, token or error) pairs"""
+    cipher = entry_cipher.EntryCipher(*cipher_spec)
+    results = []
+    for item, ad in items:
+        try:
+            results.append((True, cipher.encrypt(_serialize(item), ad)))
+        except Exception as e:
+            results.append((False, str(e) or type(e).__name__))
+    return results
+
+
+def _decrypt_chunk(cipher_spec, tokens):
+    """Decrypt a chunk of (token, associated data) pairs, returning (ok, data or error) pairs"""
+    cipher = entry_cipher.EntryCipher(*cipher_spec)
+    results = []
+    for token, ad in tokens:
+        try:
+            results.append((True, json.loads(cipher.decrypt(token, ad).decode())))
+        except Exception as e:
+            results.append((False, str(e) or type(e).__name__))
+    return results
+
+
+def _init_worker(cipher_spec):
+    """Keep the cipher spec in a worker process for the chunks it runs"""
+    global _worker_cipher_spec
+    _worker_cipher_spec = cipher_spec
+
+
+def _run_worker_chunk(chunk_func, chunk):
+    """Run a chunk function in a worker process with its cipher spec"""
+    return chunk_func(_worker_cipher_spec, chunk)
+
+
+def _rekey_chunk(cipher_specs, tokens):
+    """Re-encrypt a chunk of (token, associated data) pairs from an old to a new cipher"""
+    old_cipher = entry_cipher.EntryCipher(*cipher_specs[0])
+    new_cipher = entry_cipher.EntryCipher(*cipher_specs[1])
+    results = []
+    for token, ad in tokens:
+        try:
+            results.append((True, new_cipher.encrypt(old_cipher.decrypt(token, ad), ad)))
+        except Exception as e:
+            results.append((False, str(e) or type(e).__name__))
+    return results
+
+
 class AuthManager:
     def __init__(self, config_manager):
         """
@@ -18,6 +100,9 @@ class AuthManager:
         """
         self.config = config_manager
         self.cipher_suite = None
+        self._key = None
+        self._cipher_name = None
+        self._master_key = None
         
     def derive_key(self, password, salt=None):
         """
@@ -26,32 +111,117 @@ class AuthManager:
         if salt is None:
             salt = os.urandom(16)
         
-        # Use PBKDF2HMAC for key derivation
-        kdf = PBKDF2HMAC(
+        master_key = self._derive_master_key(password, salt)
+        key = base64.urlsafe_b64encode(master_key)
+        return key, salt
+    
+    def _derive_master_key(self, password, salt, kdf_params=None):
+        """
+        Run the password KDF once and return the raw master key
+        """
+        if kdf_params is None:
+            kdf_params = self.get_kdf_params()
+        return kdf.derive(password, salt, kdf_params)
+    
+    def get_kdf_params(self):
+        """
+        Get the KDF parameters stored for this vault
+        """
+        return self.config.get('auth', 'kdf') or kdf.DEFAULT_KDF
+    
+    def calibrate_kdf(self):
+        """
+        Pick KDF parameters for the configured algorithm and unlock time
+        """
+        name = self.config.get('security', 'kdf', 'pbkdf2')
+        target_ms = self.config.get('security', 'kdf_target_ms', 500)
+        return kdf.calibrate(name, target_ms)
+    
+    def get_cipher_name(self):
+        """
+        Get the entry cipher stored for this vault
+        """
+        return self.config.get('auth', 'cipher', entry_cipher.CIPHER_FERNET)
+    
+    def _configured_cipher_name(self):
+        """
+        Get the entry cipher new data keys are used with
+        """
+        name = self.config.get('security', 'cipher', entry_cipher.CIPHER_AES_GCM)
+        if name not in entry_cipher.CIPHERS:
+            print(f"Unknown cipher '{name}', using {entry_cipher.CIPHER_AES_GCM}")
+            name = entry_cipher.CIPHER_AES_GCM
+        return name
+    
+    @staticmethod
+    def _derive_verifier(master_key):
+        """
+        Derive the password verifier from the master key
+        
+        HKDF output is one-way, so the stored verifier does not reveal the
+        encryption key.
+        """
+        hkdf = HKDF(
             algorithm=hashes.SHA256(),
             length=32,
-            salt=salt,
-            iterations=100000,
+            salt=None,
+            info=VERIFIER_INFO,
         )
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-        return key, salt
+        return base64.b64encode(hkdf.derive(master_key)).decode('utf-8')
     
-    def hash_password(self, password):
+    @staticmethod
+    def _derive_kek(master_key):
         """
-        Create password hash for verification
+        Derive the Fernet key-encryption key that wraps the data key
         """
-        salt = os.urandom(32)
-        key = hashlib.pbkdf2_hmac(
-            'sha256',
-            password.encode('utf-8'),
-            salt,
-            100000
+        hkdf = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=KEK_INFO,
         )
-        return base64.b64encode(salt + key).decode('utf-8')
+        return base64.urlsafe_b64encode(hkdf.derive(master_key))
+    
+    def _build_auth_record(self, master_key, salt, kdf_params, data_key, cipher_name):
+        """
+        Build the auth config section for a master key
+        
+        Entries are encrypted with data_key, which is stored wrapped by the
+        master key. Changing the password only re-wraps the data key.
+        """
+        kek = Fernet(self._derive_kek(master_key))
+        return {
+            'version': AUTH_VERSION,
+            'kdf': kdf_params,
+            'salt': base64.b64encode(salt).decode(),
+            'verifier': self._derive_verifier(master_key),
+            'wrapped_key': kek.encrypt(data_key).decode(),
+            'cipher': cipher_name
+        }
+    
+    def _store_auth_record(self, master_key, salt, kdf_params, data_key, cipher_name):
+        """
+        Store KDF parameters, salt, verifier, wrapped data key and cipher
+        """
+        auth_record = self._build_auth_record(master_key, salt, kdf_params, data_key, cipher_name)
+        return self.apply_auth_record(auth_record)
+    
+    def apply_auth_record(self, auth_record):
+        """
+        Replace the stored auth record
+        """
+        self.config.config.setdefault('auth', {})
+        auth_section = self.config.config['auth']
+        auth_section.update(auth_record)
+        
+        # Drop the legacy separate password hash
+        auth_section.pop('password_hash', None)
+        
+        return self.config._save_config()
     
     def verify_password(self, stored_hash, password):
         """
-        Verify password against stored hash
+        Verify password against a legacy version 1 password hash
         """
         try:
             decoded = base64.b64decode(stored_hash)
@@ -73,21 +243,19 @@ class AuthManager:
         Create new user account
         """
         try:
-            # Derive encryption key
-            key, salt = self.derive_key(password)
-            self.cipher_suite = Fernet(key)
-            
-            # Save salt to config
-            self.config.set('auth', 'salt', base64.b64encode(salt).decode())
-            
-            # Hash and store password
-            password_hash = self.hash_password(password)
-            self.config.set('auth', 'password_hash', password_hash)
+            # Derive key-encryption key
+            salt = os.urandom(16)
+            kdf_params = self.calibrate_kdf()
+            master_key = self._derive_master_key(password, salt, kdf_params)
             
-            # Save config
-            self.config._save_config()
+            # Entries are encrypted with a random data key
+            data_key = Fernet.generate_key()
+            cipher_name = self._configured_cipher_name()
+            self.activate_key(data_key, cipher_name)
+            self._master_key = master_key
             
-            return True
+            # Save salt, verifier and wrapped data key to config
+            return self._store_auth_record(master_key, salt, kdf_params, data_key, cipher_name)
             
         except Exception as e:
             print(f"Error creating account: {e}")
@@ -105,77 +273,296 @@ class AuthManager:
                 
             salt = base64.b64decode(salt_b64)
             
-            # Verify password hash
-            stored_hash = self.config.get('auth', 'password_hash')
-            if not self.verify_password(stored_hash, password):
-                return False
+            stored_verifier = self.config.get('auth', 'verifier')
+            if not stored_verifier:
+                return self._authenticate_legacy(password, salt)
             
-            # Derive key and create cipher suite
-            key, _ = self.derive_key(password, salt)
-            self.cipher_suite = Fernet(key)
+            # One KDF run yields both the verifier and the key
+            master_key = self._derive_master_key(password, salt)
+            verifier = self._derive_verifier(master_key)
+            if not hmac.compare_digest(verifier, stored_verifier):
+                return False
             
-            # Test encryption/decryption
-            test_data = b"test"
-            encrypted = self.cipher_suite.encrypt(test_data)
-            decrypted = self.cipher_suite.decrypt(encrypted)
+            wrapped_key = self.config.get('auth', 'wrapped_key')
+            if wrapped_key:
+                data_key = Fernet(self._derive_kek(master_key)).decrypt(wrapped_key.encode())
+            else:
+                # Version 2 vaults encrypted entries with the master key
+                # itself; keep it as the data key and wrap it from now on
+                data_key = base64.urlsafe_b64encode(master_key)
+                self._store_auth_record(
+                    master_key, salt, self.get_kdf_params(), data_key, entry_cipher.CIPHER_FERNET
+                )
             
-            return decrypted == test_data
+            self.activate_key(data_key, self.get_cipher_name())
+            self._master_key = master_key
+            return True
                 
         except (InvalidKey, Exception) as e:
             print(f"Authentication error: {e}")
             return False
     
-    def encrypt_data(self, data):
+    def _authenticate_legacy(self, password, salt):
+        """
+        Authenticate against a version 1 auth record and migrate it
+        """
+        # Verify password hash
+        stored_hash = self.config.get('auth', 'password_hash')
+        if not stored_hash or not self.verify_password(stored_hash, password):
+            return False
+        
+        master_key = self._derive_master_key(password, salt, kdf.DEFAULT_KDF)
+        data_key = base64.urlsafe_b64encode(master_key)
+        self.activate_key(data_key, entry_cipher.CIPHER_FERNET)
+        self._master_key = master_key
+        
+        # Later unlocks only need a single KDF run
+        self._store_auth_record(
+            master_key, salt, kdf.DEFAULT_KDF, data_key, entry_cipher.CIPHER_FERNET
+        )
+        
+        return True
+    
+    def encrypt_data(self, data, associated_data=None):
         """
         Encrypt data
+        
+        Args:
+            data: Dict or string to encrypt
+            associated_data: Bytes the ciphertext is bound to, see
+                entry_cipher.associated_data
         """
         if not self.cipher_suite:
             raise ValueError("Not authenticated")
             
-        if isinstance(data, dict):
-            data_str = json.dumps(data)
-        else:
-            data_str = str(data)
-            
-        return self.cipher_suite.encrypt(data_str.encode())
+        return self.cipher_suite.encrypt(_serialize(data), associated_data)
     
-    def decrypt_data(self, encrypted_data):
+    def decrypt_data(self, encrypted_data, associated_data=None):
         """
         Decrypt data
         """
         if not self.cipher_suite:
             raise ValueError("Not authenticated")
-            
-        decrypted = self.cipher_suite.decrypt(encrypted_data)
+        
+        decrypted = self.cipher_suite.decrypt(encrypted_data, associated_data)
         return json.loads(decrypted.decode())
     
-    def change_master_password(self, new_password):
+    def encrypt_many(self, items, executor=None, associated_data=None):
         """
-        Change master password
+        Encrypt a batch of items
+        
+        Args:
+            items: Dicts or strings to encrypt
+            executor: "process", "thread" or "serial"; picked from the batch
+                size if None
+            associated_data: Associated data per item, or None
+            
+        Returns:
+            tuple: (tokens in input order with None for failures,
+                    dict of input index -> error message)
         """
-        try:
-            # Derive new key
-            key, salt = self.derive_key(new_password)
+        if not self.cipher_suite:
+            raise ValueError("Not authenticated")
+        
+        items = list(items)
+        return self._run_batch(_encrypt_chunk, self._with_associated_data(items, associated_data), executor)
+    
+    def decrypt_many(self, encrypted_items, executor=None, associated_data=None):
+        """
+        Decrypt a batch of tokens
+        
+        Args:
+            encrypted_items: Encrypted tokens
+            executor: "process", "thread" or "serial"; picked from the batch
+                size if None
+            associated_data: Associated data per token, or None
             
-            # Update config
-            self.config.set('auth', 'salt', base64.b64encode(salt).decode())
+        Returns:
+            tuple: (decrypted dicts in input order with None for failures,
+                    dict of input index -> error message)
+        """
+        if not self.cipher_suite:
+            raise ValueError("Not authenticated")
+        
+        return self._run_batch(
+            _decrypt_chunk, self._with_associated_data(encrypted_items, associated_data), executor
+        )
+    
+    def rekey_many(self, encrypted_items, new_key, new_cipher_name, executor=None, associated_data=None):
+        """
+        Re-encrypt a batch of tokens under a new key
+        
+        Plaintext never leaves the chunk functions, so nothing has to be
+        parsed or re-serialized.
+        
+        Args:
+            encrypted_items: Tokens encrypted with the current key
+            new_key: Fernet data key to encrypt with
+            new_cipher_name: Entry cipher to encrypt with
+            executor: "process", "thread" or "serial"; picked from the batch
+                size if None
+            associated_data: Associated data per token, or None
             
-            # Update password hash
-            password_hash = self.hash_password(new_password)
-            self.config.set('auth', 'password_hash', password_hash)
+        Returns:
+            tuple: (new tokens in input order with None for failures,
+                    dict of input index -> error message)
+        """
+        if not self.cipher_suite:
+            raise ValueError("Not authenticated")
+        
+        cipher_specs = ((self._key, self._cipher_name), (new_key, new_cipher_name))
+        return self._run_batch(
+            _rekey_chunk, self._with_associated_data(encrypted_items, associated_data), executor, cipher_specs
+        )
+    
+    @staticmethod
+    def _with_associated_data(items, associated_data):
+        """Pair items with their associated data"""
+        if associated_data is None:
+            return [(item, None) for item in items]
+        
+        associated_data = list(associated_data)
+        if len(associated_data) != len(items):
+            raise ValueError("Associated data does not match the batch")
+        return list(zip(items, associated_data))
+    
+    def _run_batch(self, chunk_func, items, executor, cipher_spec=None):
+        """
+        Run a chunk function over items, in parallel for large batches
+        
+        Worker processes are only picked off the main thread, where the
+        Tk and agent event loops run, as starting them can block for
+        seconds. The data key has to reach each worker; it is sent once
+        through the pool initializer rather than with every chunk, and
+        lives in the worker until the pool shuts down.
+        """
+        if cipher_spec is None:
+            cipher_spec = (self._key, self._cipher_name)
+        
+        cpu_count = os.cpu_count() or 1
+        if executor is None:
+            if (len(items) >= PARALLEL_BATCH_THRESHOLD and cpu_count > 1
+                    and threading.current_thread() is not threading.main_thread()):
+                executor = "process"
+            else:
+                executor = "serial"
+        
+        chunks = [
+            items[i:i + BATCH_CHUNK_SIZE]
+            for i in range(0, len(items), BATCH_CHUNK_SIZE)
+        ]
+        
+        outputs = None
+        if executor in ("process", "thread"):
+            workers = min(cpu_count, len(chunks)) or 1
+            try:
+                if executor == "process":
+                    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(cipher_spec,)) as pool:
+                        outputs = list(pool.map(_run_worker_chunk, repeat(chunk_func), chunks))
+                else:
+                    with ThreadPoolExecutor(workers) as pool:
+                        outputs = list(pool.map(chunk_func, repeat(cipher_spec), chunks))
+            except Exception as e:
+                # Chunk functions are pure, so a serial rerun is safe
+                print(f"Parallel batch failed, running serially: {e}")
+        
+        if outputs is None:
+            outputs = [chunk_func(cipher_spec, chunk) for chunk in chunks]
+        
+        results = []
+        errors = {}
+        for index, (ok, value) in enumerate(chain.from_iterable(outputs)):
+            if ok:
+                results.append(value)
+            else:
+                results.append(None)
+                errors[index] = value
+        
+        return results, errors
+    
+    def change_master_password(self, new_password, kdf_params=None):
+        """
+        Change master password
+        
+        Only the data key is re-wrapped; entries stay as they are. This is
+        also how a vault moves to another KDF or new cost parameters.
+        
+        Args:
+            new_password: New master password
+            kdf_params: KDF parameters for derive(), or None to calibrate
+                the KDF configured in security.kdf on this machine
+        """
+        if not self.cipher_suite:
+            raise ValueError("Not authenticated")
+        
+        try:
+            if kdf_params is None:
+                kdf_params = self.calibrate_kdf()
             
-            # Update cipher suite
-            self.cipher_suite = Fernet(key)
+            # Derive new key-encryption key
+            salt = os.urandom(16)
+            master_key = self._derive_master_key(new_password, salt, kdf_params)
             
-            # Save config
-            self.config._save_config()
+            # Update config
+            if not self._store_auth_record(master_key, salt, kdf_params, self._key, self._cipher_name):
+                return False
             
+            self._master_key = master_key
             return True
             
         except Exception as e:
             print(f"Error changing password: {e}")
             return False
     
+    def prepare_key_rotation(self):
+        """
+        Generate a new data key without switching to it
+        
+        The rotated vault uses the cipher configured in security.cipher, so
+        rotation also moves an existing vault to a different cipher.
+        
+        Returns:
+            tuple: (new Fernet data key, auth record to store once the vault
+                    has been re-encrypted with it)
+        """
+        if not self._master_key:
+            raise ValueError("Not authenticated")
+        
+        salt = base64.b64decode(self.config.get('auth', 'salt'))
+        data_key = Fernet.generate_key()
+        
+        auth_record = self._build_auth_record(
+            self._master_key, salt, self.get_kdf_params(), data_key, self._configured_cipher_name()
+        )
+        return data_key, auth_record
+    
+    def activate_key(self, key, cipher_name):
+        """
+        Switch the cipher suite to a Fernet data key and entry cipher
+        """
+        self._key = key
+        self._cipher_name = cipher_name
+        self.cipher_suite = entry_cipher.EntryCipher(key, cipher_name)
+    
+    def wrap_key(self, key):
+        """
+        Encrypt a key with the current key for storage
+        """
+        if not self.cipher_suite:
+            raise ValueError("Not authenticated")
+        return Fernet(self._key).encrypt(key).decode()
+    
+    def unwrap_key(self, wrapped_key):
+        """
+        Decrypt a key stored with wrap_key
+        """
+        if not self.cipher_suite:
+            raise ValueError("Not authenticated")
+        return Fernet(self._key).decrypt(wrapped_key.encode())
+    
     def logout(self):
         """Log out user (clear sensitive data)"""
-        self.cipher_suite = None
\ No newline at end of file
+        self.cipher_suite = None
+        self._key = None
+        self._cipher_name = None
+        self._master_key = None
\ No newline at end of file
@@ -0,0 +1,266 @@
+"""
+Offline breached password check against a local hash corpus
+
+The corpus is a text file of password hashes sorted by hash, one per line,
+optionally followed by ":<count>" as in the ordered-by-hash downloads of
+Pwned Passwords:
+
+    000000005AD76BD555C1D6D771DE417A4B87E4B4:10
+    00000000A8DAE4228F821FB418F59826079BF368:4
+
+SHA-1 (40 hex digits) and NTLM (32 hex digits) corpora are recognized
+from their first line. The file is memory-mapped and never read into
+memory; hashes are uniformly distributed, so each lookup interpolates its
+position and touches only a few pages before a short scan.
+
+Passwords are hashed on the calling side; worker processes only receive
+hashes.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+HASH_SHA1 = "sha1"
+HASH_NTLM = "ntlm"
+
+# Hex digits per hash type
+HASH_LENGTHS = {40: HASH_SHA1, 32: HASH_NTLM}
+
+# Leading hex digits used to interpolate a position
+INTERPOLATION_DIGITS = 12
+# Below this many bytes the remaining range is scanned directly
+SCAN_BYTES = 4096
+# Interpolation steps before falling back to bisection, which bounds
+# lookups in corpora that are not uniformly distributed
+MAX_INTERPOLATION_STEPS = 6
+
+# Lookups smaller than this run on the calling thread
+PARALLEL_LOOKUP_THRESHOLD = 20000
+LOOKUP_CHUNK_SIZE = 5000
+
+# Corpora opened in this process, path -> BreachCorpus
+_open_corpora = {}
+
+
+def _md4(data):
+    """MD4 digest, for OpenSSL builds without the legacy provider"""
+    def rotate(x, n):
+        x &= 0xFFFFFFFF
+        return ((x << n) | (x >> (32 - n))) & 0xFFFFFFFF
+
+    length = len(data)
+    data = data + b"\x80" + b"\x00" * ((55 - length) % 64) + struct.pack("<Q", length * 8)
+    h = [0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476]
+
+    for offset in range(0, len(data), 64):
+        x = struct.unpack("<16I", data[offset:offset + 64])
+        a, b, c, d = h
+
+        for i in range(16):
+            k, s = i, (3, 7, 11, 19)[i % 4]
+            a, b, c, d = d, rotate(a + ((b & c) | (~b & d)) + x[k], s), b, c
+        for i in range(16):
+            k, s = (i % 4) * 4 + i // 4, (3, 5, 9, 13)[i % 4]
+            a, b, c, d = d, rotate(a + ((b & c) | (b & d) | (c & d)) + x[k] + 0x5A827999, s), b, c
+        for i in range(16):
+            k, s = (0, 8, 4, 12, 2, 10, 6, 14, 1, 9, 5, 13, 3, 11, 7, 15)[i], (3, 9, 11, 15)[i % 4]
+            a, b, c, d = d, rotate(a + (b ^ c ^ d) + x[k] + 0x6ED9EBA1, s), b, c
+
+        h = [(value + new) & 0xFFFFFFFF for value, new in zip(h, (a, b, c, d))]
+
+    return struct.pack("<4I", *h)
+
+
+def hash_password(password, hash_type=HASH_SHA1):
+    """
+    Hash a password the way the corpus stores it
+
+    Returns:
+        bytes: Uppercase hex digest
+    """
+    if hash_type == HASH_NTLM:
+        data = password.encode('utf-16-le')
+        try:
+            digest = hashlib.new("md4", data).digest()
+        except ValueError:
+            digest = _md4(data)
+    else:
+        digest = hashlib.sha1(password.encode('utf-8')).digest()
+    return digest.hex().upper().encode('ascii')
+
+
+class BreachCorpus:
+    def __init__(self, path):
+        """
+        Open a sorted hash corpus
+
+        Raises:
+            OSError: If the file cannot be opened
+            ValueError: If the first line is not a hash
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            self._file.close()
+            raise ValueError(f"Breach corpus is empty: {path}")
+
+        first = self._map[:128].split(b"\n", 1)[0].split(b":", 1)[0].strip()
+        self.hash_type = HASH_LENGTHS.get(len(first))
+        if self.hash_type is None or not all(c in b"0123456789ABCDEFabcdef" for c in first):
+            self.close()
+            raise ValueError(f"Not a sorted SHA-1 or NTLM hash file: {path}")
+
+        self.hash_length = len(first)
+        self._span = 16 ** INTERPOLATION_DIGITS
+
+    def _count_at(self, start):
+        """Parse the count of the line at start, 1 if the corpus has none"""
+        end = self._map.find(b"\n", start)
+        line = self._map[start:end if end >= 0 else len(self._map)]
+        _, _, count = line.partition(b":")
+        try:
+            return int(count) if count.strip() else 1
+        except ValueError:
+            return 1
+
+    def lookup_hash(self, key):
+        """
+        Look up a hex hash
+
+        Corpus lines are compared in uppercase, so lowercase and mixed case
+        corpora work too; digits sort before letters in either case.
+
+        Returns:
+            int: Times the hash was seen in breaches, 0 if it is not listed
+        """
+        key = key.upper()
+
+        mm = self._map
+        length = self.hash_length
+        lo, hi = 0, len(mm)
+        lo_value, hi_value = 0, self._span
+        # Position of the key in the key space
+        value = int(key[:INTERPOLATION_DIGITS], 16)
+        steps = 0
+
+        # Narrow [lo, hi) to line starts bracketing the key
+        while hi - lo > SCAN_BYTES:
+            if steps < MAX_INTERPOLATION_STEPS and hi_value > lo_value:
+                fraction = min(max((value - lo_value) / (hi_value - lo_value), 0.0), 1.0)
+                probe = lo + int((hi - lo) * fraction)
+            else:
+                probe = (lo + hi) // 2
+            steps += 1
+
+            # First line starting after the probe
+            start = mm.find(b"\n", max(probe, lo), hi) + 1
+            if start <= 0 or start >= hi:
+                # The probe hit the last line of the range, look before it
+                start = mm.rfind(b"\n", lo, max(probe, lo + 1)) + 1
+                if start <= lo:
+                    break
+
+            found = mm[start:start + length].upper()
+            if found == key:
+                return self._count_at(start)
+            if found < key:
+                lo = mm.find(b"\n", start, hi) + 1 or hi
+                lo_value = int(found[:INTERPOLATION_DIGITS], 16)
+            else:
+                hi = start
+                hi_value = int(found[:INTERPOLATION_DIGITS], 16)
+
+        # A full-length hex match can only start a line
+        index = mm[lo:hi].upper().find(key)
+        if index < 0:
+            return 0
+        return self._count_at(lo + index)
+
+    def lookup(self, password):
+        """
+        Look up a password
+
+        Returns:
+            int: Times the password was seen in breaches, 0 if it is not listed
+        """
+        return self.lookup_hash(hash_password(password, self.hash_type))
+
+    def close(self):
+        """Unmap and close the corpus"""
+        try:
+            if getattr(self, "_map", None) is not None:
+                self._map.close()
+                self._map = None
+        finally:
+            self._file.close()
+
+
+def open_corpus(path):
+    """
+    Get the corpus at path, opened once per process
+    """
+    path = os.path.abspath(path)
+    corpus = _open_corpora.get(path)
+    if corpus is None:
+        corpus = _open_corpora[path] = BreachCorpus(path)
+    return corpus
+
+
+def _lookup_chunk(path, hashes):
+    """Look up a chunk of hashes, in a worker process or serially"""
+    corpus = open_corpus(path)
+    return [corpus.lookup_hash(key) for key in hashes]
+
+
+def lookup_many(path, hashes, executor=None):
+    """
+    Look up a batch of hashes
+
+    Args:
+        path: Corpus file
+        hashes: Uppercase hex hashes, see hash_password
+        executor: "process" or "serial"; picked from the batch size if None
+
+    Returns:
+        list: Breach counts in input order
+    """
+    hashes = list(hashes)
+
+    # Sorted lookups walk the file front to back, which keeps a corpus
+    # that is not in the page cache yet from seeking back and forth
+    order = sorted(range(len(hashes)), key=hashes.__getitem__)
+    hashes = [hashes[index] for index in order]
+
+    cpu_count = os.cpu_count() or 1
+    if executor is None:
+        if len(hashes) >= PARALLEL_LOOKUP_THRESHOLD and cpu_count > 1:
+            executor = "process"
+        else:
+            executor = "serial"
+
+    chunks = [hashes[i:i + LOOKUP_CHUNK_SIZE] for i in range(0, len(hashes), LOOKUP_CHUNK_SIZE)]
+
+    outputs = None
+    if executor == "process":
+        try:
+            # Every worker maps the same file, the page cache is shared
+            with ProcessPoolExecutor(max_workers=min(cpu_count, len(chunks)) or 1) as pool:
+                outputs = list(pool.map(_lookup_chunk, repeat(path), chunks))
+        except Exception as e:
+            # Lookups are read-only, so a serial rerun is safe
+            print(f"Parallel breach lookup failed, running serially: {e}")
+
+    if outputs is None:
+        outputs = [_lookup_chunk(path, chunk) for chunk in chunks]
+
+    counts = [0] * len(order)
+    for index, count in zip(order, (count for output in outputs for count in output)):
+        counts[index] = count
+    return counts
@@ -27,18 +27,24 @@ def clean_build_dirs():
             except Exception as e:
                 print(f"Error removing {file}: {e}")
 
-def create_exe():
-    """Create the executable file"""
+def create_exe(onefile=True):
+    """
+    Create the executable file
+    
+    A onefile build unpacks itself to a temporary directory on every
+    launch; a onedir build starts faster at the cost of shipping a folder.
+    """
     
     # Define PyInstaller arguments
     args = [
         'main.py',  # Main script
         '--name=PasswordManager',  # Name of executable
         '--windowed',  # No console window
-        '--onefile',  # Single executable file
+        '--onefile' if onefile else '--onedir',  # Single executable file or folder
         '--icon=app_icon.ico',  # Icon file (optional)
         '--add-data=config.json;.',  # Include config file
         '--add-data=data;data',  # Include data directory
+        '--add-data=dictionaries;dictionaries',  # Strength estimator word lists
         '--hidden-import=customtkinter',
         '--hidden-import=cryptography',
         '--hidden-import=pyperclip',
@@ -95,16 +101,32 @@ def create_config_template():
                 "clear_clipboard": True,
                 "clipboard_timeout": 30,
                 "auto_lock": True,
-                "lock_timeout": 300
+                "lock_timeout": 300,
+                "kdf": "pbkdf2",
+                "kdf_target_ms": 500,
+                "cipher": "aes-gcm"
             },
             "ui": {
                 "font_size": 12,
                 "font_family": "Segoe UI",
                 "animations": True
             },
+            "database": {
+                "backend": "log",
+                "flush_delay_ms": 50
+            },
+            "audit": {
+                "max_age_days": 365,
+                "weak_score": 2
+            },
+            "breach": {
+                "corpus_file": ""
+            },
             "auth": {
+                "version": 3,
                 "salt": "",
-                "password_hash": ""
+                "verifier": "",
+                "wrapped_key": ""
             }
         }
         
@@ -133,22 +155,30 @@ def main():
     # Clean previous builds
     clean_build_dirs()
     
+    # Rebuild the compiled word lists in case a source list changed; the
+    # app only reads them and never writes into its own directory
+    import frequency_lists
+    frequency_lists.compile_lists()
+    
     # Create executable
-    create_exe()
+    onefile = '--onedir' not in sys.argv
+    create_exe(onefile)
     
     print("\n" + "=" * 50)
     print("Build completed successfully!")
     print("=" * 50)
+    exe_path = 'dist/PasswordManager.exe' if onefile else 'dist/PasswordManager/PasswordManager.exe'
     print("\nYour executable is in the 'dist' folder:")
-    print("→ dist/PasswordManager.exe")
+    print(f"→ {exe_path}")
     print("\nTo run the application, double-click PasswordManager.exe")
+    print("Check startup time from source with: python main.py --startup-report")
     
     # Offer to test the executable
-    if sys.platform == 'win32' and os.path.exists('dist/PasswordManager.exe'):
+    if sys.platform == 'win32' and os.path.exists(exe_path):
         response = input("\nDo you want to test the executable now? (y/n): ")
         if response.lower() == 'y':
             print("\nLaunching PasswordManager.exe...")
-            os.system('start dist/PasswordManager.exe')
+            os.system(f'start {exe_path}')
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
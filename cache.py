@@ -0,0 +1,108 @@
+"""
+Session cache for decrypted password entries
+"""
+
+import threading
+
+# Entry change notifications sent to SecurePassManager entry listeners
+ENTRY_ADDED = "added"
+ENTRY_UPDATED = "updated"
+ENTRY_REMOVED = "removed"
+
+
+class EntryCache:
+    def __init__(self):
+        """
+        Initialize entry cache
+        """
+        # entry_id -> (modified timestamp, decrypted entry)
+        self.entries = {}
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def sync(self, encrypted_entries, decrypt_many):
+        """
+        Bring the cache in line with the database contents
+
+        Only entries whose ID or modified timestamp changed are decrypted.
+
+        Args:
+            encrypted_entries: Entries from DatabaseManager.get_all_entries
+            decrypt_many: Callable turning a list of encrypted entries into
+                (decrypted dicts, dict of index -> error message)
+
+        Returns:
+            dict: entry_id -> error message for entries that failed
+        """
+        with self._lock:
+            current = self.entries
+
+        # Keep unchanged entries, collect the rest for one batch
+        entries = {}
+        stale = []
+        for entry in encrypted_entries:
+            cached = current.get(entry["id"])
+            if cached and cached[0] == entry["modified"]:
+                entries[entry["id"]] = cached
+            else:
+                entries[entry["id"]] = None
+                stale.append(entry)
+
+        decrypted, errors = decrypt_many(stale) if stale else ([], {})
+
+        failed = {}
+        for index, entry in enumerate(stale):
+            if index in errors:
+                failed[entry["id"]] = errors[index]
+                del entries[entry["id"]]  # Skip corrupted entries
+            else:
+                entries[entry["id"]] = (entry["modified"], decrypted[index])
+
+        with self._lock:
+            self.entries = entries
+            self.loaded = True
+
+        return failed
+
+    def put(self, entry_id, modified, entry):
+        """
+        Add or replace a decrypted entry
+        """
+        with self._lock:
+            self.entries[entry_id] = (modified, entry)
+
+    def remove(self, entry_id):
+        """
+        Remove an entry
+        """
+        with self._lock:
+            self.entries.pop(entry_id, None)
+
+    def get(self, entry_id):
+        """
+        Get a copy of a decrypted entry
+        """
+        with self._lock:
+            cached = self.entries.get(entry_id)
+        return dict(cached[1]) if cached else None
+
+    def values(self):
+        """
+        Get copies of all decrypted entries in insertion order
+        """
+        with self._lock:
+            cached = list(self.entries.values())
+        return [dict(entry) for _, entry in cached]
+
+    def modified_times(self):
+        """
+        Get the modified timestamp of every cached entry
+        """
+        with self._lock:
+            return {entry_id: cached[0] for entry_id, cached in self.entries.items()}
+
+    def clear(self):
+        """Drop all decrypted data"""
+        with self._lock:
+            self.entries = {}
+            self.loaded = False
@@ -5,52 +5,161 @@ Database management for password storage
 import os
 import json
 import uuid
+import contextlib
+import sqlite3
+import threading
 from datetime import datetime
 import pickle
 
+import storage
+
+# Storage backends selectable through the database.backend config key
+BACKENDS = ("log", "sqlite")
+
+# Default write-behind window; 0 commits every write on its own
+DEFAULT_FLUSH_DELAY_MS = 50
+
+# Buffered SQLite statements that force a commit
+SQLITE_FLUSH_STATEMENTS = 256
+
+
+def new_entry_id():
+    """
+    Generate a unique entry ID
+    
+    Callers that bind ciphertext to the entry ID generate it up front and
+    pass it to save_entry.
+    """
+    return str(uuid.uuid4())
+
+
+def read_export(path):
+    """
+    Read the entries of an export file
+    
+    Returns:
+        dict: Entry ID -> entry dict
+    
+    Raises:
+        IOError: If the file cannot be read
+        ValueError: If it is not a valid export
+    """
+    return DatabaseManager._load_pickle_file(path)
+
+
+def open_database(config, data_dir="data"):
+    """
+    Create the database manager selected in config
+    """
+    backend = config.get('database', 'backend', 'log')
+    flush_delay = config.get('database', 'flush_delay_ms', DEFAULT_FLUSH_DELAY_MS) / 1000
+    
+    if backend not in BACKENDS:
+        print(f"Unknown database backend '{backend}', using log")
+    elif backend == "sqlite":
+        return SqliteDatabaseManager(data_dir, flush_delay)
+    
+    return DatabaseManager(data_dir, flush_delay)
+
+
 class DatabaseManager:
-    def __init__(self, data_dir="data"):
+    def __init__(self, data_dir="data", flush_delay=0.0):
         """
         Initialize database manager
+        
+        Args:
+            data_dir: Directory holding the database files
+            flush_delay: Seconds writes may stay buffered before they are
+                committed together, 0 to commit each write
         """
         self.data_dir = data_dir
+        self.flush_delay = flush_delay
         self.data_file = os.path.join(data_dir, "passwords.dat")
+        self.log_file = os.path.join(data_dir, "passwords.log")
+        self.vault_file = os.path.join(data_dir, "passwords.vault")
+        
+        # Held by every write, and by a key rotation from its first chunk
+        # through the swap, so no write can land behind the copy
+        self.write_lock = threading.RLock()
         
         # Create data directory if it doesn't exist
         os.makedirs(data_dir, exist_ok=True)
         
+        # Another writer would append behind the store's back and lose
+        # entries when either side compacts
+        self._dir_lock = storage.DirectoryLock(data_dir)
+        
         # Initialize database
-        self._init_database()
+        try:
+            self._init_database()
+        except BaseException:
+            self._dir_lock.release()
+            raise
     
     def _init_database(self):
         """Initialize database files"""
-        if not os.path.exists(self.data_file):
-            with open(self.data_file, 'wb') as f:
-                pickle.dump({}, f)
+        needs_migration = (
+            not os.path.exists(self.log_file) and
+            not os.path.exists(self.vault_file) and
+            os.path.exists(self.data_file)
+        )
+        
+        self.store = storage.LogStore(self.log_file, self.vault_file, flush_delay=self.flush_delay)
+        
+        if needs_migration:
+            self._migrate_pickle_file()
     
-    def save_entry(self, encrypted_data):
+    def _migrate_pickle_file(self):
+        """Move entries from the legacy pickle file into the log"""
+        try:
+            data = self._load_pickle_file(self.data_file)
+            self.store.replace_all(data.items())
+            
+            # Keep the legacy file as a backup
+            os.replace(self.data_file, self.data_file + ".migrated")
+            
+        except Exception as e:
+            print(f"Error migrating database: {e}")
+    
+    @staticmethod
+    def _load_pickle_file(path):
+        """Load and validate a legacy pickle database file"""
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        
+        if not isinstance(data, dict):
+            raise ValueError("Invalid database file")
+        
+        for entry_data in data.values():
+            if not all(key in entry_data for key in ("data", "created", "modified")):
+                raise ValueError("Invalid database entry")
+        
+        return data
+    
+    def save_entry(self, encrypted_data, encrypted_meta=None, entry_id=None):
         """
         Save encrypted password entry
+        
+        Args:
+            encrypted_data: Encrypted secret payload
+            encrypted_meta: Encrypted listing metadata, stored separately so
+                entries can be listed without decrypting their secrets
+            entry_id: ID from new_entry_id, generated if None
         """
         try:
             # Generate unique ID
-            entry_id = str(uuid.uuid4())
+            if entry_id is None:
+                entry_id = new_entry_id()
             timestamp = datetime.now().isoformat()
             
-            # Load current data
-            with open(self.data_file, 'rb') as f:
-                data = pickle.load(f)
-            
-            # Add new entry
-            data[entry_id] = {
-                "data": encrypted_data,
-                "created": timestamp,
-                "modified": timestamp
-            }
-            
-            # Save data
-            with open(self.data_file, 'wb') as f:
-                pickle.dump(data, f)
+            # Append new entry
+            with self.write_lock:
+                self.store.put(entry_id, {
+                    "data": encrypted_data,
+                    "meta": encrypted_meta,
+                    "created": timestamp,
+                    "modified": timestamp
+                })
             
             return entry_id
             
@@ -58,22 +167,38 @@ class DatabaseManager:
             print(f"Error saving entry: {e}")
             return None
     
+    def get_entry(self, entry_id):
+        """
+        Get entry by ID
+        """
+        try:
+            entry_data = self.store.get(entry_id)
+            if entry_data is None:
+                return None
+            
+            return {
+                "id": entry_id,
+                "data": entry_data["data"],
+                "meta": entry_data.get("meta"),
+                "created": entry_data["created"],
+                "modified": entry_data["modified"]
+            }
+            
+        except Exception as e:
+            print(f"Error getting entry: {e}")
+            return None
+    
     def get_all_entries(self):
         """
         Get all entries
         """
         try:
-            if not os.path.exists(self.data_file):
-                return []
-                
-            with open(self.data_file, 'rb') as f:
-                data = pickle.load(f)
-            
             entries = []
-            for entry_id, entry_data in data.items():
+            for entry_id, entry_data in self.store.items():
                 entries.append({
                     "id": entry_id,
                     "data": entry_data["data"],
+                    "meta": entry_data.get("meta"),
                     "created": entry_data["created"],
                     "modified": entry_data["modified"]
                 })
@@ -84,26 +209,493 @@ class DatabaseManager:
             print(f"Error getting all entries: {e}")
             return []
     
+    def iter_entries(self, start=0):
+        """
+        Stream entries in insertion order without loading them all
+        
+        Args:
+            start: Number of leading entries to skip
+        """
+        with contextlib.closing(self.store.iter_items(start)) as items:
+            for entry_id, entry_data in items:
+                yield {
+                    "id": entry_id,
+                    "data": entry_data["data"],
+                    "meta": entry_data.get("meta"),
+                    "created": entry_data["created"],
+                    "modified": entry_data["modified"]
+                }
+    
+    def commit_shadow(self, shadow_file):
+        """
+        Atomically replace all entries with the contents of a shadow log
+        
+        Does nothing if the shadow log was already committed.
+        """
+        with self.write_lock:
+            if os.path.exists(shadow_file):
+                self.store.replace_with_log(shadow_file)
+    
     def delete_entry(self, entry_id):
         """
         Delete entry by ID
         """
         try:
-            # Load current data
-            with open(self.data_file, 'rb') as f:
-                data = pickle.load(f)
+            # Append tombstone
+            with self.write_lock:
+                return self.store.delete(entry_id)
+                
+        except Exception as e:
+            print(f"Error deleting entry: {e}")
+            return False
+    
+    def export_data(self, export_path):
+        """
+        Export database to file
+        """
+        try:
+            data = {}
+            for entry_id, entry_data in self.store.items():
+                meta = entry_data.get("meta")
+                data[entry_id] = {
+                    "data": bytes(entry_data["data"]),
+                    "meta": bytes(meta) if meta is not None else None,
+                    "created": entry_data["created"],
+                    "modified": entry_data["modified"]
+                }
+            
+            # Export in the portable pickle format
+            storage.atomic_write(export_path, pickle.dumps(data))
+            return True
+            
+        except Exception as e:
+            print(f"Error exporting data: {e}")
+            return False
+    
+    def import_data(self, import_path):
+        """
+        Import database from file
+        """
+        try:
+            if not os.path.exists(import_path):
+                return False
+            
+            data = self._load_pickle_file(import_path)
+            
+            # Backup current data in the portable format; the log alone
+            # does not hold the entries in the vault snapshot
+            if not self.export_data(self.data_file + ".backup"):
+                return False
+            
+            # Import new data
+            with self.write_lock:
+                self.store.replace_all(data.items())
+            
+            return True
+            
+        except Exception as e:
+            # replace_all commits with a single rename, so the current
+            # data is still intact here
+            print(f"Error importing data: {e}")
+            return False
+    
+    def flush(self):
+        """
+        Commit buffered writes
+        """
+        try:
+            self.store.flush()
+            return True
+            
+        except Exception as e:
+            print(f"Error flushing database: {e}")
+            return False
+    
+    def close(self):
+        """Flush and close the underlying store"""
+        try:
+            self.store.close()
+        finally:
+            self._dir_lock.release()
+
+
+class SqliteDatabaseManager:
+    def __init__(self, data_dir="data", flush_delay=0.0):
+        """
+        Initialize SQLite database manager
+        
+        Same interface as DatabaseManager, backed by a WAL-mode SQLite file
+        with the entry ID and timestamps in indexed columns. With a flush
+        delay, writes are queued and committed in one transaction. Reads
+        of a single entry are answered from the queue; reads of many
+        entries commit it first.
+        """
+        self.data_dir = data_dir
+        self.flush_delay = flush_delay
+        self.data_file = os.path.join(data_dir, "passwords.dat")
+        self.log_file = os.path.join(data_dir, "passwords.log")
+        self.vault_file = os.path.join(data_dir, "passwords.vault")
+        self.db_file = os.path.join(data_dir, "passwords.db")
+        
+        # Held by every write, and by a key rotation from its first chunk
+        # through the swap, so no write can land behind the copy
+        self.write_lock = threading.RLock()
+        
+        # Every write goes through one connection, held under
+        # _pending_lock. Reads borrow an idle connection from a pool; WAL
+        # lets them run alongside the writer. Connections are never tied
+        # to a thread, so short-lived flush and worker threads leave none
+        # behind.
+        self._writer = None
+        self._idle_readers = []
+        self._readers_lock = threading.Lock()
+        
+        # Queued writes, entry ID -> row dict, or None for a delete
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._flush_timer = storage.FlushTimer(self.flush, flush_delay)
+        
+        # Create data directory if it doesn't exist
+        os.makedirs(data_dir, exist_ok=True)
+        
+        # Queued writes and the migration assume a single writer
+        self._dir_lock = storage.DirectoryLock(data_dir)
+        
+        # Initialize database
+        try:
+            self._init_database()
+        except BaseException:
+            self._dir_lock.release()
+            raise
+    
+    def _connect(self, path=None):
+        """Open a connection to the database file, or to path"""
+        conn = sqlite3.connect(path or self.db_file, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Sync the WAL on every commit so committed entries survive
+        # power loss, not just crashes
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+    
+    @contextlib.contextmanager
+    def _reader(self):
+        """Borrow a read connection, opening one if none is idle"""
+        with self._readers_lock:
+            conn = self._idle_readers.pop() if self._idle_readers else None
+        if conn is None:
+            conn = self._connect()
+        
+        try:
+            yield conn
+        finally:
+            with self._readers_lock:
+                self._idle_readers.append(conn)
+    
+    def _init_database(self):
+        """
+        Open the database, creating it from existing data if missing
+        
+        Raises:
+            Exception: If the existing data cannot be migrated; no
+                database is left behind, so the next start tries again
+        """
+        if not os.path.exists(self.db_file):
+            self._create_database()
+        
+        self._writer = self._connect()
+        with self._writer:
+            self._create_schema(self._writer)
+    
+    def _create_database(self):
+        """
+        Build a new database holding the entries of the other formats
+        
+        It is built under a temporary name and renamed once complete, so
+        a failed migration never leaves an empty database that would
+        stop it from running again.
+        """
+        tmp_file = self.db_file + ".tmp"
+        for path in (tmp_file, tmp_file + "-wal", tmp_file + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+        
+        conn = self._connect(tmp_file)
+        try:
+            with conn:
+                self._create_schema(conn)
+            self._migrate_existing_data(conn)
+        finally:
+            # Closing the last connection folds the WAL into the file
+            conn.close()
+        
+        os.replace(tmp_file, self.db_file)
+        storage.fsync_directory(self.data_dir)
+    
+    @staticmethod
+    def _create_schema(conn):
+        """Create the entries table and its indexes if missing"""
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                data BLOB NOT NULL,
+                meta BLOB,
+                created TEXT NOT NULL,
+                modified TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_created ON entries(created)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_modified ON entries(modified)")
+    
+    def _migrate_existing_data(self, conn):
+        """
+        Copy entries from the log or legacy pickle file into a new database
+        
+        Raises:
+            Exception: If the existing data cannot be read
+        """
+        if os.path.exists(self.log_file) or os.path.exists(self.vault_file):
+            log_store = storage.LogStore(self.log_file, self.vault_file)
+            try:
+                self._insert_all(conn, log_store.items())
+            finally:
+                log_store.close()
+        elif os.path.exists(self.data_file):
+            self._insert_all(conn, DatabaseManager._load_pickle_file(self.data_file).items())
+    
+    @staticmethod
+    def _insert_all(conn, items):
+        """Replace all entries in one transaction"""
+        with conn:
+            conn.execute("DELETE FROM entries")
+            conn.executemany(
+                "INSERT INTO entries (id, data, meta, created, modified) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (entry_id, entry_data["data"], entry_data.get("meta"),
+                     entry_data["created"], entry_data["modified"])
+                    for entry_id, entry_data in items
+                )
+            )
+    
+    def _replace_all(self, items):
+        """Atomically replace all entries, dropping queued writes"""
+        with self._pending_lock:
+            self._insert_all(self._writer, items)
+            self._pending = {}
+    
+    @staticmethod
+    def _apply_writes(conn, writes):
+        """
+        Apply (entry ID, row or None) writes in order
+        
+        A saved entry replaces any stored one with the same ID.
+        """
+        for entry_id, row in writes:
+            conn.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+            if row is not None:
+                conn.execute(
+                    "INSERT INTO entries (id, data, meta, created, modified) VALUES (?, ?, ?, ?, ?)",
+                    (entry_id, row["data"], row["meta"], row["created"], row["modified"])
+                )
+    
+    def _write(self, entry_id, row):
+        """Store or delete (row None) an entry now, or queue it for the next flush"""
+        with self._pending_lock:
+            if self.flush_delay <= 0:
+                with self._writer:
+                    self._apply_writes(self._writer, [(entry_id, row)])
+                return
             
-            # Delete entry
-            if entry_id in data:
-                del data[entry_id]
+            # Re-queue at the end so flushes keep the write order
+            self._pending.pop(entry_id, None)
+            self._pending[entry_id] = row
+            pending_count = len(self._pending)
+        
+        if pending_count >= SQLITE_FLUSH_STATEMENTS:
+            self.flush()
+        else:
+            self._flush_timer.schedule()
+    
+    def _pending_entry(self, entry_id):
+        """
+        Look up a queued write
+        
+        Returns:
+            tuple: (True, entry dict or None if deleted) if a write for the
+                entry is queued, else (False, None)
+        """
+        with self._pending_lock:
+            if entry_id not in self._pending:
+                return False, None
+            row = self._pending[entry_id]
+        
+        if row is None:
+            return True, None
+        entry = dict(row)
+        entry["id"] = entry_id
+        return True, entry
+    
+    def flush(self):
+        """
+        Commit queued writes in one transaction
+        """
+        try:
+            with self._pending_lock:
+                if not self._pending:
+                    return True
                 
-                # Save updated data
-                with open(self.data_file, 'wb') as f:
-                    pickle.dump(data, f)
+                with self._writer:
+                    self._apply_writes(self._writer, self._pending.items())
+                self._pending = {}
+            
+            return True
+            
+        except Exception as e:
+            print(f"Error flushing database: {e}")
+            return False
+    
+    @staticmethod
+    def _row_to_entry(row):
+        """Convert a database row to an entry dict"""
+        entry_id, data, meta, created, modified = row
+        return {
+            "id": entry_id,
+            "data": bytes(data),
+            "meta": bytes(meta) if meta is not None else None,
+            "created": created,
+            "modified": modified
+        }
+    
+    def save_entry(self, encrypted_data, encrypted_meta=None, entry_id=None):
+        """
+        Save encrypted password entry
+        """
+        try:
+            # Generate unique ID
+            if entry_id is None:
+                entry_id = new_entry_id()
+            timestamp = datetime.now().isoformat()
+            
+            with self.write_lock:
+                self._write(entry_id, {
+                    "data": encrypted_data,
+                    "meta": encrypted_meta,
+                    "created": timestamp,
+                    "modified": timestamp
+                })
+            
+            return entry_id
+            
+        except Exception as e:
+            print(f"Error saving entry: {e}")
+            return None
+    
+    def get_entry(self, entry_id):
+        """
+        Get entry by ID
+        """
+        try:
+            # A just-saved entry is read back without forcing a commit
+            queued, entry = self._pending_entry(entry_id)
+            if queued:
+                return entry
+            
+            with self._reader() as conn:
+                row = conn.execute(
+                    "SELECT id, data, meta, created, modified FROM entries WHERE id = ?",
+                    (entry_id,)
+                ).fetchone()
+            
+            return self._row_to_entry(row) if row else None
+            
+        except Exception as e:
+            print(f"Error getting entry: {e}")
+            return None
+    
+    def get_all_entries(self):
+        """
+        Get all entries
+        """
+        try:
+            self.flush()
+            with self._reader() as conn:
+                rows = conn.execute(
+                    "SELECT id, data, meta, created, modified FROM entries ORDER BY seq"
+                )
+                return [self._row_to_entry(row) for row in rows]
+            
+        except Exception as e:
+            print(f"Error getting all entries: {e}")
+            return []
+    
+    def get_entries_modified_since(self, timestamp):
+        """
+        Get entries modified after a timestamp, using the modified index
+        """
+        try:
+            self.flush()
+            with self._reader() as conn:
+                rows = conn.execute(
+                    "SELECT id, data, meta, created, modified FROM entries "
+                    "WHERE modified > ? ORDER BY modified",
+                    (timestamp,)
+                )
+                return [self._row_to_entry(row) for row in rows]
+            
+        except Exception as e:
+            print(f"Error getting modified entries: {e}")
+            return []
+    
+    def iter_entries(self, start=0):
+        """
+        Stream entries in insertion order without loading them all
+        
+        Args:
+            start: Number of leading entries to skip
+        """
+        self.flush()
+        with self._reader() as conn:
+            rows = conn.execute(
+                "SELECT id, data, meta, created, modified FROM entries "
+                "ORDER BY seq LIMIT -1 OFFSET ?",
+                (start,)
+            )
+            for row in rows:
+                yield self._row_to_entry(row)
+    
+    def commit_shadow(self, shadow_file):
+        """
+        Atomically replace all entries with the contents of a shadow log
+        
+        Does nothing if the shadow log was already committed.
+        """
+        with self.write_lock:
+            if not os.path.exists(shadow_file):
+                return
+            
+            # Rows are streamed from the shadow log inside one transaction
+            self._replace_all(storage.iter_log_records(shadow_file))
+            os.remove(shadow_file)
+    
+    def delete_entry(self, entry_id):
+        """
+        Delete entry by ID
+        """
+        try:
+            with self.write_lock:
+                queued, entry = self._pending_entry(entry_id)
+                if queued:
+                    exists = entry is not None
+                else:
+                    with self._reader() as conn:
+                        exists = conn.execute(
+                            "SELECT 1 FROM entries WHERE id = ?", (entry_id,)
+                        ).fetchone()
+                if not exists:
+                    return False
                 
+                self._write(entry_id, None)
                 return True
-            else:
-                return False
                 
         except Exception as e:
             print(f"Error deleting entry: {e}")
@@ -114,12 +706,13 @@ class DatabaseManager:
         Export database to file
         """
         try:
-            if not os.path.exists(self.data_file):
-                return False
-                
-            # Copy data file
-            import shutil
-            shutil.copy2(self.data_file, export_path)
+            data = {}
+            for entry in self.get_all_entries():
+                entry_id = entry.pop("id")
+                data[entry_id] = entry
+            
+            # Export in the portable pickle format
+            storage.atomic_write(export_path, pickle.dumps(data))
             return True
             
         except Exception as e:
@@ -134,24 +727,38 @@ class DatabaseManager:
             if not os.path.exists(import_path):
                 return False
             
+            data = DatabaseManager._load_pickle_file(import_path)
+            
             # Backup current data
-            backup_path = self.data_file + ".backup"
-            if os.path.exists(self.data_file):
-                import shutil
-                shutil.copy2(self.data_file, backup_path)
+            self.flush()
+            backup = sqlite3.connect(self.db_file + ".backup")
+            with backup:
+                with self._pending_lock:
+                    self._writer.backup(backup)
+            backup.close()
             
-            # Import new data
-            import shutil
-            shutil.copy2(import_path, self.data_file)
+            # Import new data in one transaction
+            with self.write_lock:
+                self._replace_all(data.items())
             
             return True
             
         except Exception as e:
+            # The import transaction rolled back, current data is intact
             print(f"Error importing data: {e}")
+            return False
+    
+    def close(self):
+        """Flush queued writes and close all connections"""
+        self._flush_timer.cancel()
+        try:
+            self.flush()
             
-            # Restore backup if exists
-            if os.path.exists(backup_path):
-                import shutil
-                shutil.copy2(backup_path, self.data_file)
-            
-            return False
\ No newline at end of file
+            with self._readers_lock:
+                for conn in self._idle_readers:
+                    conn.close()
+                self._idle_readers = []
+            with self._pending_lock:
+                self._writer.close()
+        finally:
+            self._dir_lock.release()
@@ -0,0 +1,140 @@
+"""
+Entry ciphers: Fernet and AEAD with compact binary framing
+
+AEAD frame layout:
+    format   1 byte, FORMAT_AES_GCM or FORMAT_CHACHA20
+    nonce    12 random bytes
+    body     ciphertext followed by the 16 byte tag
+
+Fernet tokens always start with b"g", so both kinds can be told apart
+from the first byte and a vault may hold a mix of them.
+"""
+
+import base64
+import os
+import time
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+
+CIPHER_FERNET = "fernet"
+CIPHER_AES_GCM = "aes-gcm"
+CIPHER_CHACHA20 = "chacha20-poly1305"
+
+CIPHERS = (CIPHER_FERNET, CIPHER_AES_GCM, CIPHER_CHACHA20)
+
+FORMAT_AES_GCM = 1
+FORMAT_CHACHA20 = 2
+
+NONCE_SIZE = 12
+
+# Frame format byte and subkey label per AEAD cipher
+AEAD_CIPHERS = {
+    CIPHER_AES_GCM: (FORMAT_AES_GCM, AESGCM, b"securepass-aes-gcm"),
+    CIPHER_CHACHA20: (FORMAT_CHACHA20, ChaCha20Poly1305, b"securepass-chacha20-poly1305"),
+}
+
+
+def associated_data(entry_id, field):
+    """
+    Build the associated data binding a ciphertext to its entry and field
+    """
+    return f"{entry_id}/{field}".encode('utf-8')
+
+
+def _subkey(data_key, info):
+    """Derive a 256-bit AEAD key from a Fernet data key"""
+    hkdf = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=info,
+    )
+    return hkdf.derive(base64.urlsafe_b64decode(data_key))
+
+
+class EntryCipher:
+    def __init__(self, data_key, name=CIPHER_FERNET):
+        """
+        Initialize entry cipher
+
+        Args:
+            data_key: Fernet data key of the vault
+            name: Cipher used for new ciphertext, one of CIPHERS
+        """
+        if name not in CIPHERS:
+            raise ValueError(f"Unsupported cipher: {name}")
+
+        self.name = name
+        self._fernet = Fernet(data_key)
+
+        # Each AEAD gets its own subkey, so no key is shared across ciphers
+        self._aeads = {}
+        for format_byte, aead_class, info in AEAD_CIPHERS.values():
+            self._aeads[format_byte] = aead_class(_subkey(data_key, info))
+
+    def encrypt(self, plaintext, associated_data=None):
+        """
+        Encrypt bytes with the vault cipher
+
+        Fernet cannot authenticate associated data, so it is ignored there.
+        """
+        if self.name == CIPHER_FERNET:
+            return self._fernet.encrypt(plaintext)
+
+        format_byte = AEAD_CIPHERS[self.name][0]
+        nonce = os.urandom(NONCE_SIZE)
+        body = self._aeads[format_byte].encrypt(nonce, plaintext, associated_data)
+        return bytes((format_byte,)) + nonce + body
+
+    def decrypt(self, token, associated_data=None):
+        """
+        Decrypt a token produced by any of the ciphers
+        """
+        aead = self._aeads.get(token[0])
+        if aead is None:
+            return self._fernet.decrypt(token)
+
+        nonce = token[1:1 + NONCE_SIZE]
+        return aead.decrypt(nonce, token[1 + NONCE_SIZE:], associated_data)
+
+
+def benchmark(count=20000, size=120):
+    """
+    Compare ciphers on entry-sized payloads
+
+    Returns:
+        dict: cipher name -> (encrypt us/entry, decrypt us/entry,
+              bytes/entry)
+    """
+    data_key = Fernet.generate_key()
+    payload = os.urandom(size // 2).hex().encode()
+    ad = associated_data("00000000-0000-0000-0000-000000000000", "data")
+
+    results = {}
+    for name in CIPHERS:
+        cipher = EntryCipher(data_key, name)
+
+        start = time.perf_counter()
+        tokens = [cipher.encrypt(payload, ad) for _ in range(count)]
+        encrypt_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for token in tokens:
+            cipher.decrypt(token, ad)
+        decrypt_time = time.perf_counter() - start
+
+        results[name] = (
+            encrypt_time / count * 1e6,
+            decrypt_time / count * 1e6,
+            len(tokens[0])
+        )
+
+    return results
+
+
+if __name__ == "__main__":
+    print(f"{'cipher':<20}{'encrypt us':>12}{'decrypt us':>12}{'bytes':>8}")
+    for name, (encrypt_us, decrypt_us, token_size) in benchmark().items():
+        print(f"{name:<20}{encrypt_us:>12.2f}{decrypt_us:>12.2f}{token_size:>8}")
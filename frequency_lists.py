@@ -0,0 +1,325 @@
+"""
+Ranked word lists for the strength estimator, stored compactly
+
+Source lists live in dictionaries/<name>.txt, one word per line, most
+common first. They are compiled into one file that holds every word once,
+sorted and joined into a single string, plus arrays of word offsets, ranks
+and list IDs. Loading it creates no per-word objects; lookups bisect the
+sorted words in place.
+
+The compiled file is built ahead of time by running this module (build.py
+does so before packaging) and ships next to the sources. It records the
+size and modification time of each source it was built from, so load()
+only has to stat them. When those differ, e.g. after a fresh checkout,
+the recorded digest of the sources decides; if that does not match
+either, load() compiles in memory instead. Nothing is written at runtime,
+as the package directory may be read-only.
+
+Compiled file layout (little endian):
+    magic      b"SPFL"
+    version    uint16
+    digest     uint32, CRC-32 of the source lists
+    lists      uint16, then per list: name length uint8, name,
+               source size uint64, source mtime in ns uint64
+    words      uint32
+    text size  uint32
+    text       sorted words, each followed by b"\\n", UTF-8
+    offsets    uint32 * (words + 1), character offsets into the text
+    ranks      uint32 * words
+    list IDs   uint8 * words
+"""
+
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from bisect import bisect_left
+
+DICTIONARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dictionaries")
+COMPILED_FILE = os.path.join(DICTIONARY_DIR, "frequency_lists.bin")
+
+MAGIC = b"SPFL"
+VERSION = 3
+
+# Lists merged into the compiled file, in order of preference when a word
+# has the same rank in several
+LIST_NAMES = ("passwords", "english", "names", "surnames")
+
+_lock = threading.Lock()
+_loaded = None
+
+
+class RankedWords:
+    def __init__(self, text, offsets, ranks, list_ids, list_names, digest=0, stats=None):
+        """
+        Initialize ranked word set
+
+        Args:
+            text: Sorted words, each followed by a newline
+            offsets: Start of each word in text, plus the end of the text
+            ranks: Frequency rank per word, 1 is the most common
+            list_ids: Index into list_names per word
+            list_names: Names of the source lists
+            digest: Digest of the source lists, see source_digest()
+            stats: (size, mtime_ns) of each source list, see source_stats()
+        """
+        self._text = text
+        self._offsets = offsets
+        self.ranks = ranks
+        self.list_ids = list_ids
+        self.list_names = list_names
+        self.digest = digest
+        self.stats = stats if stats is not None else tuple((0, 0) for _ in list_names)
+
+    @classmethod
+    def from_lists(cls, lists, digest=0, stats=None):
+        """
+        Build from in-memory ranked lists
+
+        Args:
+            lists: List of (name, words most common first)
+            digest: Digest of the source lists, see source_digest()
+            stats: (size, mtime_ns) of each source list, see source_stats()
+        """
+        best = {}
+        for list_id, (name, words) in enumerate(lists):
+            for rank, word in enumerate(words, 1):
+                word = word.strip().lower()
+                if word and (word not in best or rank < best[word][0]):
+                    best[word] = (rank, list_id)
+
+        words = sorted(best)
+        offsets = array('I', [0])
+        for word in words:
+            offsets.append(offsets[-1] + len(word) + 1)
+
+        text = "".join(word + "\n" for word in words)
+        ranks = array('I', (best[word][0] for word in words))
+        list_ids = array('B', (best[word][1] for word in words))
+        return cls(text, offsets, ranks, list_ids, tuple(name for name, _ in lists), digest, stats)
+
+    def __len__(self):
+        return len(self.ranks)
+
+    def __getitem__(self, index):
+        return self._text[self._offsets[index]:self._offsets[index + 1] - 1]
+
+    def find(self, word, lo=0, hi=None):
+        """
+        Look up a word and whether longer words start with it
+
+        lo and hi narrow the search, e.g. to the range returned for a
+        shorter prefix of the same word.
+
+        Returns:
+            tuple: (index of the word or -1, (lo, hi) range of words
+                starting with it, empty if there are none)
+        """
+        if hi is None:
+            hi = len(self)
+
+        lo = bisect_left(self, word, lo, hi)
+        # Every word with this prefix sorts below prefix + U+FFFF
+        hi = bisect_left(self, word + "\uffff", lo, hi)
+
+        index = lo if lo < hi and self[lo] == word else -1
+        return index, (lo, hi)
+
+    def rank(self, word):
+        """
+        Get the rank and list name of a word
+
+        Returns:
+            tuple: (rank, list name), or None if the word is unknown
+        """
+        index = self.find(word)[0]
+        if index < 0:
+            return None
+        return self.ranks[index], self.list_names[self.list_ids[index]]
+
+    def to_bytes(self):
+        """
+        Serialize to the compiled file layout
+        """
+        text = self._text.encode('utf-8')
+        header = [MAGIC, struct.pack("<HIH", VERSION, self.digest, len(self.list_names))]
+        for name, (size, mtime_ns) in zip(self.list_names, self.stats):
+            encoded = name.encode('utf-8')
+            header.append(struct.pack("<B", len(encoded)) + encoded + struct.pack("<QQ", size, mtime_ns))
+        header.append(struct.pack("<II", len(self), len(text)))
+
+        offsets = array('I', self._offsets)
+        ranks = array('I', self.ranks)
+        if sys.byteorder != "little":
+            offsets.byteswap()
+            ranks.byteswap()
+
+        return b"".join(header) + text + offsets.tobytes() + ranks.tobytes() + self.list_ids.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Load from the compiled file layout
+        """
+        if data[:4] != MAGIC:
+            raise ValueError("Not a compiled word list file")
+
+        version = struct.unpack_from("<H", data, 4)[0]
+        if version != VERSION:
+            raise ValueError(f"Unsupported word list version: {version}")
+
+        digest, list_count = struct.unpack_from("<IH", data, 6)
+        position = 12
+        list_names = []
+        stats = []
+        for _ in range(list_count):
+            size = data[position]
+            list_names.append(data[position + 1:position + 1 + size].decode('utf-8'))
+            position += 1 + size
+            stats.append(struct.unpack_from("<QQ", data, position))
+            position += 16
+
+        count, text_size = struct.unpack_from("<II", data, position)
+        position += 8
+        text = data[position:position + text_size].decode('utf-8')
+        position += text_size
+
+        offsets = array('I')
+        offsets.frombytes(data[position:position + 4 * (count + 1)])
+        position += 4 * (count + 1)
+        ranks = array('I')
+        ranks.frombytes(data[position:position + 4 * count])
+        position += 4 * count
+        list_ids = array('B')
+        list_ids.frombytes(data[position:position + count])
+
+        if sys.byteorder != "little":
+            offsets.byteswap()
+            ranks.byteswap()
+
+        return cls(text, offsets, ranks, list_ids, tuple(list_names), digest, tuple(stats))
+
+
+def _read_sources(source_dir):
+    """Get (name, contents) of the source lists that exist in source_dir"""
+    sources = []
+    for name in LIST_NAMES:
+        path = os.path.join(source_dir, name + ".txt")
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                sources.append((name, f.read()))
+    return sources
+
+
+def _digest(sources):
+    """CRC-32 over every list's name and contents"""
+    digest = 0
+    for name, data in sources:
+        digest = zlib.crc32(name.encode('utf-8') + b"\0" + data, digest)
+    return digest
+
+
+def read_source_lists(source_dir=DICTIONARY_DIR):
+    """
+    Read the ranked source lists that exist in source_dir
+
+    Returns:
+        tuple: ((name, words) per list, digest of the lists)
+    """
+    sources = _read_sources(source_dir)
+    lists = [
+        (name, [line for line in data.decode('utf-8').splitlines() if line and not line.startswith("#")])
+        for name, data in sources
+    ]
+    return lists, _digest(sources)
+
+
+def source_digest(source_dir=DICTIONARY_DIR):
+    """
+    Get the digest of the source lists in source_dir
+
+    Returns:
+        int: CRC-32 over every list's name and contents
+    """
+    return _digest(_read_sources(source_dir))
+
+
+def source_stats(source_dir=DICTIONARY_DIR):
+    """
+    Get the names, sizes and modification times of the source lists
+
+    Returns:
+        tuple: (names, (size, mtime_ns) per list) of the lists that exist
+    """
+    names = []
+    stats = []
+    for name in LIST_NAMES:
+        try:
+            stat = os.stat(os.path.join(source_dir, name + ".txt"))
+        except FileNotFoundError:
+            continue
+        names.append(name)
+        stats.append((stat.st_size, stat.st_mtime_ns))
+    return tuple(names), tuple(stats)
+
+
+def compile_lists(source_dir=DICTIONARY_DIR, output_file=COMPILED_FILE):
+    """
+    Compile the source lists into the binary file
+
+    Run at build time; the result is shipped with the package.
+
+    Returns:
+        RankedWords: The compiled words
+    """
+    import storage
+
+    # Taken first, so an edit made while compiling shows up as a change
+    stats = source_stats(source_dir)[1]
+    words = RankedWords.from_lists(*read_source_lists(source_dir), stats)
+    storage.atomic_write(output_file, words.to_bytes())
+    return words
+
+
+def load():
+    """
+    Get the ranked words, loading them on first use
+
+    Uses the compiled file when it matches the source lists. If it is
+    missing, unreadable or out of date, compiles in memory for this process
+    without writing anything.
+    """
+    global _loaded
+
+    with _lock:
+        if _loaded is not None:
+            return _loaded
+
+        try:
+            if os.path.exists(COMPILED_FILE):
+                with open(COMPILED_FILE, 'rb') as f:
+                    compiled = RankedWords.from_bytes(f.read())
+
+                names, stats = source_stats()
+                # Untouched since the build, or shipped without sources
+                if not names or (names == compiled.list_names and stats == compiled.stats):
+                    _loaded = compiled
+                    return _loaded
+                # Touched but unchanged, e.g. by a fresh checkout
+                if compiled.digest == source_digest():
+                    _loaded = compiled
+                    return _loaded
+                print(f"Word lists changed since {COMPILED_FILE} was built; "
+                      f"run 'python frequency_lists.py' to rebuild it")
+        except (IOError, ValueError, struct.error) as e:
+            print(f"Error loading word lists: {e}")
+
+        _loaded = RankedWords.from_lists(*read_source_lists())
+        return _loaded
+
+
+if __name__ == "__main__":
+    compiled = compile_lists()
+    print(f"Compiled {len(compiled)} words from {', '.join(compiled.list_names)} to {COMPILED_FILE}")
@@ -0,0 +1,139 @@
+"""
+Password key derivation functions
+"""
+
+import time
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+try:
+    # Available in cryptography 44.0 and later
+    from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+except ImportError:
+    Argon2id = None
+
+# Parameters used by vaults created before the KDF was configurable
+DEFAULT_KDF = {"name": "pbkdf2", "iterations": 100000}
+
+# Bounds that calibration stays within
+MIN_PBKDF2_ITERATIONS = 100000
+MIN_SCRYPT_N = 2 ** 14
+MAX_SCRYPT_N = 2 ** 20
+MIN_ARGON2_ITERATIONS = 2
+
+SCRYPT_R = 8
+SCRYPT_P = 1
+ARGON2_MEMORY_KIB = 64 * 1024
+ARGON2_LANES = 4
+
+
+def available_kdfs():
+    """
+    Get the names of KDFs usable with the installed cryptography version
+    """
+    names = ["pbkdf2", "scrypt"]
+    if Argon2id is not None:
+        names.append("argon2id")
+    return names
+
+
+def derive(password, salt, params=None, length=32):
+    """
+    Derive a key from a password
+
+    Args:
+        password: Password string or bytes
+        salt: Random salt bytes
+        params: KDF parameters as stored in config, DEFAULT_KDF if None
+        length: Key length in bytes
+
+    Returns:
+        bytes: Derived key
+    """
+    if params is None:
+        params = DEFAULT_KDF
+    if isinstance(password, str):
+        password = password.encode('utf-8')
+
+    name = params.get("name")
+
+    if name == "pbkdf2":
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=length,
+            salt=salt,
+            iterations=params["iterations"],
+        )
+    elif name == "scrypt":
+        kdf = Scrypt(
+            salt=salt,
+            length=length,
+            n=params["n"],
+            r=params.get("r", SCRYPT_R),
+            p=params.get("p", SCRYPT_P),
+        )
+    elif name == "argon2id":
+        if Argon2id is None:
+            raise ValueError("Argon2id requires cryptography 44.0 or later")
+        kdf = Argon2id(
+            salt=salt,
+            length=length,
+            iterations=params["iterations"],
+            lanes=params.get("lanes", ARGON2_LANES),
+            memory_cost=params.get("memory_cost", ARGON2_MEMORY_KIB),
+        )
+    else:
+        raise ValueError(f"Unsupported KDF: {name}")
+
+    return kdf.derive(password)
+
+
+def _time_ms(params):
+    """Measure one derivation with the given parameters"""
+    start = time.perf_counter()
+    derive(b"calibration", b"\x00" * 16, params)
+    return (time.perf_counter() - start) * 1000
+
+
+def calibrate(name="pbkdf2", target_ms=500):
+    """
+    Pick KDF parameters that take about target_ms on this machine
+
+    Args:
+        name: KDF name, one of available_kdfs()
+        target_ms: Desired unlock time in milliseconds
+
+    Returns:
+        dict: KDF parameters for derive()
+    """
+    if name == "pbkdf2":
+        # Cost is linear in the iteration count
+        probe = {"name": "pbkdf2", "iterations": 20000}
+        per_iteration = _time_ms(probe) / probe["iterations"]
+        iterations = int(target_ms / max(per_iteration, 1e-9))
+        iterations = max(MIN_PBKDF2_ITERATIONS, iterations // 1000 * 1000)
+        return {"name": "pbkdf2", "iterations": iterations}
+
+    if name == "scrypt":
+        # Cost doubles with each power of two of N
+        n = MIN_SCRYPT_N
+        elapsed = _time_ms({"name": "scrypt", "n": n})
+        while elapsed * 2 <= target_ms and n < MAX_SCRYPT_N:
+            n *= 2
+            elapsed *= 2
+        return {"name": "scrypt", "n": n, "r": SCRYPT_R, "p": SCRYPT_P}
+
+    if name == "argon2id":
+        # Fixed memory cost, time cost scaled by iterations
+        probe = {
+            "name": "argon2id",
+            "iterations": 1,
+            "lanes": ARGON2_LANES,
+            "memory_cost": ARGON2_MEMORY_KIB,
+        }
+        per_iteration = _time_ms(probe)
+        probe["iterations"] = max(MIN_ARGON2_ITERATIONS, round(target_ms / max(per_iteration, 1e-9)))
+        return probe
+
+    raise ValueError(f"Unsupported KDF: {name}")
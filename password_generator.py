@@ -2,9 +2,14 @@
 Password generation module
 """
 
-import secrets
+import math
+import os
 import string
 import random
+from array import array
+
+# Most random bytes drawn from os.urandom at once
+ENTROPY_BLOCK_SIZE = 64 * 1024
 
 class PasswordGenerator:
     def __init__(self):
@@ -15,6 +20,9 @@ class PasswordGenerator:
             'digits': string.digits,
             'special': "!@#$%^&*()_+-=[]{}|;:,.<>?"
         }
+        
+        # alphabet -> sampling table, see _sampling_table
+        self._sampling_tables = {}
     
     def generate(self, length=16, use_upper=True, use_lower=True, 
                 use_digits=True, use_special=True):
@@ -31,6 +39,39 @@ class PasswordGenerator:
         Returns:
             str: Generated password
         """
+        return next(self.generate_batch(
+            1,
+            length=length,
+            use_upper=use_upper,
+            use_lower=use_lower,
+            use_digits=use_digits,
+            use_special=use_special
+        ))
+    
+    def generate_batch(self, count, length=16, use_upper=True, use_lower=True,
+                       use_digits=True, use_special=True):
+        """
+        Generate many random passwords
+        
+        Random bytes are drawn from os.urandom in blocks and mapped to the
+        alphabet by rejection sampling: bytes at or above the largest
+        multiple of the alphabet size are dropped, so every character is
+        equally likely. Mapping and dropping both run in bytes.translate.
+        Candidates missing one of the selected character classes are
+        rejected as a whole, which keeps the result uniform over all
+        passwords that contain every class.
+        
+        Args:
+            count: Number of passwords
+            length: Password length (8-64)
+            use_upper: Include uppercase letters
+            use_lower: Include lowercase letters
+            use_digits: Include digits
+            use_special: Include special characters
+            
+        Yields:
+            str: Generated passwords, produced as they are consumed
+        """
         # Validate length
         if length < 8:
             length = 8
@@ -52,132 +93,179 @@ class PasswordGenerator:
         if not char_sets:
             char_sets = [self.character_sets['lower'] + self.character_sets['upper']]
         
-        # Generate password
-        password = []
-        
-        # Ensure at least one character from each selected set
-        for char_set in char_sets:
-            password.append(secrets.choice(char_set))
+        alphabet = ''.join(char_sets).encode('ascii')
+        if alphabet not in self._sampling_tables:
+            self._sampling_tables[alphabet] = self._sampling_table(alphabet)
+        table, rejected = self._sampling_tables[alphabet]
+        class_bytes = [char_set.encode('ascii') for char_set in char_sets]
         
-        # Fill remaining characters
-        all_chars = ''.join(char_sets)
-        for _ in range(length - len(password)):
-            password.append(secrets.choice(all_chars))
+        # Enough for the whole batch, with headroom for rejections
+        block_size = min(ENTROPY_BLOCK_SIZE, count * length * 2 + 64)
         
-        # Shuffle the password
-        secrets.SystemRandom().shuffle(password)
+        chars = b""
+        position = 0
+        produced = 0
+        while produced < count:
+            if len(chars) - position < length:
+                chars = chars[position:] + os.urandom(block_size).translate(table, rejected)
+                position = 0
+                continue
+            
+            candidate = chars[position:position + length]
+            position += length
+            
+            # Ensure at least one character from each selected set
+            if all(len(candidate.translate(None, char_set)) < length for char_set in class_bytes):
+                produced += 1
+                yield candidate.decode('ascii')
+    
+    @staticmethod
+    def _sampling_table(alphabet):
+        """
+        Build the byte mapping for unbiased sampling from an alphabet
         
-        return ''.join(password)
+        Returns:
+            tuple: (translate table, bytes to drop)
+        """
+        size = len(alphabet)
+        limit = 256 - 256 % size
+        table = bytes(alphabet[byte % size] if byte < limit else 0 for byte in range(256))
+        return table, bytes(range(limit, 256))
     
-    def estimate_strength(self, password):
+    def estimate_strength(self, password, user_inputs=None):
         """
         Estimate password strength
         
+        Counts the guesses an attacker needs, trying common passwords,
+        words, keyboard walks, dates and the like first. See strength.py.
+        
         Args:
             password: Password to evaluate
+            user_inputs: Words tied to the account, e.g. site and username
             
         Returns:
-            dict: Strength metrics
+            dict: Strength metrics, score is 0-4, strength and feedback
+                as before plus guesses and crack time estimates
         """
-        if not password:
-            return {"score": 0, "strength": "Very Weak", "feedback": []}
-        
-        score = 0
-        feedback = []
-        
-        # Length check
-        if len(password) >= 12:
-            score += 2
-        elif len(password) >= 8:
-            score += 1
-        else:
-            feedback.append("Password should be at least 8 characters long")
-        
-        # Character variety checks
-        has_upper = any(c.isupper() for c in password)
-        has_lower = any(c.islower() for c in password)
-        has_digit = any(c.isdigit() for c in password)
-        has_special = any(not c.isalnum() for c in password)
-        
-        if has_upper:
-            score += 1
-        else:
-            feedback.append("Add uppercase letters")
-        
-        if has_lower:
-            score += 1
-        else:
-            feedback.append("Add lowercase letters")
-        
-        if has_digit:
-            score += 1
-        else:
-            feedback.append("Add numbers")
-        
-        if has_special:
-            score += 1
-        else:
-            feedback.append("Add special characters")
-        
-        # Common patterns check (simplified)
-        common_patterns = ['123', 'abc', 'qwerty', 'password', 'admin']
-        if any(pattern in password.lower() for pattern in common_patterns):
-            score -= 1
-            feedback.append("Avoid common patterns")
-        
-        # Determine strength level
-        if score >= 6:
-            strength = "Very Strong"
-        elif score >= 5:
-            strength = "Strong"
-        elif score >= 4:
-            strength = "Good"
-        elif score >= 3:
-            strength = "Fair"
-        else:
-            strength = "Weak"
-        
-        return {
-            "score": score,
-            "strength": strength,
-            "feedback": feedback
-        }
+        # Loads the word lists, so only on first use
+        import strength
+        return strength.estimate_strength(password, user_inputs or ())
     
-    def generate_memorable(self, word_count=4, separator="-", capitalize=True):
+    def generate_memorable(self, word_count=4, separator="-", capitalize=True, wordlist=None):
         """
         Generate a memorable passphrase
         
         Args:
-            word_count: Number of words (3-6)
+            word_count: Number of words (3-12)
             separator: Word separator
             capitalize: Capitalize words
+            wordlist: Packaged list name or list file, the diceware list
+                if None
             
         Returns:
             str: Generated passphrase
         """
-        # Common word list (you can expand this)
-        word_list = [
-            'apple', 'banana', 'cherry', 'dragon', 'elephant', 'forest',
-            'garden', 'hammer', 'island', 'jungle', 'knight', 'lemon',
-            'mountain', 'ninja', 'orange', 'penguin', 'quasar', 'river',
-            'sunset', 'tiger', 'umbrella', 'volcano', 'water', 'xylophone',
-            'yellow', 'zebra', 'airplane', 'basket', 'candle', 'desert'
-        ]
-        
-        # Validate word count
-        if word_count < 3:
-            word_count = 3
-        elif word_count > 6:
-            word_count = 6
-        
-        # Select random words
-        words = secrets.sample(word_list, word_count)
-        
-        # Apply formatting
-        if capitalize:
-            words = [w.capitalize() for w in words]
-        
-        # Add random digit at the end
-        words.append(str(secrets.choice(string.digits)))
-        
-        return separator.join(words)
\ No newline at end of file
+        return next(self.generate_memorable_batch(
+            1,
+            word_count=word_count,
+            separator=separator,
+            capitalize=capitalize,
+            wordlist=wordlist
+        ))
+    
+    def generate_memorable_batch(self, count, word_count=4, separator="-", capitalize=True,
+                                 wordlist=None):
+        """
+        Generate many memorable passphrases
+        
+        Words are drawn independently and uniformly, repeats included, as
+        with dice. Random 16 or 32 bit values come from os.urandom in
+        blocks; values at or above the largest multiple of the list size
+        are dropped so every word is equally likely. Each passphrase ends
+        in a random digit. See memorable_entropy for the strength.
+        
+        Args:
+            count: Number of passphrases
+            word_count: Number of words (3-12)
+            separator: Word separator
+            capitalize: Capitalize words
+            wordlist: Packaged list name or list file, the diceware list
+                if None
+            
+        Yields:
+            str: Generated passphrases, produced as they are consumed
+        """
+        import wordlists
+        
+        words = wordlists.load(wordlist or wordlists.DEFAULT_WORDLIST)
+        word_count = self._clamp_word_count(word_count)
+        size = len(words)
+        
+        typecode = 'H' if size <= 1 << 16 else 'I'
+        span = 1 << (8 * array(typecode).itemsize)
+        limit = span - span % size
+        
+        digits = string.digits.encode('ascii')
+        if digits not in self._sampling_tables:
+            self._sampling_tables[digits] = self._sampling_table(digits)
+        digit_table, digit_rejected = self._sampling_tables[digits]
+        
+        # Enough for the whole batch, with headroom for rejections
+        block_values = min(ENTROPY_BLOCK_SIZE // 4, count * word_count * 2 + 16)
+        
+        indices = []
+        position = 0
+        digit_chars = b""
+        digit_position = 0
+        produced = 0
+        while produced < count:
+            if len(indices) - position < word_count:
+                values = array(typecode, os.urandom(block_values * array(typecode).itemsize))
+                indices = indices[position:] + [value % size for value in values if value < limit]
+                position = 0
+                continue
+            
+            if digit_position >= len(digit_chars):
+                digit_chars = os.urandom(min(block_values, count)).translate(digit_table, digit_rejected)
+                digit_position = 0
+                continue
+            
+            phrase = [words[index] for index in indices[position:position + word_count]]
+            position += word_count
+            
+            # Apply formatting
+            if capitalize:
+                phrase = [word.capitalize() for word in phrase]
+            
+            # Add random digit at the end
+            phrase.append(chr(digit_chars[digit_position]))
+            digit_position += 1
+            
+            produced += 1
+            yield separator.join(phrase)
+    
+    def memorable_entropy(self, word_count=4, wordlist=None):
+        """
+        Get the exact entropy of a generated passphrase
+        
+        Every word adds log2 of the list size and the trailing digit adds
+        log2(10). Capitalization and the separator are fixed, so they add
+        nothing.
+        
+        Args:
+            word_count: Number of words (3-12)
+            wordlist: Packaged list name or list file, the diceware list
+                if None
+            
+        Returns:
+            float: Entropy in bits
+        """
+        import wordlists
+        
+        words = wordlists.load(wordlist or wordlists.DEFAULT_WORDLIST)
+        return self._clamp_word_count(word_count) * words.entropy_bits + math.log2(len(string.digits))
+    
+    @staticmethod
+    def _clamp_word_count(word_count):
+        """Limit a passphrase word count to 3-12"""
+        return min(max(word_count, 3), 12)
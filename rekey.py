@@ -0,0 +1,256 @@
+"""
+Resumable re-encryption of the vault under a new data key
+"""
+
+import contextlib
+import itertools
+import json
+import os
+
+import storage
+import entry_cipher
+
+# Entries re-encrypted and checkpointed together
+REKEY_CHUNK_SIZE = 500
+
+# Checkpoint phases
+PHASE_COPY = "copy"
+PHASE_SWAP = "swap"
+
+
+class RekeyJob:
+    def __init__(self, auth_manager, db_manager, chunk_size=REKEY_CHUNK_SIZE):
+        """
+        Initialize re-key job
+
+        Master password changes only re-wrap the data key; this job rotates
+        the data key itself. Entries are streamed from the database in chunks, re-encrypted under
+        the new key and appended to a shadow log, so memory use does not grow
+        with the vault. A checkpoint written after every chunk lets an
+        interrupted run continue where it stopped. The shadow log replaces
+        the database in one atomic step at the end. The database write lock
+        is held for the whole run, so saves and deletes made meanwhile wait
+        and are then encrypted under the new key.
+
+        Args:
+            auth_manager: AuthManager unlocked with the current key
+            db_manager: Database manager holding the entries
+            chunk_size: Entries per re-encryption batch and checkpoint
+        """
+        self.auth_manager = auth_manager
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size
+        self.checkpoint_file = os.path.join(db_manager.data_dir, "rekey.json")
+        self.shadow_file = os.path.join(db_manager.data_dir, "passwords.rekey")
+
+    def pending(self):
+        """
+        Get the checkpoint of an interrupted run
+
+        Returns:
+            dict: Checkpoint, or None if no run is in progress
+        """
+        if not os.path.exists(self.checkpoint_file):
+            return None
+
+        try:
+            with open(self.checkpoint_file, 'r') as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            print(f"Error loading re-key checkpoint: {e}")
+            return None
+
+    def _save_checkpoint(self, checkpoint):
+        """Atomically write the checkpoint file"""
+        storage.atomic_write(self.checkpoint_file, json.dumps(checkpoint).encode('utf-8'))
+
+    def abandon(self):
+        """
+        Give up an interrupted run that has not reached the swap
+
+        The vault is untouched until the swap, so the old data key stays
+        valid.
+
+        Returns:
+            bool: False if the run is past the point of no return
+        """
+        checkpoint = self.pending()
+        if checkpoint and checkpoint["phase"] == PHASE_SWAP:
+            return False
+
+        self._discard()
+        return True
+
+    def _discard(self):
+        """Remove the checkpoint and shadow log"""
+        for path in (self.checkpoint_file, self.shadow_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def start(self, progress=None):
+        """
+        Re-encrypt the vault under a freshly generated data key
+
+        Args:
+            progress: Called with the number of entries copied after each
+                chunk; runs on the calling thread
+
+        Returns:
+            bool: True if the vault now uses the new key
+        """
+        if self.pending():
+            raise ValueError("A key rotation is already in progress")
+
+        new_key, auth_record = self.auth_manager.prepare_key_rotation()
+
+        # The new key is kept wrapped by the old one so a run interrupted
+        # before the swap can be resumed after the next unlock
+        checkpoint = {
+            "phase": PHASE_COPY,
+            "position": 0,
+            "shadow_size": 0,
+            "last_id": None,
+            "auth": auth_record,
+            "wrapped_key": self.auth_manager.wrap_key(new_key)
+        }
+        self._save_checkpoint(checkpoint)
+
+        return self._run(checkpoint, new_key, progress)
+
+    def recover(self):
+        """
+        Finish an interrupted run that had already reached the swap
+
+        Needs no key, so it runs at startup before anyone logs in. A run
+        interrupted while copying has to wait for resume().
+
+        Returns:
+            bool: True if a run was finished
+        """
+        checkpoint = self.pending()
+        if not checkpoint or checkpoint["phase"] != PHASE_SWAP:
+            return False
+
+        return self._finish(checkpoint, None)
+
+    def resume(self):
+        """
+        Continue an interrupted run after unlocking
+
+        Returns:
+            bool: True if a run was finished
+        """
+        checkpoint = self.pending()
+        if not checkpoint:
+            return False
+
+        new_key = self.auth_manager.unwrap_key(checkpoint["wrapped_key"])
+        if checkpoint["phase"] == PHASE_SWAP:
+            return self._finish(checkpoint, new_key)
+        return self._run(checkpoint, new_key)
+
+    def _run(self, checkpoint, new_key, progress=None):
+        """Copy the remaining entries into the shadow log, then swap"""
+        # Writers wait until the swap is done; one landing behind the copy
+        # would be missing from the shadow log, and one encrypted under
+        # the old key would be unreadable after it
+        with self.db_manager.write_lock:
+            return self._copy(checkpoint, new_key, progress)
+
+    def _copy(self, checkpoint, new_key, progress):
+        """Copy entries with the write lock held"""
+        shadow = storage.ShadowLog(self.shadow_file, checkpoint["shadow_size"])
+
+        try:
+            position = checkpoint["position"]
+            if shadow.size != checkpoint["shadow_size"]:
+                # Shadow log lost, ShadowLog started it over empty
+                position = 0
+
+            entries = self.db_manager.iter_entries(max(position - 1, 0))
+            with contextlib.closing(entries):
+                if position:
+                    # Re-read the last copied entry to check the order still holds
+                    previous = next(entries, None)
+                    if previous is None or previous["id"] != checkpoint["last_id"]:
+                        raise ValueError("Vault changed since the key rotation was interrupted")
+
+                while True:
+                    chunk = list(itertools.islice(entries, self.chunk_size))
+                    if not chunk:
+                        break
+
+                    self._copy_chunk(chunk, shadow, new_key, checkpoint["auth"]["cipher"])
+                    shadow.sync()
+
+                    position += len(chunk)
+                    checkpoint["position"] = position
+                    checkpoint["shadow_size"] = shadow.size
+                    checkpoint["last_id"] = chunk[-1]["id"]
+                    self._save_checkpoint(checkpoint)
+
+                    if progress:
+                        progress(position)
+
+        finally:
+            shadow.close()
+
+        checkpoint["phase"] = PHASE_SWAP
+        self._save_checkpoint(checkpoint)
+
+        return self._finish(checkpoint, new_key)
+
+    def _copy_chunk(self, chunk, shadow, new_key, cipher_name):
+        """Re-encrypt a chunk of entries and append them to the shadow log"""
+        tokens = []
+        associated_data = []
+        for entry in chunk:
+            for field in ("data", "meta"):
+                if entry[field] is not None:
+                    tokens.append(entry[field])
+                    associated_data.append(entry_cipher.associated_data(entry["id"], field))
+
+        rekeyed, errors = self.auth_manager.rekey_many(
+            tokens, new_key, cipher_name, associated_data=associated_data
+        )
+
+        index = 0
+        for entry in chunk:
+            fields = {}
+            for field in ("data", "meta"):
+                if field == "meta" and entry["meta"] is None:
+                    fields[field] = None
+                    continue
+
+                if index in errors:
+                    # Unreadable under the old key too, keep it unchanged
+                    print(f"Copying unreadable entry {entry['id']} unchanged: {errors[index]}")
+                    fields[field] = entry[field]
+                else:
+                    fields[field] = rekeyed[index]
+                index += 1
+
+            shadow.append(entry["id"], {
+                "data": fields["data"],
+                "meta": fields["meta"],
+                "created": entry["created"],
+                "modified": entry["modified"]
+            })
+
+    def _finish(self, checkpoint, new_key):
+        """
+        Swap in the shadow log and switch to the new data key
+
+        Every step is idempotent, so an interrupted swap is simply rerun.
+        """
+        with self.db_manager.write_lock:
+            self.db_manager.commit_shadow(self.shadow_file)
+
+            if not self.auth_manager.apply_auth_record(checkpoint["auth"]):
+                raise IOError("Could not save the new auth record")
+
+            if new_key is not None:
+                self.auth_manager.activate_key(new_key, checkpoint["auth"]["cipher"])
+
+        self._discard()
+        return True
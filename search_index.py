@@ -0,0 +1,375 @@
+"""
+In-memory search index for password entries
+"""
+
+import heapq
+import re
+import threading
+from collections import defaultdict
+
+# Searchable fields and their ranking weights
+SEARCH_FIELDS = (("website", 3), ("username", 2), ("url", 1))
+
+# Match quality ranks
+MATCH_EXACT = 4
+MATCH_PREFIX = 3
+MATCH_WORD_PREFIX = 2
+MATCH_SUBSTRING = 1
+
+NGRAM_SIZE = 3
+
+# Leading characters of fields and words indexed for prefix lookups;
+# longer prefixes also use the n-grams
+START_SIZE = NGRAM_SIZE
+
+# Removed entries left in the postings before they are rebuilt
+COMPACT_MIN_STALE = 1024
+
+# Field positions, highest weight first
+_FIELDS_BY_WEIGHT = sorted(range(len(SEARCH_FIELDS)), key=lambda field: -SEARCH_FIELDS[field][1])
+
+_START_SIZES = range(1, START_SIZE + 1)
+
+_WORD_SPLIT = re.compile(r"[^0-9a-z]+")
+_WORD = re.compile(r"[0-9a-z]+")
+
+
+def _append(postings, key, order):
+    """Add an entry to the postings of a key"""
+    entries = postings.get(key)
+    if entries is None:
+        postings[key] = [order]
+    else:
+        entries.append(order)
+
+
+def _ngrams_of(value):
+    """Get the set of n-grams in a value"""
+    return {value[i:i + NGRAM_SIZE] for i in range(len(value) - NGRAM_SIZE + 1)}
+
+
+class FieldPostings:
+    def __init__(self):
+        """
+        Initialize the postings of one searchable field
+
+        Postings are lists of entry insertion orders. Entries are only
+        ever appended with a higher order than any before, so every list
+        stays sorted without sorting it.
+        """
+        # value -> entries with exactly that value
+        self.exact = {}
+        # first 1 to START_SIZE characters -> entries
+        self.starts = {}
+        # first 1 to START_SIZE characters of any word -> entries
+        self.word_starts = {}
+        # n-gram -> entries containing it
+        self.ngrams = {}
+        # string shorter than an n-gram -> n-grams containing it
+        self.ngram_parts = {}
+        # Entries with a value too short to hold an n-gram
+        self.short = []
+
+    def add(self, value, words, order):
+        """Index one entry's value of this field"""
+        if not value:
+            return
+
+        _append(self.exact, value, order)
+        for start in {value[:size] for size in _START_SIZES}:
+            _append(self.starts, start, order)
+        for start in {word[:size] for word in words for size in _START_SIZES}:
+            _append(self.word_starts, start, order)
+
+        if len(value) < NGRAM_SIZE:
+            self.short.append(order)
+            return
+
+        for gram in _ngrams_of(value):
+            if gram not in self.ngrams:
+                self.ngrams[gram] = []
+                self._add_parts(gram)
+            self.ngrams[gram].append(order)
+
+    def add_many(self, items):
+        """
+        Index many values into empty postings
+
+        Same result as add() for each item, several times faster.
+
+        Args:
+            items: (value, words, order) tuples in increasing order
+        """
+        exact = defaultdict(list)
+        starts = defaultdict(list)
+        word_starts = defaultdict(list)
+        ngrams = defaultdict(list)
+        short = self.short
+
+        for value, words, order in items:
+            if not value:
+                continue
+
+            exact[value].append(order)
+            for start in {value[:size] for size in _START_SIZES}:
+                starts[start].append(order)
+            for start in {word[:size] for word in words for size in _START_SIZES}:
+                word_starts[start].append(order)
+
+            if len(value) < NGRAM_SIZE:
+                short.append(order)
+                continue
+            for gram in _ngrams_of(value):
+                ngrams[gram].append(order)
+
+        # Plain dicts, so lookups of missing keys add nothing
+        self.exact = dict(exact)
+        self.starts = dict(starts)
+        self.word_starts = dict(word_starts)
+        self.ngrams = dict(ngrams)
+        for gram in self.ngrams:
+            self._add_parts(gram)
+
+    def _add_parts(self, gram):
+        """Register a new n-gram under the shorter strings it contains"""
+        parts = set()
+        for size in range(1, NGRAM_SIZE):
+            for i in range(NGRAM_SIZE - size + 1):
+                parts.add(gram[i:i + size])
+        for part in parts:
+            _append(self.ngram_parts, part, gram)
+
+
+class SearchIndex:
+    def __init__(self):
+        """
+        Initialize search index
+
+        Entries rank by their best match: a field equal to the query, then
+        a field starting with it, then a word starting with it, then a
+        field containing it. Ties go to the higher weighted field, then to
+        insertion order. Each of these tiers is read from per-field
+        postings kept in insertion order, walking the shortest list that
+        must hold every match, so a search with a limit stops as soon as
+        enough entries are found instead of scoring the rest.
+
+        Removed entries stay in the postings and are skipped until enough
+        of them pile up to rebuild.
+        """
+        # entry_id -> tuple of normalized field values
+        self.fields = {}
+        # entry_id -> tuple of word tuples, one per field
+        self.words = {}
+        # entry_id -> insertion order
+        self.order = {}
+
+        # insertion order -> entry_id, live entries only, in order
+        self._entries = {}
+        self._postings = tuple(FieldPostings() for _ in SEARCH_FIELDS)
+        self._stale = 0
+        self._sequence = 0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _normalize(entry):
+        """Get lowercase searchable field values of an entry"""
+        return tuple(str(entry.get(name) or '').lower() for name, _ in SEARCH_FIELDS)
+
+    @staticmethod
+    def _words_of(value):
+        """Get the words of a value"""
+        return tuple(word for word in _WORD_SPLIT.split(value) if word)
+
+    def build(self, entries):
+        """
+        Rebuild the index from a list of decrypted entries
+        """
+        # Later duplicates replace earlier ones, as with add()
+        unique = {}
+        for entry in entries:
+            entry_id = entry.get("id")
+            if entry_id:
+                unique.pop(entry_id, None)
+                unique[entry_id] = entry
+
+        items = []
+        for entry_id, entry in unique.items():
+            fields = self._normalize(entry)
+            items.append((entry_id, fields, tuple(self._words_of(value) for value in fields)))
+
+        with self._lock:
+            self.clear()
+            self._index_many(items)
+
+    def add(self, entry):
+        """
+        Add or replace an entry
+        """
+        entry_id = entry.get("id")
+        if not entry_id:
+            return
+
+        fields = self._normalize(entry)
+        with self._lock:
+            self._index(entry_id, fields, tuple(self._words_of(value) for value in fields))
+
+    def _index(self, entry_id, fields, words):
+        """Index normalized fields under the next insertion order"""
+        if entry_id in self.fields:
+            self.remove(entry_id)
+
+        order = self._sequence
+        self._sequence += 1
+
+        self.fields[entry_id] = fields
+        self.words[entry_id] = words
+        self.order[entry_id] = order
+        self._entries[order] = entry_id
+
+        for postings, value, value_words in zip(self._postings, fields, words):
+            postings.add(value, value_words, order)
+
+    def remove(self, entry_id):
+        """
+        Remove an entry
+        """
+        with self._lock:
+            if entry_id not in self.fields:
+                return
+
+            del self.fields[entry_id]
+            del self.words[entry_id]
+            del self._entries[self.order.pop(entry_id)]
+
+            self._stale += 1
+            if self._stale >= max(COMPACT_MIN_STALE, len(self._entries)):
+                self._rebuild()
+
+    def _index_many(self, items):
+        """Index (entry_id, fields, words) of new entries into empty postings"""
+        rows = []
+        for entry_id, fields, words in items:
+            order = self._sequence
+            self._sequence += 1
+
+            self.fields[entry_id] = fields
+            self.words[entry_id] = words
+            self.order[entry_id] = order
+            self._entries[order] = entry_id
+            rows.append((fields, words, order))
+
+        for field, postings in enumerate(self._postings):
+            postings.add_many((fields[field], words[field], order) for fields, words, order in rows)
+
+    def _rebuild(self):
+        """Drop removed entries from the postings"""
+        live = [(entry_id, self.fields[entry_id], self.words[entry_id]) for entry_id in self._entries.values()]
+        self.clear()
+        self._index_many(live)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self.fields = {}
+            self.words = {}
+            self.order = {}
+            self._entries = {}
+            self._postings = tuple(FieldPostings() for _ in SEARCH_FIELDS)
+            self._stale = 0
+            self._sequence = 0
+
+    def _candidates(self, kind, field, query):
+        """
+        Get entries that may match the query in one tier, in order
+
+        Returns the shortest posting list every match must be in; short
+        substring queries merge the lists of the n-grams containing them,
+        or walk all entries when those would cover most of the index.
+        """
+        postings = self._postings[field]
+
+        if kind == MATCH_EXACT:
+            return postings.exact.get(query, ())
+
+        lists = []
+        if kind == MATCH_PREFIX:
+            lists.append(postings.starts.get(query[:START_SIZE]))
+        elif kind == MATCH_WORD_PREFIX:
+            # Words only hold letters and digits
+            if not _WORD.fullmatch(query):
+                return ()
+            lists.append(postings.word_starts.get(query[:START_SIZE]))
+
+        if len(query) >= NGRAM_SIZE:
+            for i in range(len(query) - NGRAM_SIZE + 1):
+                lists.append(postings.ngrams.get(query[i:i + NGRAM_SIZE]))
+        elif kind == MATCH_SUBSTRING:
+            lists = [postings.ngrams[gram] for gram in postings.ngram_parts.get(query, ())]
+            lists.append(postings.short)
+            if sum(map(len, lists)) > len(self._entries):
+                return self._entries
+            return heapq.merge(*lists)
+
+        if not all(lists):
+            return ()
+        return min(lists, key=len)
+
+    def _collect(self, kind, field, query, ranked, seen, limit):
+        """
+        Append the entries matching in one tier that ranked no higher
+
+        Returns:
+            bool: True once limit entries are ranked
+        """
+        fields = self.fields
+        if kind == MATCH_EXACT:
+            matches = None
+        elif kind == MATCH_PREFIX:
+            matches = lambda entry_id: fields[entry_id][field].startswith(query)
+        elif kind == MATCH_WORD_PREFIX:
+            words = self.words
+            matches = lambda entry_id: any(word.startswith(query) for word in words[entry_id][field])
+        else:
+            matches = lambda entry_id: query in fields[entry_id][field]
+
+        entries = self._entries
+        for order in self._candidates(kind, field, query):
+            entry_id = entries.get(order)
+            if entry_id is None or entry_id in seen:
+                continue
+            if matches is not None and not matches(entry_id):
+                continue
+
+            seen.add(entry_id)
+            ranked.append(entry_id)
+            if limit is not None and len(ranked) >= limit:
+                return True
+        return False
+
+    def search(self, query, limit=None):
+        """
+        Search entries
+
+        Every entry with a field containing the query matches; fields that
+        equal or start with it, or have a word starting with it, rank
+        first.
+
+        Args:
+            query: Search term
+            limit: Maximum number of results
+
+        Returns:
+            list: Matching entry IDs, best match first
+        """
+        query = query.strip().lower()
+        if not query or (limit is not None and limit <= 0):
+            return []
+
+        ranked = []
+        seen = set()
+        with self._lock:
+            for kind in (MATCH_EXACT, MATCH_PREFIX, MATCH_WORD_PREFIX, MATCH_SUBSTRING):
+                for field in _FIELDS_BY_WEIGHT:
+                    if self._collect(kind, field, query, ranked, seen, limit):
+                        return ranked
+        return ranked
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+SecurePass Manager - Command Line Interface
+
+Runs without a display. Only the modules a command needs are imported, so
+generating passwords never touches the vault or the crypto stack.
+
+Examples:
+    securepass.py unlock
+    securepass.py --json search github
+    securepass.py get github --field password
+    securepass.py add --website example.com --username me --generate
+    securepass.py generate --length 24 --count 5
+    securepass.py generate --words 6 --count 5
+
+The master password is read from SECUREPASS_PASSWORD, from the first line
+of stdin with --password-stdin, or prompted for. Secrets are never taken
+as arguments, where other users could read them from the process list:
+`add` without --generate prompts for the entry password, or reads it from
+the next line of stdin with --password-stdin.
+
+With `securepass.py agent` running, vault commands are answered by the
+agent instead, which keeps the vault unlocked between calls.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+# Exit codes
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_LOCKED = 3
+
+PASSWORD_ENV = "SECUREPASS_PASSWORD"
+
+
+class CLIError(Exception):
+    """Error reported to the user with an exit code"""
+
+    def __init__(self, message, code=EXIT_ERROR):
+        super().__init__(message)
+        self.code = code
+
+
+def read_stdin_line():
+    """Read one line of stdin without its line ending"""
+    return sys.stdin.readline().rstrip("\r\n")
+
+
+def read_master_password(args):
+    """
+    Get the master password without echoing it
+    """
+    if args.password_stdin:
+        return args.stdin_master_password
+
+    password = os.environ.get(PASSWORD_ENV)
+    if password is not None:
+        return password
+
+    import getpass
+    return getpass.getpass("Master password: ")
+
+
+def load_config(args):
+    """
+    Load the configuration of an existing vault
+    """
+    import utils
+
+    config = utils.ConfigManager(args.config_dir)
+    if not config.get('auth', 'salt'):
+        raise CLIError("No vault found, create one in the desktop app first", EXIT_LOCKED)
+    return config
+
+
+def open_vault(args):
+    """
+    Open and unlock the vault
+    """
+    import storage
+    import vault
+
+    try:
+        opened = vault.Vault(load_config(args), args.data_dir)
+    except storage.StoreLockedError as e:
+        # Without --no-agent a running agent would have answered already
+        hint = "drop --no-agent to go through the agent" if args.no_agent else "close it first"
+        raise CLIError(f"{e}; {hint}")
+    try:
+        if not opened.unlock(read_master_password(args)):
+            raise CLIError("Invalid password or corrupted data", EXIT_LOCKED)
+
+        if opened.resume_key_rotation() is False:
+            print("Warning: an interrupted encryption key rotation could not be completed",
+                  file=sys.stderr)
+    except BaseException:
+        opened.close()
+        raise
+
+    return opened
+
+
+def connect_agent(args):
+    """
+    Connect to a running agent and make sure it is unlocked
+
+    Returns:
+        AgentClient: Connected client, or None if no agent is running
+    """
+    if args.no_agent:
+        return None
+
+    import agent
+
+    client = agent.AgentClient.connect(args.agent_socket)
+    if client is None:
+        return None
+
+    try:
+        if client.status()["locked"] and not client.unlock(read_master_password(args)):
+            raise CLIError("Invalid password or corrupted data", EXIT_LOCKED)
+    except BaseException:
+        client.close()
+        raise
+
+    return client
+
+
+def emit(args, result, text=None):
+    """
+    Print a command result as JSON or as text lines
+    """
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    elif text is not None:
+        for line in text:
+            print(line)
+
+
+def format_entry_line(entry):
+    """One line listing of an entry"""
+    return f"{entry['id']}  {entry.get('website', '')}  {entry.get('username', '')}"
+
+
+def find_entry_id(opened, query):
+    """
+    Resolve an entry ID or a search term matching exactly one entry
+    """
+    if opened.has_entry(query):
+        return query
+
+    matches = opened.search(query)
+    if not matches:
+        raise CLIError(f"No entry matches '{query}'")
+    if len(matches) > 1:
+        listing = "\n".join(format_entry_line(entry) for entry in matches)
+        raise CLIError(f"'{query}' matches {len(matches)} entries, use an ID:\n{listing}")
+
+    return matches[0]["id"]
+
+
+def cmd_unlock(args, opened):
+    """Check the master password"""
+    count = len(opened.get_all_passwords())
+    emit(args, {"unlocked": True, "entries": count}, [f"Unlocked, {count} entries"])
+
+
+def cmd_get(args, opened):
+    """Show a single entry"""
+    entry = opened.get_entry(find_entry_id(opened, args.entry))
+    if entry is None:
+        raise CLIError(f"Could not read entry '{args.entry}'")
+
+    if args.field:
+        if args.field not in entry:
+            raise CLIError(f"Entry has no field '{args.field}'")
+        emit(args, {args.field: entry[args.field]}, [str(entry[args.field])])
+    else:
+        emit(args, entry, [f"{key}: {value}" for key, value in entry.items()])
+
+
+def read_entry_password(args):
+    """
+    Get the password of a new entry without echoing it
+
+    With --password-stdin it is the line after the master password.
+    """
+    if args.password_stdin:
+        return read_stdin_line()
+
+    import getpass
+    return getpass.getpass("Entry password: ")
+
+
+def cmd_add(args, opened):
+    """Add an entry"""
+    if args.generate:
+        password = opened.generate_password(length=args.length)
+    else:
+        password = read_entry_password(args)
+    if not password:
+        raise CLIError("Empty password, enter one or give --generate", EXIT_USAGE)
+
+    entry_id = opened.save_entry({
+        "website": args.website,
+        "username": args.username,
+        "url": args.url,
+        "password": password,
+        "notes": args.notes
+    })
+    if entry_id is None:
+        raise CLIError("Failed to save entry")
+
+    result = {"id": entry_id}
+    lines = [entry_id]
+    if args.generate:
+        result["password"] = password
+        lines.append(password)
+    emit(args, result, lines)
+
+
+def cmd_delete(args, opened):
+    """Delete an entry by ID"""
+    if not opened.delete_entry(args.entry_id):
+        raise CLIError(f"No entry with ID '{args.entry_id}'")
+    emit(args, {"deleted": args.entry_id}, [f"Deleted {args.entry_id}"])
+
+
+def cmd_search(args, opened):
+    """List entries matching a search term"""
+    matches = opened.search(args.query, args.limit)
+    emit(args, matches, [format_entry_line(entry) for entry in matches])
+
+
+def cmd_export(args, opened):
+    """Export the encrypted database"""
+    if not opened.export_data(args.path):
+        raise CLIError(f"Export to '{args.path}' failed")
+    emit(args, {"exported": args.path}, [f"Exported to {args.path}"])
+
+
+def cmd_import(args, opened):
+    """Import an encrypted database export"""
+    if not opened.import_data(args.path):
+        raise CLIError(f"Import from '{args.path}' failed")
+    count = len(opened.get_all_passwords())
+    emit(args, {"imported": args.path, "entries": count},
+         [f"Imported {args.path}, {count} entries"])
+
+
+def cmd_audit(args, opened):
+    """Report reused, similar, weak and stale passwords"""
+    report = opened.audit()
+
+    def describe(item):
+        return f"{item['id']}  {item['website']}  {item['username']}"
+
+    lines = [f"{report['total']} entries, {report['rescored']} rescored"]
+    for title, key in (("Reused", "reused"), ("Similar", "similar")):
+        lines.append(f"\n{title} passwords: {len(report[key])} groups")
+        for number, group in enumerate(report[key], 1):
+            lines.extend(f"  {number if index == 0 else '':>2}  {describe(item)}"
+                         for index, item in enumerate(group))
+    lines.append(f"\nWeak passwords: {len(report['weak'])}")
+    lines.extend(f"  {describe(item)}  {item['strength']}" for item in report["weak"])
+    lines.append(f"\nNot changed in a long time: {len(report['stale'])}")
+    lines.extend(f"  {describe(item)}  {item['age_days']} days" for item in report["stale"])
+    emit(args, report, lines)
+
+
+def cmd_breaches(args, opened):
+    """Report passwords found in a local breached password corpus"""
+    report = opened.check_breaches(args.corpus)
+
+    lines = [f"{report['checked']} passwords checked, {len(report['breached'])} found in breaches"]
+    lines.extend(
+        f"  {item['id']}  {item['website']}  {item['username']}  seen {item['count']} times"
+        for item in report["breached"]
+    )
+    emit(args, report, lines)
+
+
+def cmd_generate(args):
+    """
+    Generate passwords without opening the vault
+
+    Passwords are written as they are generated, so large counts run in
+    constant memory. With --words, diceware passphrases are generated
+    instead and their entropy is reported on stderr.
+    """
+    import password_generator
+
+    generator = password_generator.PasswordGenerator()
+    if args.words:
+        try:
+            bits = generator.memorable_entropy(args.words, wordlist=args.wordlist)
+        except (IOError, ValueError) as e:
+            raise CLIError(f"Cannot load word list: {e}")
+        passwords = generator.generate_memorable_batch(
+            args.count,
+            word_count=args.words,
+            separator=args.separator,
+            capitalize=not args.no_capitalize,
+            wordlist=args.wordlist
+        )
+        print(f"{bits:.1f} bits of entropy per passphrase", file=sys.stderr)
+    else:
+        passwords = generator.generate_batch(
+            args.count,
+            length=args.length,
+            use_upper=not args.no_upper,
+            use_lower=not args.no_lower,
+            use_digits=not args.no_digits,
+            use_special=not args.no_special
+        )
+
+    write = sys.stdout.write
+    if args.json:
+        # Streamed JSON array, one password per line
+        separator = "[\n  "
+        for password in passwords:
+            write(separator + json.dumps(password))
+            separator = ",\n  "
+        write("\n]\n" if separator != "[\n  " else "[]\n")
+    else:
+        for password in passwords:
+            write(password + "\n")
+
+
+def cmd_agent(args):
+    """Run or control the unlock agent"""
+    import agent
+
+    if not agent.AGENT_SUPPORTED:
+        raise CLIError("The agent needs Unix domain sockets")
+
+    if args.action == "start":
+        opened = open_vault(args)
+        try:
+            agent.VaultAgent(opened, args.agent_socket).run()
+        finally:
+            opened.close()
+        return
+
+    client = agent.AgentClient.connect(args.agent_socket)
+    if client is None:
+        raise CLIError("No agent is running")
+
+    try:
+        if args.action == "status":
+            status = client.status()
+            state = "locked" if status["locked"] else "unlocked"
+            emit(args, status, [f"Agent is {state}, idle lock after {status['lock_timeout']}s"])
+        elif args.action == "lock":
+            client.lock()
+            emit(args, {"locked": True}, ["Agent locked"])
+        else:
+            client.stop()
+            emit(args, {"stopped": True}, ["Agent stopped"])
+    finally:
+        client.close()
+
+
+def build_parser():
+    """
+    Build the argument parser
+    """
+    parser = argparse.ArgumentParser(prog="securepass", description="SecurePass Manager command line")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--config-dir", default=".", help="directory holding config.json")
+    parser.add_argument("--data-dir", default="data", help="directory holding the database")
+    parser.add_argument("--password-stdin", action="store_true",
+                        help="read the master password from the first line of stdin")
+    parser.add_argument("--agent-socket", help="unlock agent socket path")
+    parser.add_argument("--no-agent", action="store_true",
+                        help="open the vault directly even if an agent is running")
+
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    command = commands.add_parser("unlock", help="check the master password")
+    command.set_defaults(func=cmd_unlock)
+
+    command = commands.add_parser("get", help="show an entry")
+    command.add_argument("entry", help="entry ID or a search term matching one entry")
+    command.add_argument("--field", help="print only this field, e.g. password")
+    command.set_defaults(func=cmd_get)
+
+    command = commands.add_parser("add", help="add an entry")
+    command.add_argument("--website", required=True)
+    command.add_argument("--username", required=True)
+    command.add_argument("--generate", action="store_true",
+                         help="generate the password instead of reading it")
+    command.add_argument("--length", type=int, default=16, help="generated password length")
+    command.add_argument("--url", default="")
+    command.add_argument("--notes", default="")
+    command.set_defaults(func=cmd_add)
+
+    command = commands.add_parser("delete", help="delete an entry")
+    command.add_argument("entry_id")
+    command.set_defaults(func=cmd_delete)
+
+    command = commands.add_parser("search", help="search entries")
+    command.add_argument("query")
+    command.add_argument("--limit", type=int)
+    command.set_defaults(func=cmd_search)
+
+    command = commands.add_parser("audit", help="find reused, similar, weak and stale passwords")
+    command.set_defaults(func=cmd_audit)
+
+    command = commands.add_parser("breaches", help="check passwords against a local breach corpus")
+    command.add_argument("--corpus", help="sorted SHA-1 or NTLM hash file, default breach.corpus_file")
+    command.set_defaults(func=cmd_breaches)
+
+    command = commands.add_parser("generate", help="generate passwords")
+    command.add_argument("--length", type=int, default=16)
+    command.add_argument("--count", type=int, default=1, help="number of passwords, streamed")
+    command.add_argument("--no-upper", action="store_true")
+    command.add_argument("--no-lower", action="store_true")
+    command.add_argument("--no-digits", action="store_true")
+    command.add_argument("--no-special", action="store_true")
+    command.add_argument("--words", type=int, help="generate passphrases of this many words (3-12)")
+    command.add_argument("--wordlist", help="passphrase word list name or file, default diceware")
+    command.add_argument("--separator", default="-", help="passphrase word separator")
+    command.add_argument("--no-capitalize", action="store_true", help="keep passphrase words lowercase")
+    command.set_defaults(func=cmd_generate, needs_vault=False)
+
+    command = commands.add_parser("export", help="export the encrypted database")
+    command.add_argument("path")
+    command.set_defaults(func=cmd_export)
+
+    command = commands.add_parser("import", help="import an encrypted database export")
+    command.add_argument("path")
+    command.set_defaults(func=cmd_import)
+
+    command = commands.add_parser("agent", help="keep the vault unlocked for other commands")
+    command.add_argument("action", nargs="?", default="start",
+                         choices=("start", "status", "lock", "stop"))
+    command.set_defaults(func=cmd_agent, needs_vault=False)
+
+    return parser
+
+
+def main(argv=None):
+    """Command line entry point"""
+    args = build_parser().parse_args(argv)
+
+    try:
+        if not getattr(args, "needs_vault", True):
+            args.func(args)
+            return EXIT_OK
+
+        if args.password_stdin:
+            # Read up front, as an unlocked agent does not need it and the
+            # next line may be an entry password
+            args.stdin_master_password = read_stdin_line()
+
+        opened = connect_agent(args) or open_vault(args)
+        try:
+            args.func(args, opened)
+        finally:
+            # Commits buffered writes, or just disconnects from the agent
+            opened.close()
+
+        return EXIT_OK
+
+    except CLIError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return e.code
+    except KeyboardInterrupt:
+        return EXIT_ERROR
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+
+if __name__ == "__main__":
+    # Needed for batch crypto worker processes in the frozen executable
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Startup time budget and import time report
+
+    python main.py --startup-report [--budget-ms 800] [--top 15]
+
+Starts the application in a child process under -X importtime, waits until
+the login window has painted and reports the time taken, the slowest
+imports and any module that should have been loaded lazily.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Time from process start until the login window has painted
+STARTUP_BUDGET_MS = 800
+
+# Modules that must not load before the first paint
+LAZY_MODULES = ("vault", "auth", "cryptography", "pyperclip", "clipboard", "password_generator",
+                "strength", "frequency_lists", "wordlists")
+
+PROBE_FLAG = "--startup-probe"
+REPORT_FLAG = "--startup-report"
+
+# Parent wall clock time at spawn, passed to the probe
+T0_ENV = "SECUREPASS_STARTUP_T0"
+PAINT_MARKER = "first_paint_ms="
+
+
+def finish_probe(root):
+    """
+    Paint the window, print the time since spawn and close it
+    """
+    root.update()
+    t0 = float(os.environ.get(T0_ENV) or time.time())
+    print(f"{PAINT_MARKER}{(time.time() - t0) * 1000:.1f}", flush=True)
+    root.destroy()
+
+
+def parse_importtime(output):
+    """
+    Parse -X importtime output
+
+    Returns:
+        list: (name, self us, cumulative us, depth) per imported module
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+
+        try:
+            self_us = int(parts[0])
+            cumulative_us = int(parts[1])
+        except ValueError:
+            # Column header
+            continue
+
+        raw_name = parts[2].rstrip()
+        name = raw_name.lstrip()
+        depth = (len(raw_name) - len(name) - 1) // 2
+        imports.append((name, self_us, cumulative_us, depth))
+
+    return imports
+
+
+def report(budget_ms=STARTUP_BUDGET_MS, top=15):
+    """
+    Measure startup and print the import time report
+
+    Returns:
+        int: Exit code, 0 if startup is within budget
+    """
+    if getattr(sys, "frozen", False):
+        print("The startup report needs a source checkout, -X importtime is unavailable")
+        return 1
+
+    main_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    env = dict(os.environ)
+    env[T0_ENV] = repr(time.time())
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", main_script, PROBE_FLAG],
+        env=env, stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=120
+    )
+
+    first_paint_ms = None
+    for line in result.stdout.splitlines():
+        if line.startswith(PAINT_MARKER):
+            first_paint_ms = float(line[len(PAINT_MARKER):])
+
+    if first_paint_ms is None:
+        errors = [line for line in result.stderr.splitlines()
+                  if not line.startswith("import time:")]
+        print("Startup probe did not paint a window:")
+        print("\n".join(errors[-20:]) or f"exit code {result.returncode}")
+        return 1
+
+    imports = parse_importtime(result.stderr)
+    top_level = sorted((entry for entry in imports if entry[3] == 0),
+                       key=lambda entry: entry[2], reverse=True)
+    import_ms = sum(entry[2] for entry in top_level) / 1000
+
+    print(f"{'module':<40}{'cumulative ms':>15}{'self ms':>10}")
+    for name, self_us, cumulative_us, depth in top_level[:top]:
+        print(f"{name:<40}{cumulative_us / 1000:>15.1f}{self_us / 1000:>10.1f}")
+
+    print(f"\nImports before first paint: {len(imports)} modules, {import_ms:.1f} ms")
+    print(f"First paint: {first_paint_ms:.1f} ms (budget {budget_ms} ms)")
+
+    loaded = {entry[0].split(".")[0] for entry in imports}
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    if eager:
+        print(f"Loaded before first paint but meant to be lazy: {', '.join(eager)}")
+
+    if first_paint_ms > budget_ms or eager:
+        print("Startup budget exceeded")
+        return 1
+
+    print("Startup within budget")
+    return 0
+
+
+def main(argv):
+    """Parse report options and run the report"""
+    parser = argparse.ArgumentParser(prog="main.py " + REPORT_FLAG)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args([arg for arg in argv if arg != REPORT_FLAG])
+    return report(args.budget_ms, args.top)
@@ -0,0 +1,665 @@
+"""
+Append-only log-structured storage engine
+"""
+
+import os
+import pickle
+import struct
+import threading
+import zlib
+
+import vault_file
+
+# Record types
+RECORD_PUT = 1
+RECORD_DELETE = 2
+# First record of a log, naming the generation of the snapshot it extends
+RECORD_SNAPSHOT = 3
+
+# Record header: type, crc32 of payload, payload length
+RECORD_HEADER = struct.Struct("<BII")
+
+# Held by the one process allowed to write a data directory
+LOCK_FILE = ".lock"
+
+
+class StoreLockedError(OSError):
+    """The data directory is open in another process"""
+
+
+def fsync_directory(path):
+    """
+    Make a rename inside a directory durable
+
+    Not supported on Windows, where renames are durable once they return.
+    """
+    if os.name == 'nt':
+        return
+
+    fd = os.open(path or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, data):
+    """
+    Replace a file with new contents so a crash leaves either version
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+    fsync_directory(os.path.dirname(path))
+
+
+def new_generation():
+    """Pick a random snapshot generation"""
+    return int.from_bytes(os.urandom(8), 'little') or 1
+
+
+def iter_log_records(path):
+    """
+    Stream (entry_id, value) pairs of the put records in a log file
+
+    Reads one record at a time and stops at a torn or corrupted tail.
+    """
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+
+            record_type, crc, length = RECORD_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return
+
+            entry_id, value = pickle.loads(payload)
+            if record_type == RECORD_PUT:
+                yield entry_id, value
+
+
+class DirectoryLock:
+    def __init__(self, directory):
+        """
+        Take the exclusive writer lock of a data directory
+
+        The lock belongs to the open file, so it is released when the
+        process exits, however it ends.
+
+        Raises:
+            StoreLockedError: If another process holds the lock
+        """
+        self.path = os.path.join(directory, LOCK_FILE)
+        self._file = open(self.path, 'a+b')
+
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._file.close()
+            raise StoreLockedError(
+                f"The data in {directory} is in use by another SecurePass process, "
+                "e.g. the app or the unlock agent"
+            )
+
+    def release(self):
+        """Release the lock"""
+        if not self._file.closed:
+            # Closing the file drops the lock
+            self._file.close()
+
+
+class FlushTimer:
+    def __init__(self, callback, delay):
+        """
+        Run a flush callback once, delay seconds after the first request
+
+        Requests made while a flush is pending are folded into it.
+        """
+        self.callback = callback
+        self.delay = delay
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def schedule(self):
+        """Request a flush"""
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._fire)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _fire(self):
+        """Timer callback"""
+        with self._lock:
+            self._timer = None
+
+        try:
+            self.callback()
+        except Exception as e:
+            print(f"Error flushing writes: {e}")
+
+    def cancel(self):
+        """Drop a pending flush request"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+class ShadowLog:
+    def __init__(self, path, resume_size=0):
+        """
+        Open a shadow log that collects a rewritten copy of the store
+
+        Args:
+            path: Shadow log file path
+            resume_size: Checkpointed size to resume from; anything written
+                after it is discarded
+        """
+        self.path = path
+
+        if resume_size and os.path.exists(path) and os.path.getsize(path) >= resume_size:
+            with open(path, 'r+b') as f:
+                f.truncate(resume_size)
+            self.size = resume_size
+        else:
+            with open(path, 'wb'):
+                pass
+            self.size = 0
+
+        self._writer = open(path, 'ab')
+
+    def append(self, entry_id, value):
+        """Append a put record"""
+        record = LogStore._encode(RECORD_PUT, entry_id, value)
+        self._writer.write(record)
+        self.size += len(record)
+
+    def sync(self):
+        """Flush appended records to disk"""
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+
+    def close(self):
+        """Close the shadow log"""
+        self._writer.close()
+
+
+class LogStore:
+    def __init__(self, log_file, snapshot_file, compact_ratio=0.5, compact_min_records=256,
+                 flush_delay=0.0, flush_bytes=64 * 1024):
+        """
+        Initialize log store
+
+        Entries live in an mmap'd vault snapshot plus an append-only log of
+        mutations made since the snapshot was written. Compaction folds the
+        log into a new snapshot, so opening the store only has to scan the
+        short log. The log starts by naming the generation of its snapshot;
+        a log left over from a replaced snapshot is discarded on open.
+
+        With a flush_delay, writes are buffered and committed together
+        after at most flush_delay seconds or flush_bytes of records,
+        whichever comes first. Reads always see buffered writes; flush()
+        makes them durable right away.
+
+        Args:
+            log_file: Path of the append-only log file
+            snapshot_file: Path of the vault snapshot file
+            compact_ratio: Dead record ratio that triggers compaction
+            compact_min_records: Minimum record count before compacting
+            flush_delay: Seconds writes may stay buffered, 0 to sync each
+            flush_bytes: Buffered record bytes that force a commit
+        """
+        self.log_file = log_file
+        self.snapshot_file = snapshot_file
+        self.compact_ratio = compact_ratio
+        self.compact_min_records = compact_min_records
+        self.flush_delay = flush_delay
+        self.flush_bytes = flush_bytes
+
+        # Log entries: entry_id -> (payload offset, payload length)
+        self.index = {}
+        # Snapshot entries overridden or deleted by the log
+        self.shadowed = set()
+        self.snapshot = None
+        self.log_records = 0
+
+        self._lock = threading.RLock()
+        # Held while syncing the log; writers queued behind it share the sync
+        self._sync_lock = threading.Lock()
+        self._synced_size = 0
+        self._flush_timer = FlushTimer(self.flush, flush_delay)
+        self._compact_thread = None
+        # Counts file swaps, so work started before one can tell
+        self._swaps = 0
+        self._log_generation = None
+        self._size = 0
+        self._flushed_size = 0
+        self._writer = None
+        self._reader = None
+
+        self._open()
+
+    def _open(self):
+        """Open snapshot and log, rebuilding the in-memory index"""
+        self.snapshot = vault_file.VaultReader(self.snapshot_file)
+        if not os.path.exists(self.log_file):
+            self._reset_log()
+
+        self._scan()
+        if self._log_generation != self.snapshot.generation:
+            if self._log_generation is None:
+                # Written before logs named their snapshot; keep its records
+                with open(self.log_file, 'rb') as f:
+                    self._reset_log(f.read(self._size))
+            else:
+                # The snapshot was replaced and this log belongs to the
+                # old one, e.g. after a crash right after the swap
+                self._reset_log()
+            self._scan()
+
+        # Drop a torn record left behind by an interrupted write
+        if os.path.getsize(self.log_file) != self._size:
+            with open(self.log_file, 'r+b') as f:
+                f.truncate(self._size)
+
+        self._writer = open(self.log_file, 'ab', buffering=self.flush_bytes)
+        self._reader = open(self.log_file, 'rb')
+        self._flushed_size = self._size
+
+        # Whatever is in the log now was either synced before or is
+        # synced with the next write
+        self._synced_size = 0
+
+    def _reset_log(self, records=b""):
+        """Atomically start a new log for the current snapshot"""
+        header = self._encode(RECORD_SNAPSHOT, None, self.snapshot.generation)
+        atomic_write(self.log_file, header + records)
+
+    def _close_handles(self):
+        """Close file handles and the snapshot mapping"""
+        for handle in (self._writer, self._reader):
+            if handle:
+                handle.close()
+        self._writer = None
+        self._reader = None
+
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
+
+    def _scan(self):
+        """Replay the log on top of the snapshot"""
+        self.index = {}
+        self.shadowed = set()
+        self.log_records = 0
+        self._log_generation = None
+        offset = 0
+
+        with open(self.log_file, 'rb') as f:
+            data = f.read()
+
+        view = memoryview(data)
+        header_size = RECORD_HEADER.size
+
+        if len(data) >= header_size and RECORD_HEADER.unpack_from(view, 0)[0] == RECORD_SNAPSHOT:
+            _, crc, length = RECORD_HEADER.unpack_from(view, 0)
+            end = header_size + length
+            if end <= len(data) and zlib.crc32(view[header_size:end]) == crc:
+                _, self._log_generation = pickle.loads(view[header_size:end])
+                offset = end
+
+        while offset + header_size <= len(data):
+            record_type, crc, length = RECORD_HEADER.unpack_from(view, offset)
+            start = offset + header_size
+            end = start + length
+
+            # Stop at a truncated or corrupted tail
+            if end > len(data) or zlib.crc32(view[start:end]) != crc:
+                break
+            if record_type not in (RECORD_PUT, RECORD_DELETE):
+                break
+
+            entry_id, _ = pickle.loads(view[start:end])
+            self._apply(record_type, entry_id, (start, length))
+            self.log_records += 1
+            offset = end
+
+        self._size = offset
+
+    def _apply(self, record_type, entry_id, location):
+        """Apply a log record to the in-memory index"""
+        self.index.pop(entry_id, None)
+
+        if entry_id not in self.shadowed and entry_id in self.snapshot:
+            self.shadowed.add(entry_id)
+
+        if record_type == RECORD_PUT:
+            self.index[entry_id] = location
+
+    @staticmethod
+    def _encode(record_type, entry_id, value):
+        """Encode a single log record"""
+        payload = pickle.dumps((entry_id, value), protocol=pickle.HIGHEST_PROTOCOL)
+        header = RECORD_HEADER.pack(record_type, zlib.crc32(payload), len(payload))
+        return header + payload
+
+    def _append(self, record_type, entry_id, value):
+        """
+        Append a record and return its payload location
+
+        The record may stay in the write buffer; call _commit to schedule
+        or force it to disk.
+        """
+        record = self._encode(record_type, entry_id, value)
+        offset = self._size
+
+        self._writer.write(record)
+        self._size += len(record)
+        self.log_records += 1
+
+        return offset + RECORD_HEADER.size, len(record) - RECORD_HEADER.size
+
+    def _flush_writer(self):
+        """Hand buffered records to the OS so the reader sees them"""
+        if self._flushed_size < self._size:
+            self._writer.flush()
+            self._flushed_size = self._size
+
+    def _read(self, location):
+        """Read a record value at the given payload location"""
+        self._flush_writer()
+        offset, length = location
+        self._reader.seek(offset)
+        _, value = pickle.loads(self._reader.read(length))
+        return value
+
+    def _sync(self, end):
+        """
+        Group commit: make the log durable up to at least end
+
+        Writers that arrive while a sync is running wait for it and then
+        usually find their records already covered, so a burst of writes
+        costs one fsync instead of one each.
+        """
+        with self._sync_lock:
+            if self._synced_size >= end:
+                return
+
+            with self._lock:
+                if self._writer is None:
+                    return
+                self._flush_writer()
+                target = self._size
+                swaps = self._swaps
+                fd = os.dup(self._writer.fileno())
+
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+            with self._lock:
+                # Offsets of a swapped-out log mean nothing for the new one
+                if swaps == self._swaps:
+                    self._synced_size = max(self._synced_size, target)
+
+    def _commit(self, end):
+        """Sync now or leave it to the flush timer"""
+        if self.flush_delay <= 0 or end - self._synced_size >= self.flush_bytes:
+            self._sync(end)
+        else:
+            self._flush_timer.schedule()
+
+    def flush(self):
+        """
+        Make all buffered writes durable
+        """
+        with self._lock:
+            end = self._size
+
+        self._sync(end)
+
+    def put(self, entry_id, value):
+        """
+        Append a value for an entry
+
+        Returns once the record is on disk, or buffered when a flush
+        delay is set.
+        """
+        with self._lock:
+            location = self._append(RECORD_PUT, entry_id, value)
+            self._apply(RECORD_PUT, entry_id, location)
+            end = self._size
+
+        self._commit(end)
+        self._maybe_compact()
+
+    def delete(self, entry_id):
+        """
+        Append a tombstone for an entry
+
+        Returns:
+            bool: True if the entry existed
+        """
+        with self._lock:
+            if entry_id not in self:
+                return False
+
+            self._append(RECORD_DELETE, entry_id, None)
+            self._apply(RECORD_DELETE, entry_id, None)
+            end = self._size
+
+        self._commit(end)
+        self._maybe_compact()
+        return True
+
+    def get(self, entry_id):
+        """
+        Get the current value of an entry
+        """
+        with self._lock:
+            location = self.index.get(entry_id)
+            if location is not None:
+                return self._read(location)
+            if entry_id in self.shadowed:
+                return None
+            return self.snapshot.get(entry_id)
+
+    def items(self):
+        """
+        Get all live (entry_id, value) pairs in insertion order
+        """
+        with self._lock:
+            self._flush_writer()
+            self._reader.seek(0)
+            view = memoryview(self._reader.read(self._size))
+            index = dict(self.index)
+            shadowed = set(self.shadowed)
+
+            items = []
+            for entry_id, value in self.snapshot.items():
+                if entry_id in shadowed:
+                    location = index.pop(entry_id, None)
+                    if location is None:
+                        continue
+                    offset, length = location
+                    _, value = pickle.loads(view[offset:offset + length])
+                items.append((entry_id, value))
+
+        # Entries created since the snapshot
+        for entry_id, (offset, length) in index.items():
+            _, value = pickle.loads(view[offset:offset + length])
+            items.append((entry_id, value))
+
+        return items
+
+    def iter_items(self, start=0):
+        """
+        Stream live (entry_id, value) pairs in insertion order
+
+        Unlike items() nothing is materialized up front. The store lock is
+        held until the generator is exhausted or closed, so writers and
+        compaction wait for the iteration to finish.
+
+        Args:
+            start: Number of leading items to skip
+        """
+        with self._lock:
+            position = 0
+
+            for entry_id, value in self.snapshot.items():
+                if entry_id in self.shadowed:
+                    location = self.index.get(entry_id)
+                    if location is None:
+                        continue
+                    if position >= start:
+                        value = self._read(location)
+
+                if position >= start:
+                    yield entry_id, value
+                position += 1
+
+            # Entries created since the snapshot
+            for entry_id, location in list(self.index.items()):
+                if entry_id in self.shadowed:
+                    continue
+                if position >= start:
+                    yield entry_id, self._read(location)
+                position += 1
+
+    def __contains__(self, entry_id):
+        with self._lock:
+            if entry_id in self.index:
+                return True
+            return entry_id not in self.shadowed and entry_id in self.snapshot
+
+    def __len__(self):
+        with self._lock:
+            return len(self.index) + len(self.snapshot) - len(self.shadowed)
+
+    def _swap_files(self, new_snapshot):
+        """
+        Swap in a new snapshot, then reopen
+
+        The snapshot must hold every entry and have a new generation. Its
+        rename is the single commit point: the log still names the old
+        generation, so _open() discards it, now or after a crash.
+        """
+        self._close_handles()
+        try:
+            os.replace(new_snapshot, self.snapshot_file)
+            fsync_directory(os.path.dirname(self.snapshot_file))
+        finally:
+            self._swaps += 1
+            self._open()
+
+    def replace_all(self, items):
+        """
+        Atomically replace the store contents with the given pairs
+        """
+        self._wait_for_compaction()
+
+        with self._lock:
+            tmp_snapshot = self.snapshot_file + ".tmp"
+            vault_file.write_vault(tmp_snapshot, items, new_generation())
+            self._swap_files(tmp_snapshot)
+
+    def replace_with_log(self, log_path):
+        """
+        Atomically make a complete log file the new store contents
+
+        The log is folded into a new snapshot and removed. A crash before
+        the removal leaves it in place, and committing it again gives the
+        same contents.
+        """
+        self.replace_all(iter_log_records(log_path))
+        os.remove(log_path)
+
+    def _needs_compaction(self):
+        """Check whether the log should be folded into the snapshot"""
+        total = len(self.snapshot) + self.log_records
+        if total < self.compact_min_records:
+            return False
+
+        dead = total - len(self)
+        if dead / total >= self.compact_ratio:
+            return True
+
+        # Keep the log short so opening the store stays cheap
+        return self.log_records >= max(self.compact_min_records, len(self.snapshot) // 8)
+
+    def _maybe_compact(self):
+        """Start background compaction if needed"""
+        with self._lock:
+            if not self._needs_compaction():
+                return
+            if self._compact_thread and self._compact_thread.is_alive():
+                return
+
+            self._compact_thread = threading.Thread(target=self.compact)
+            self._compact_thread.daemon = True
+            self._compact_thread.start()
+
+    def _wait_for_compaction(self):
+        """Wait for a running compaction to finish"""
+        thread = self._compact_thread
+        if thread and thread.is_alive() and thread is not threading.current_thread():
+            thread.join()
+
+    def compact(self):
+        """
+        Fold the log into a new snapshot
+
+        The snapshot is written without holding the lock so writers are
+        not blocked. If records were appended meanwhile, it is written
+        again under the lock to include them.
+        """
+        tmp_snapshot = self.snapshot_file + ".compact"
+        generation = new_generation()
+
+        try:
+            with self._lock:
+                items = self.items()
+                snapshot_end = self._size
+                swaps = self._swaps
+
+            vault_file.write_vault(tmp_snapshot, items, generation)
+            del items
+
+            with self._lock:
+                # The store was replaced while compacting
+                if swaps != self._swaps:
+                    raise RuntimeError("store replaced during compaction")
+
+                # Records appended during the rewrite go into the snapshot
+                # too, as the swap starts an empty log
+                if self._size != snapshot_end:
+                    vault_file.write_vault(tmp_snapshot, self.items(), generation)
+
+                self._swap_files(tmp_snapshot)
+
+        except Exception as e:
+            print(f"Error compacting log: {e}")
+
+            if os.path.exists(tmp_snapshot):
+                os.remove(tmp_snapshot)
+
+    def close(self):
+        """Flush buffered writes, wait for background work and close the store"""
+        self._flush_timer.cancel()
+        self.flush()
+        self._wait_for_compaction()
+        with self._lock:
+            self._close_handles()
@@ -0,0 +1,990 @@
+"""
+Password strength estimation in the style of zxcvbn
+
+The password is broken into every pattern an attacker would try first:
+dictionary words (also reversed or with l33t substitutions), keyboard
+walks, repeats, sequences, years and dates. A dynamic program then picks
+the sequence of non-overlapping matches, with brute force filling the
+gaps, that needs the fewest guesses. Guesses give the entropy in bits,
+crack time estimates and a 0-4 score.
+
+    python strength.py
+
+times worst-case inputs against ESTIMATE_BUDGET_MS and exits non-zero if
+any estimate is over budget.
+"""
+
+import math
+import re
+import sys
+import threading
+import time
+from datetime import date
+
+import frequency_lists
+
+# Longest prefix analyzed, the rest is treated as brute force. Matching
+# grows faster than linearly with the length, and 64 is the longest
+# password the generator makes.
+MAX_ANALYZED_LENGTH = 64
+
+# Longest a single estimate may take. The add form scores off the Tk
+# thread, but a slow estimate still lags behind typing.
+ESTIMATE_BUDGET_MS = 5
+
+# Inputs that once took quadratic time in the matchers or the sequence
+# search, at the analyzed length
+TIMING_CASES = (
+    "a" * 64,
+    "1" * 100,
+    "abc" * 33,
+    "ab" * 50,
+    "qwertyuiop" * 10,
+    "19901225" * 12,
+    "passwordletmein" * 7,
+    "4@8({[<3691!|70$5+%2" * 5,
+    "x9$Kq!2mZ#7vLp@4" * 6,
+)
+
+BRUTEFORCE_CARDINALITY = 10
+MIN_GUESSES_BEFORE_GROWING_SEQUENCE = 10000
+MIN_SUBMATCH_GUESSES_SINGLE_CHAR = 10
+MIN_SUBMATCH_GUESSES_MULTI_CHAR = 50
+
+REFERENCE_YEAR = date.today().year
+MIN_YEAR_SPACE = 20
+DATE_MIN_YEAR = 1000
+DATE_MAX_YEAR = 2050
+
+MAX_SEQUENCE_DELTA = 5
+
+# Guesses per second in each attack scenario
+CRACK_SCENARIOS = {
+    "online_throttled": 100 / 3600,
+    "online_unthrottled": 10,
+    "offline_slow_hash": 1e4,
+    "offline_fast_hash": 1e10,
+}
+
+# Score thresholds on guesses, with a margin so exact powers of ten
+# land in the lower score
+SCORE_THRESHOLDS = (1e3 + 5, 1e6 + 5, 1e8 + 5, 1e10 + 5)
+SCORE_LABELS = ("Very Weak", "Weak", "Fair", "Strong", "Very Strong")
+
+L33T_TABLE = {
+    "a": "4@",
+    "b": "8",
+    "c": "({[<",
+    "e": "3",
+    "g": "69",
+    "i": "1!|",
+    "l": "1|7",
+    "o": "0",
+    "s": "$5",
+    "t": "+7",
+    "x": "%",
+    "z": "2",
+}
+
+# Keyboard layouts, each key lists its unshifted and shifted character
+QWERTY_LAYOUT = r"""
+`~ 1! 2@ 3# 4$ 5% 6^ 7& 8* 9( 0) -_ =+
+    qQ wW eE rR tT yY uU iI oO pP [{ ]} \|
+     aA sS dD fF gG hH jJ kK lL ;: '"
+      zZ xX cC vV bB nN mM ,< .> /?
+"""
+
+KEYPAD_LAYOUT = r"""
+  / * -
+7 8 9 +
+4 5 6
+1 2 3
+  0 .
+"""
+
+SHIFTED_CHARS = frozenset('~!@#$%^&*()_+QWERTYUIOPASDFGHJKL:"ZXCVBNM<>?{}|')
+
+DATE_SPLITS = {
+    4: ((1, 2), (2, 3)),
+    5: ((1, 3), (2, 3)),
+    6: ((1, 2), (2, 4), (4, 5)),
+    7: ((1, 3), (2, 3), (4, 5), (4, 6)),
+    8: ((2, 4), (4, 6)),
+}
+
+_DIGITS_RE = re.compile(r"^\d{4,8}$")
+_DATE_WITH_SEPARATOR_RE = re.compile(r"^(\d{1,4})([\s/\\_.-])(\d{1,2})\2(\d{1,4})$")
+_RECENT_YEAR_RE = re.compile(r"19\d\d|20\d\d")
+_REPEAT_GREEDY_RE = re.compile(r"(.+)\1+")
+_REPEAT_LAZY_RE = re.compile(r"(.+?)\1+")
+_REPEAT_LAZY_ANCHORED_RE = re.compile(r"^(.+?)\1+$")
+
+_graphs_lock = threading.Lock()
+_graphs = None
+
+
+def _build_graph(layout, slanted):
+    """
+    Map each key character to its neighbours, None where there is no key
+
+    Neighbours are listed in a fixed direction order, so a change in the
+    index of the next character means the walk turned.
+    """
+    positions = {}
+    token_size = len(layout.split()[0])
+    x_unit = token_size + 1
+
+    for y, line in enumerate(layout.split("\n")):
+        # Slanted keyboards shift every row half a key to the right
+        slant = y - 1 if slanted else 0
+        for token in line.split():
+            x = (line.index(token) - slant) // x_unit
+            positions[(x, y)] = token
+
+    if slanted:
+        directions = ((-1, 0), (0, -1), (1, -1), (1, 0), (0, 1), (-1, 1))
+    else:
+        directions = ((-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1))
+
+    graph = {}
+    for (x, y), chars in positions.items():
+        neighbours = [positions.get((x + dx, y + dy)) for dx, dy in directions]
+        for char in chars:
+            graph[char] = neighbours
+    return graph
+
+
+def _keyboard_graphs():
+    """
+    Get the keyboard graphs with their starting positions and average degree
+    """
+    global _graphs
+
+    with _graphs_lock:
+        if _graphs is None:
+            _graphs = {}
+            for name, layout, slanted in (("qwerty", QWERTY_LAYOUT, True),
+                                          ("keypad", KEYPAD_LAYOUT, False)):
+                graph = _build_graph(layout, slanted)
+                degree = sum(len([key for key in neighbours if key])
+                             for neighbours in graph.values()) / len(graph)
+                _graphs[name] = (graph, len(graph), degree)
+        return _graphs
+
+
+# Matchers. Each returns dicts with the pattern name, the inclusive token
+# span i..j, the token and whatever its guess estimate needs.
+
+def _dictionary_match(password, words, user_words=None, lookups=None):
+    """
+    Find every substring that is a ranked word
+
+    lookups, if given, keeps the lookup results between calls on related
+    passwords, e.g. the l33t variants of one password.
+    """
+    matches = []
+    lowered = password.lower()
+    length = len(password)
+    if lookups is None:
+        lookups = {}
+
+    for position, ranked in enumerate((words, user_words)):
+        if not ranked:
+            continue
+
+        # Repeated substrings are looked up once, substring -> result
+        found = lookups.setdefault(position, {})
+        for i in range(length):
+            lo, hi = 0, len(ranked)
+            for j in range(i, length):
+                substring = lowered[i:j + 1]
+                if substring not in found:
+                    found[substring] = ranked.find(substring, lo, hi)
+                index, (lo, hi) = found[substring]
+                if index >= 0:
+                    matches.append({
+                        "pattern": "dictionary",
+                        "i": i,
+                        "j": j,
+                        "token": password[i:j + 1],
+                        "matched_word": lowered[i:j + 1],
+                        "rank": ranked.ranks[index],
+                        "dictionary_name": ranked.list_names[ranked.list_ids[index]],
+                        "reversed": False,
+                        "l33t": False,
+                    })
+                if lo >= hi:
+                    # No longer word starts with this substring
+                    break
+
+    return matches
+
+
+def _reverse_dictionary_match(password, words, user_words=None):
+    """Find ranked words written backwards"""
+    length = len(password)
+    matches = _dictionary_match(password[::-1], words, user_words)
+    for match in matches:
+        match["token"] = match["token"][::-1]
+        match["reversed"] = True
+        match["i"], match["j"] = length - 1 - match["j"], length - 1 - match["i"]
+    return matches
+
+
+def _l33t_substitutions(password):
+    """
+    Enumerate the ways to undo l33t substitutions found in the password
+
+    Returns:
+        list: Dicts of l33t character -> letter
+    """
+    options = {}
+    for letter, subs in L33T_TABLE.items():
+        for sub in subs:
+            if sub in password:
+                options.setdefault(sub, []).append(letter)
+
+    substitutions = [{}]
+    for sub, letters in options.items():
+        substitutions = [dict(existing, **{sub: letter})
+                         for existing in substitutions for letter in letters]
+    return [sub_map for sub_map in substitutions if sub_map]
+
+
+def _l33t_match(password, words, user_words=None):
+    """Find ranked words hidden behind l33t substitutions"""
+    matches = []
+    seen = set()
+    # Substrings without a substituted character read the same in every
+    # variant, so they are looked up once across all of them
+    lookups = {}
+
+    for sub_map in _l33t_substitutions(password):
+        subbed = password.translate(str.maketrans(sub_map))
+        for match in _dictionary_match(subbed, words, user_words, lookups):
+            token = password[match["i"]:match["j"] + 1]
+            if token.lower() == match["matched_word"] or len(token) <= 1:
+                # Only keep matches that used a substitution
+                continue
+
+            key = (match["i"], match["j"], match["matched_word"])
+            if key in seen:
+                continue
+            seen.add(key)
+
+            match["token"] = token
+            match["l33t"] = True
+            match["sub"] = {sub: letter for sub, letter in sub_map.items() if sub in token}
+            matches.append(match)
+
+    return matches
+
+
+def _spatial_match(password):
+    """Find keyboard walks of three or more keys"""
+    matches = []
+    for graph_name, (graph, _, _) in _keyboard_graphs().items():
+        i = 0
+        while i < len(password) - 1:
+            j = i + 1
+            last_direction = None
+            turns = 0
+            shifted_count = 1 if graph_name == "qwerty" and password[i] in SHIFTED_CHARS else 0
+
+            while True:
+                found = False
+                if j < len(password):
+                    current = password[j]
+                    for direction, neighbour in enumerate(graph.get(password[j - 1], ())):
+                        if neighbour and current in neighbour:
+                            found = True
+                            if neighbour.index(current) == 1:
+                                shifted_count += 1
+                            if direction != last_direction:
+                                turns += 1
+                                last_direction = direction
+                            break
+
+                if found:
+                    j += 1
+                    continue
+
+                if j - i > 2:
+                    matches.append({
+                        "pattern": "spatial",
+                        "i": i,
+                        "j": j - 1,
+                        "token": password[i:j],
+                        "graph": graph_name,
+                        "turns": turns,
+                        "shifted_count": shifted_count,
+                    })
+                i = j
+                break
+
+    return matches
+
+
+def _repeat_match(password):
+    """Find repeated substrings such as aaa or abcabc"""
+    matches = []
+    # Base token -> guesses, each base is analyzed once
+    base_guesses = {}
+    position = 0
+    while position < len(password):
+        greedy = _REPEAT_GREEDY_RE.search(password, position)
+        if not greedy:
+            break
+        lazy = _REPEAT_LAZY_RE.search(password, position)
+
+        if len(greedy.group(0)) > len(lazy.group(0)):
+            # aabaab is (aab)x2 rather than (a)x2
+            match = greedy
+            base_token = _REPEAT_LAZY_ANCHORED_RE.search(match.group(0)).group(1)
+        else:
+            match = lazy
+            base_token = match.group(1)
+
+        if base_token not in base_guesses:
+            base = _most_guessable(base_token, _omnimatch(base_token, frequency_lists.load()))
+            base_guesses[base_token] = base["guesses"]
+        matches.append({
+            "pattern": "repeat",
+            "i": match.start(),
+            "j": match.end() - 1,
+            "token": match.group(0),
+            "base_token": base_token,
+            "base_guesses": base_guesses[base_token],
+            "repeat_count": len(match.group(0)) // len(base_token),
+        })
+        position = match.end()
+
+    return matches
+
+
+def _sequence_match(password):
+    """Find runs with a constant character step, such as abc or 8642"""
+    matches = []
+    if len(password) <= 1:
+        return matches
+
+    def add(i, j, delta):
+        if (j - i > 1 or abs(delta) == 1) and 0 < abs(delta) <= MAX_SEQUENCE_DELTA:
+            token = password[i:j + 1]
+            if token.islower() and token.isalpha():
+                space = 26
+            elif token.isupper() and token.isalpha():
+                space = 26
+            elif token.isdigit():
+                space = 10
+            else:
+                space = 26
+            matches.append({
+                "pattern": "sequence",
+                "i": i,
+                "j": j,
+                "token": token,
+                "sequence_space": space,
+                "ascending": delta > 0,
+            })
+
+    i = 0
+    last_delta = None
+    for k in range(1, len(password)):
+        delta = ord(password[k]) - ord(password[k - 1])
+        if last_delta is None:
+            last_delta = delta
+        if delta == last_delta:
+            continue
+        add(i, k - 1, last_delta)
+        i = k - 1
+        last_delta = delta
+    add(i, len(password) - 1, last_delta)
+
+    return matches
+
+
+def _regex_match(password):
+    """Find recent years"""
+    return [{
+        "pattern": "regex",
+        "regex_name": "recent_year",
+        "i": match.start(),
+        "j": match.end() - 1,
+        "token": match.group(0),
+    } for match in _RECENT_YEAR_RE.finditer(password)]
+
+
+def _two_to_four_digit_year(year):
+    if year > 99:
+        return year
+    if year > 50:
+        return year + 1900
+    return year + 2000
+
+
+def _map_ints_to_dm(ints):
+    for day, month in (ints, ints[::-1]):
+        if 1 <= day <= 31 and 1 <= month <= 12:
+            return day, month
+    return None
+
+
+def _map_ints_to_dmy(ints):
+    """
+    Read three integers as a date in any common order
+
+    Returns:
+        tuple: (year, month, day), or None if they cannot be a date
+    """
+    if ints[1] > 31 or ints[1] <= 0:
+        return None
+
+    over_12 = over_31 = under_1 = 0
+    for value in ints:
+        if 99 < value < DATE_MIN_YEAR or value > DATE_MAX_YEAR:
+            return None
+        over_31 += value > 31
+        over_12 += value > 12
+        under_1 += value <= 0
+    if over_31 >= 2 or over_12 == 3 or under_1 >= 2:
+        return None
+
+    # Year first or last
+    splits = ((ints[2], ints[0:2]), (ints[0], ints[1:3]))
+    for year, rest in splits:
+        if DATE_MIN_YEAR <= year <= DATE_MAX_YEAR:
+            day_month = _map_ints_to_dm(rest)
+            if day_month is None:
+                return None
+            return year, day_month[1], day_month[0]
+
+    for year, rest in splits:
+        day_month = _map_ints_to_dm(rest)
+        if day_month is not None:
+            return _two_to_four_digit_year(year), day_month[1], day_month[0]
+
+    return None
+
+
+def _date_match(password):
+    """Find dates with or without separators"""
+    matches = []
+    length = len(password)
+    # Digit runs repeat the same tokens, token -> best reading
+    readings = {}
+
+    # Without separators: 4 to 8 digits
+    for i in range(length - 3):
+        for j in range(i + 3, min(i + 8, length)):
+            token = password[i:j + 1]
+            if token in readings:
+                best = readings[token]
+            elif not _DIGITS_RE.match(token):
+                continue
+            else:
+                best = None
+                for k, l in DATE_SPLITS[len(token)]:
+                    dmy = _map_ints_to_dmy((int(token[:k]), int(token[k:l]), int(token[l:])))
+                    if dmy and (best is None or
+                                abs(dmy[0] - REFERENCE_YEAR) < abs(best[0] - REFERENCE_YEAR)):
+                        best = dmy
+                readings[token] = best
+
+            if best:
+                matches.append({
+                    "pattern": "date",
+                    "i": i,
+                    "j": j,
+                    "token": token,
+                    "separator": "",
+                    "year": best[0],
+                })
+
+    # With separators: 6 to 10 characters
+    for i in range(length - 5):
+        for j in range(i + 5, min(i + 10, length)):
+            token = password[i:j + 1]
+            found = _DATE_WITH_SEPARATOR_RE.match(token)
+            if not found:
+                continue
+
+            dmy = _map_ints_to_dmy((int(found.group(1)), int(found.group(3)), int(found.group(4))))
+            if dmy:
+                matches.append({
+                    "pattern": "date",
+                    "i": i,
+                    "j": j,
+                    "token": token,
+                    "separator": found.group(2),
+                    "year": dmy[0],
+                })
+
+    # Drop dates contained in longer dates. Sorted by start, then longest
+    # first, a date is contained if an earlier one reaches at least as far.
+    matches.sort(key=lambda match: (match["i"], -match["j"]))
+    kept = []
+    reach = -1
+    for match in matches:
+        if match["j"] > reach:
+            kept.append(match)
+        reach = max(reach, match["j"])
+    return kept
+
+
+def _omnimatch(password, words, user_words=None):
+    """Run every matcher"""
+    matches = _dictionary_match(password, words, user_words)
+    matches += _reverse_dictionary_match(password, words, user_words)
+    matches += _l33t_match(password, words, user_words)
+    matches += _spatial_match(password)
+    matches += _repeat_match(password)
+    matches += _sequence_match(password)
+    matches += _regex_match(password)
+    if sum(char.isdigit() for char in password) >= 4:
+        matches += _date_match(password)
+    return matches
+
+
+# Guess estimates per pattern
+
+def _n_choose_k(n, k):
+    if k > n:
+        return 0
+    return math.comb(n, k)
+
+
+def _uppercase_variations(token):
+    """Number of ways the token could have been capitalized"""
+    if token.lower() == token:
+        return 1
+
+    if token[0].isupper() and token[1:].lower() == token[1:] \
+            or token[-1].isupper() and token[:-1].lower() == token[:-1] \
+            or token.upper() == token:
+        # Capitalized first or last letter, or all caps
+        return 2
+
+    upper = sum(char.isupper() for char in token)
+    lower = sum(char.islower() for char in token)
+    return sum(_n_choose_k(upper + lower, i) for i in range(1, min(upper, lower) + 1))
+
+
+def _l33t_variations(match):
+    """Number of ways the l33t substitutions could have been applied"""
+    if not match.get("l33t"):
+        return 1
+
+    variations = 1
+    token = match["token"].lower()
+    for sub, letter in match["sub"].items():
+        subbed = token.count(sub)
+        unsubbed = token.count(letter)
+        if subbed == 0 or unsubbed == 0:
+            # Every instance substituted, or none of them
+            variations *= 2
+        else:
+            variations *= sum(_n_choose_k(subbed + unsubbed, i)
+                              for i in range(1, min(subbed, unsubbed) + 1))
+    return variations
+
+
+def _spatial_guesses(match):
+    _, starts, degree = _keyboard_graphs()[match["graph"]]
+    length = len(match["token"])
+    turns = match["turns"]
+
+    guesses = 0
+    for i in range(2, length + 1):
+        for j in range(1, min(turns, i - 1) + 1):
+            guesses += _n_choose_k(i - 1, j - 1) * starts * degree ** j
+
+    shifted = match["shifted_count"]
+    if shifted:
+        unshifted = length - shifted
+        if unshifted == 0:
+            guesses *= 2
+        else:
+            guesses *= sum(_n_choose_k(shifted + unshifted, i)
+                           for i in range(1, min(shifted, unshifted) + 1))
+    return guesses
+
+
+def _sequence_guesses(match):
+    first = match["token"][0]
+    if first in "aAzZ019":
+        base = 4
+    elif first.isdigit():
+        base = 10
+    else:
+        base = 26
+    if not match["ascending"]:
+        base *= 2
+    return base * len(match["token"])
+
+
+def _pattern_guesses(match):
+    pattern = match["pattern"]
+    if pattern == "bruteforce":
+        guesses = BRUTEFORCE_CARDINALITY ** len(match["token"])
+        minimum = MIN_SUBMATCH_GUESSES_SINGLE_CHAR if len(match["token"]) == 1 \
+            else MIN_SUBMATCH_GUESSES_MULTI_CHAR
+        return max(guesses, minimum + 1)
+    if pattern == "dictionary":
+        return (match["rank"] * _uppercase_variations(match["token"]) *
+                _l33t_variations(match) * (2 if match["reversed"] else 1))
+    if pattern == "spatial":
+        return _spatial_guesses(match)
+    if pattern == "repeat":
+        return match["base_guesses"] * match["repeat_count"]
+    if pattern == "sequence":
+        return _sequence_guesses(match)
+    if pattern == "regex":
+        return max(abs(int(match["token"]) - REFERENCE_YEAR), MIN_YEAR_SPACE)
+    if pattern == "date":
+        guesses = max(abs(match["year"] - REFERENCE_YEAR), MIN_YEAR_SPACE) * 365
+        return guesses * 4 if match["separator"] else guesses
+    raise ValueError(f"Unknown pattern: {pattern}")
+
+
+def _estimate_guesses(match, password):
+    """Guesses for one match, cached on the match"""
+    if "guesses" not in match:
+        minimum = 1
+        if len(match["token"]) < len(password):
+            minimum = MIN_SUBMATCH_GUESSES_SINGLE_CHAR if len(match["token"]) == 1 \
+                else MIN_SUBMATCH_GUESSES_MULTI_CHAR
+        match["guesses"] = max(_pattern_guesses(match), minimum)
+    return match["guesses"]
+
+
+def _most_guessable(password, matches):
+    """
+    Find the match sequence covering the password with the fewest guesses
+
+    For every end position k and sequence length l the cheapest way to
+    cover password[:k + 1] with l matches is kept. A sequence of l matches
+    costs l! times the product of their guesses, since the attacker does not
+    know the order of the patterns, plus a penalty that grows with l.
+    Gaps are filled with brute force matches.
+
+    A brute force match longer than two characters costs ten times the
+    same match one character shorter, so instead of trying every start
+    for every end, the cheapest brute force match per sequence length is
+    carried forward and extended by one character. Sequence lengths whose
+    length penalty alone exceeds brute forcing the whole prefix are never
+    tried, nor is anything dearer than a single match covering the whole
+    password. This keeps the program close to linear in the password length.
+
+    Returns:
+        dict: password, guesses and the chosen match sequence
+    """
+    length = len(password)
+    if length == 0:
+        return {"password": password, "guesses": 1, "sequence": []}
+
+    matches_by_end = [[] for _ in range(length)]
+    for match in matches:
+        matches_by_end[match["j"]].append(match)
+    for end_matches in matches_by_end:
+        end_matches.sort(key=lambda match: match["i"])
+
+    # Per end position: sequence length -> best match, product, total
+    best_match = [{} for _ in range(length)]
+    best_product = [{} for _ in range(length)]
+    best_guesses = [{} for _ in range(length)]
+
+    # Sequence length -> length penalty and order factor
+    penalties = [0] + [MIN_GUESSES_BEFORE_GROWING_SEQUENCE ** (count - 1) for count in range(1, length + 2)]
+    factorials = [math.factorial(count) for count in range(length + 2)]
+
+    # Guesses never shrink as a sequence grows, so a partial sequence
+    # dearer than some full cover cannot be part of the answer
+    limit = _pattern_guesses({"pattern": "bruteforce", "token": password}) + 1
+    for match in matches:
+        if match["i"] == 0 and match["j"] == length - 1:
+            limit = min(limit, _estimate_guesses(match, password) + 1)
+
+    def update(match, count, product=None):
+        k = match["j"]
+        # Brute forcing password[:k + 1] costs at most 11 ** (k + 1)
+        if penalties[count] > limit or penalties[count] > 11 ** (k + 1):
+            return
+
+        if product is None:
+            product = _estimate_guesses(match, password)
+            if count > 1:
+                product *= best_product[match["i"] - 1][count - 1]
+        guesses = factorials[count] * product + penalties[count]
+        if guesses > limit:
+            return
+
+        # Skip if a sequence no longer than this one is already cheaper
+        at_k = best_guesses[k]
+        for other_count in at_k:
+            if other_count <= count and at_k[other_count] <= guesses:
+                return
+
+        at_k[count] = guesses
+        best_match[k][count] = match
+        best_product[k][count] = product
+
+    def bruteforce(i, k):
+        return {"pattern": "bruteforce", "i": i, "j": k, "token": password[i:k + 1]}
+
+    # Sequence length -> (start, product) of the cheapest brute force
+    # match ending at the previous position, at least two characters long
+    # and following a non brute force match
+    extendable = {}
+
+    for k in range(length):
+        for match in matches_by_end[k]:
+            if match["i"] > 0:
+                for count in list(best_match[match["i"] - 1]):
+                    update(match, count + 1)
+            else:
+                update(match, 1)
+
+        update(bruteforce(0, k), 1)
+
+        # Two adjacent brute force matches are never optimal, so a brute
+        # force match ending here follows a different pattern. Either it
+        # extends a longer one by a character, starts two characters back
+        # or covers only this character.
+        candidates = {}
+        for count, (start, product) in extendable.items():
+            candidates[count] = (start, product * BRUTEFORCE_CARDINALITY)
+        if k >= 2:
+            for count, last in best_match[k - 2].items():
+                if last["pattern"] != "bruteforce":
+                    product = best_product[k - 2][count] * BRUTEFORCE_CARDINALITY ** 2
+                    if count + 1 not in candidates or product < candidates[count + 1][1]:
+                        candidates[count + 1] = (k - 1, product)
+
+        for count, (start, product) in candidates.items():
+            update(bruteforce(start, k), count, product)
+        extendable = candidates
+
+        if k >= 1:
+            for count, last in list(best_match[k - 1].items()):
+                if last["pattern"] != "bruteforce":
+                    match = bruteforce(k, k)
+                    update(match, count + 1)
+
+    # Unwind from the cheapest sequence covering the whole password
+    k = length - 1
+    count = min(best_guesses[k], key=best_guesses[k].get)
+    guesses = best_guesses[k][count]
+    sequence = []
+    while k >= 0:
+        match = best_match[k][count]
+        # Extended brute force matches were priced without it
+        _estimate_guesses(match, password)
+        sequence.append(match)
+        k = match["i"] - 1
+        count -= 1
+    sequence.reverse()
+
+    return {"password": password, "guesses": guesses, "sequence": sequence}
+
+
+def _display_time(seconds):
+    """Format a crack time for people"""
+    minute = 60
+    hour = minute * 60
+    day = hour * 24
+    month = day * 31
+    year = month * 12
+    century = year * 100
+
+    if seconds < 1:
+        return "less than a second"
+    for unit_seconds, unit in ((century, None), (year, "year"), (month, "month"),
+                               (day, "day"), (hour, "hour"), (minute, "minute")):
+        if seconds >= unit_seconds:
+            if unit is None:
+                return "centuries"
+            value = round(seconds / unit_seconds)
+            return f"{value} {unit}{'s' if value != 1 else ''}"
+    value = round(seconds)
+    return f"{value} second{'s' if value != 1 else ''}"
+
+
+def _score(guesses):
+    for score, threshold in enumerate(SCORE_THRESHOLDS):
+        if guesses < threshold:
+            return score
+    return len(SCORE_THRESHOLDS)
+
+
+def _feedback(score, sequence):
+    """
+    Build a warning and suggestions from the weakest part of the password
+
+    Returns:
+        tuple: (warning, list of suggestions)
+    """
+    if not sequence:
+        return "", ["Use a few words, avoid common phrases",
+                    "No need for symbols, digits, or uppercase letters"]
+    if score > 2:
+        return "", []
+
+    longest = max(sequence, key=lambda match: len(match["token"]))
+    sole_match = len(sequence) == 1
+    suggestions = ["Add another word or two. Uncommon words are better."]
+    warning = ""
+    pattern = longest["pattern"]
+
+    if pattern == "dictionary":
+        name = longest["dictionary_name"]
+        if name == "passwords":
+            if sole_match and not longest["l33t"] and not longest["reversed"]:
+                if longest["rank"] <= 10:
+                    warning = "This is a top-10 common password"
+                elif longest["rank"] <= 100:
+                    warning = "This is a top-100 common password"
+                else:
+                    warning = "This is a very common password"
+            elif longest["guesses"] <= 1e4:
+                warning = "This is similar to a commonly used password"
+        elif name == "english":
+            if sole_match:
+                warning = "A word by itself is easy to guess"
+        elif name in ("names", "surnames"):
+            if sole_match:
+                warning = "Names and surnames by themselves are easy to guess"
+            else:
+                warning = "Common names and surnames are easy to guess"
+        elif name == "user_inputs":
+            warning = "Avoid the site name or your username in the password"
+
+        token = longest["token"]
+        if token[0].isupper() and token[1:].lower() == token[1:]:
+            suggestions.append("Capitalization doesn't help very much")
+        elif token.upper() == token and token.lower() != token:
+            suggestions.append("All-uppercase is almost as easy to guess as all-lowercase")
+        if longest["reversed"] and len(token) >= 4:
+            suggestions.append("Reversed words aren't much harder to guess")
+        if longest["l33t"]:
+            suggestions.append("Predictable substitutions like '@' instead of 'a' don't help very much")
+
+    elif pattern == "spatial":
+        if longest["turns"] == 1:
+            warning = "Straight rows of keys are easy to guess"
+        else:
+            warning = "Short keyboard patterns are easy to guess"
+        suggestions.append("Use a longer keyboard pattern with more turns")
+
+    elif pattern == "repeat":
+        if len(longest["base_token"]) == 1:
+            warning = 'Repeats like "aaa" are easy to guess'
+        else:
+            warning = 'Repeats like "abcabcabc" are only slightly harder to guess than "abc"'
+        suggestions.append("Avoid repeated words and characters")
+
+    elif pattern == "sequence":
+        warning = "Sequences like abc or 6543 are easy to guess"
+        suggestions.append("Avoid sequences")
+
+    elif pattern == "regex":
+        warning = "Recent years are easy to guess"
+        suggestions.extend(["Avoid recent years", "Avoid years that are associated with you"])
+
+    elif pattern == "date":
+        warning = "Dates are often easy to guess"
+        suggestions.append("Avoid dates and years that are associated with you")
+
+    return warning, suggestions
+
+
+def estimate_strength(password, user_inputs=()):
+    """
+    Estimate how many guesses an attacker needs for a password
+
+    Args:
+        password: Password to evaluate
+        user_inputs: Words tied to the account, such as the site name and
+            username, which an attacker would try first
+
+    Returns:
+        dict: score (0-4), strength label, guesses, entropy_bits,
+            crack_times in seconds and crack_times_display per scenario,
+            warning, suggestions, feedback (warning and suggestions
+            combined) and the chosen match sequence
+    """
+    start = time.perf_counter()
+
+    analyzed = password[:MAX_ANALYZED_LENGTH]
+    words = frequency_lists.load()
+
+    user_words = None
+    if user_inputs:
+        tokens = []
+        for value in user_inputs:
+            if value:
+                tokens.append(str(value).lower())
+                # Split e.g. john.smith@example.com into its parts
+                tokens.extend(part for part in re.split(r"[^0-9a-z]+", str(value).lower()) if part)
+        if tokens:
+            user_words = frequency_lists.RankedWords.from_lists([("user_inputs", tokens)])
+
+    result = _most_guessable(analyzed, _omnimatch(analyzed, words, user_words))
+
+    guesses = result["guesses"]
+    if len(password) > len(analyzed):
+        guesses *= BRUTEFORCE_CARDINALITY ** (len(password) - len(analyzed))
+
+    score = _score(guesses)
+    warning, suggestions = _feedback(score, result["sequence"])
+    crack_times = {name: guesses / rate for name, rate in CRACK_SCENARIOS.items()}
+
+    return {
+        "score": score,
+        "strength": SCORE_LABELS[score],
+        "guesses": guesses,
+        "entropy_bits": math.log2(guesses),
+        "crack_times": crack_times,
+        "crack_times_display": {name: _display_time(seconds) for name, seconds in crack_times.items()},
+        "warning": warning,
+        "suggestions": suggestions,
+        "feedback": ([warning] if warning else []) + suggestions,
+        "sequence": [
+            {key: value for key, value in match.items() if key in ("pattern", "token", "guesses")}
+            for match in result["sequence"]
+        ],
+        "calc_time_ms": (time.perf_counter() - start) * 1000,
+    }
+
+
+def check_timing(budget_ms=ESTIMATE_BUDGET_MS, rounds=5):
+    """
+    Time the estimate of each TIMING_CASES input
+
+    The best of a few rounds is compared, so a busy machine does not fail
+    the check on its own.
+
+    Returns:
+        int: Exit code, 0 if every estimate is within budget
+    """
+    # Word lists load on first use, which is not part of the estimate
+    estimate_strength("warm up")
+
+    over_budget = 0
+    for password in TIMING_CASES:
+        elapsed_ms = min(estimate_strength(password)["calc_time_ms"] for _ in range(rounds))
+        over = elapsed_ms > budget_ms
+        over_budget += over
+        label = password if len(password) <= 24 else password[:21] + "..."
+        print(f"{label!r:<28}{len(password):>5}{elapsed_ms:>10.1f} ms{'  over budget' if over else ''}")
+
+    if over_budget:
+        print(f"{over_budget} of {len(TIMING_CASES)} estimates over {budget_ms} ms")
+        return 1
+
+    print(f"All estimates within {budget_ms} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(check_timing())
@@ -0,0 +1,74 @@
+"""
+Shared helpers for the test suite
+
+Importing this module puts the repository root on sys.path, so the flat
+top-level modules import the same way under pytest and unittest.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import utils
+import vault
+
+PASSWORD = "correct horse battery"
+
+
+def make_config(config_dir, backend="log"):
+    """
+    Create a config with the cheapest KDF settings
+
+    Args:
+        config_dir: Directory for config.json
+        backend: Database backend, "log" or "sqlite"
+    """
+    config = utils.ConfigManager(config_dir)
+    config.set('security', 'kdf', 'pbkdf2')
+    config.set('security', 'kdf_target_ms', 1)
+    config.set('database', 'backend', backend)
+    config.set('database', 'flush_delay_ms', 0)
+    return config
+
+
+class VaultTestCase(unittest.TestCase):
+    """Test case with an unlocked vault in a temporary directory"""
+
+    backend = "log"
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.dir = self._tmp.name
+        self.data_dir = os.path.join(self.dir, "data")
+
+        self.vault = vault.Vault(make_config(self.dir, self.backend), self.data_dir)
+        self.addCleanup(self._close_vault)
+        self.assertTrue(self.vault.create_account(PASSWORD))
+
+    def _close_vault(self):
+        if self.vault is not None:
+            self.vault.close()
+            self.vault = None
+
+    def reopen(self, password=PASSWORD):
+        """Close the vault and unlock it again from disk"""
+        self._close_vault()
+        self.vault = vault.Vault(utils.ConfigManager(self.dir), self.data_dir)
+        self.assertTrue(self.vault.unlock(password))
+        return self.vault
+
+    def save(self, website, password="pw", username="user"):
+        """Save an entry and return its ID"""
+        entry_id = self.vault.save_entry({
+            "website": website,
+            "username": username,
+            "password": password,
+        })
+        self.assertIsNotNone(entry_id)
+        return entry_id
@@ -0,0 +1,48 @@
+"""
+Tests for master password and KDF changes
+"""
+
+import unittest
+
+import support
+
+import kdf
+
+
+class KdfMigrationTest(support.VaultTestCase):
+    def setUp(self):
+        super().setUp()
+        self.entry_id = self.save("example.com", password="secret")
+
+    def assert_unlocks_with(self, password, kdf_name):
+        """Reopen with password and check the KDF and entries"""
+        self.reopen(password)
+        self.assertEqual(self.vault.config.get('auth', 'kdf')["name"], kdf_name)
+        self.assertEqual(self.vault.get_password(self.entry_id), "secret")
+
+    def test_change_to_given_kdf(self):
+        params = {"name": "scrypt", "n": kdf.MIN_SCRYPT_N, "r": kdf.SCRYPT_R, "p": kdf.SCRYPT_P}
+        self.assertTrue(self.vault.change_master_password("new password", params))
+
+        self.assert_unlocks_with("new password", "scrypt")
+        self.assertEqual(self.vault.config.get('auth', 'kdf'), params)
+
+        self.vault.lock()
+        self.assertFalse(self.vault.unlock(support.PASSWORD))
+
+    def test_change_calibrates_configured_kdf(self):
+        self.vault.config.set('security', 'kdf', 'scrypt')
+        self.assertTrue(self.vault.change_master_password("new password"))
+
+        self.assert_unlocks_with("new password", "scrypt")
+
+    @unittest.skipUnless("argon2id" in kdf.available_kdfs(), "needs Argon2id")
+    def test_change_to_argon2id(self):
+        params = {"name": "argon2id", "iterations": 1, "lanes": 1, "memory_cost": 8}
+        self.assertTrue(self.vault.change_master_password(support.PASSWORD, params))
+
+        self.assert_unlocks_with(support.PASSWORD, "argon2id")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Tests for the breached password corpus
+"""
+
+import os
+import random
+import tempfile
+import unittest
+
+import support  # noqa: F401
+
+import breach
+
+BREACHED = {"password": 3861493, "letmein": 285642, "correct horse": 7}
+
+
+class BreachCorpusTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+
+        rnd = random.Random(42)
+        lines = {"%040X" % rnd.getrandbits(160): rnd.randint(1, 100) for _ in range(3000)}
+        for password, count in BREACHED.items():
+            lines[breach.hash_password(password).decode('ascii')] = count
+        # A first line without any letter says nothing about the case
+        lines["0" * 40] = 1
+        self.lines = sorted(lines.items())
+
+    def write_corpus(self, convert):
+        """Write the corpus with each hash passed through convert"""
+        path = os.path.join(self._tmp.name, "corpus.txt")
+        with open(path, 'w') as f:
+            for digest, count in self.lines:
+                f.write(f"{convert(digest)}:{count}\n")
+        corpus = breach.BreachCorpus(path)
+        self.addCleanup(corpus.close)
+        return corpus
+
+    def assert_lookups(self, corpus):
+        for password, count in BREACHED.items():
+            self.assertEqual(corpus.lookup(password), count, password)
+        self.assertEqual(corpus.lookup("not in the corpus"), 0)
+        for digest, count in self.lines[::97]:
+            self.assertEqual(corpus.lookup_hash(digest.encode('ascii')), count)
+
+    def test_uppercase(self):
+        self.assert_lookups(self.write_corpus(str.upper))
+
+    def test_lowercase(self):
+        self.assert_lookups(self.write_corpus(str.lower))
+
+    def test_mixed_case(self):
+        convert = lambda digest: digest.lower() if int(digest[-1], 16) % 2 else digest
+        self.assert_lookups(self.write_corpus(convert))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+Tests for the database managers
+"""
+
+import os
+import pickle
+import tempfile
+import unittest
+
+import support  # noqa: F401
+
+import database
+
+
+class SqliteMigrationTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.data_dir = self._tmp.name
+        self.db_file = os.path.join(self.data_dir, "passwords.db")
+
+    def test_migrates_log_store(self):
+        manager = database.DatabaseManager(self.data_dir)
+        entry_id = manager.save_entry(b"data", b"meta")
+        manager.close()
+
+        manager = database.SqliteDatabaseManager(self.data_dir)
+        try:
+            entry = manager.get_entry(entry_id)
+            self.assertEqual(bytes(entry["data"]), b"data")
+            self.assertEqual(bytes(entry["meta"]), b"meta")
+        finally:
+            manager.close()
+
+    def test_failed_migration_runs_again(self):
+        data_file = os.path.join(self.data_dir, "passwords.dat")
+        with open(data_file, 'wb') as f:
+            f.write(b"not a pickle")
+
+        with self.assertRaises(Exception):
+            database.SqliteDatabaseManager(self.data_dir)
+        # No empty database is left to stop the next attempt
+        self.assertFalse(os.path.exists(self.db_file))
+
+        entry = {"data": b"data", "meta": None, "created": "c", "modified": "m"}
+        with open(data_file, 'wb') as f:
+            pickle.dump({"legacy": entry}, f)
+
+        manager = database.SqliteDatabaseManager(self.data_dir)
+        try:
+            self.assertEqual(bytes(manager.get_entry("legacy")["data"]), b"data")
+        finally:
+            manager.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
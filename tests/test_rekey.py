@@ -0,0 +1,146 @@
+"""
+Tests for data key rotation
+"""
+
+import os
+import threading
+import time
+import unittest
+
+import support
+
+
+class RotationWriteTest(support.VaultTestCase):
+    """Writes made while a rotation copies entries must survive the swap"""
+
+    def _rotate_with(self, write):
+        """Rotate in chunks of 5, running write on another thread mid-copy"""
+        for i in range(30):
+            self.save(f"site{i}.example", password=f"pw{i}")
+        self.vault.rekey_job.chunk_size = 5
+
+        writer = threading.Thread(target=write)
+
+        def progress(copied):
+            if copied == 5:
+                writer.start()
+                # Let the writer reach the store before the copy goes on
+                time.sleep(0.1)
+
+        self.assertTrue(self.vault.rotate_encryption_key(progress))
+        writer.join(10)
+        self.assertFalse(writer.is_alive())
+
+    def test_save_during_rotation_survives(self):
+        saved = {}
+
+        def write():
+            saved["id"] = self.save("during.example", password="during")
+
+        self._rotate_with(write)
+
+        self.reopen()
+        self.assertEqual(self.vault.get_password(saved["id"]), "during")
+        self.assertEqual(len(self.vault.get_all_passwords()), 31)
+
+    def test_delete_during_rotation_survives(self):
+        self._rotate_with(lambda: None)
+        victim = self.vault.get_all_passwords()[0]["id"]
+
+        self._rotate_with(lambda: self.vault.delete_entry(victim))
+
+        self.reopen()
+        ids = {entry["id"] for entry in self.vault.get_all_passwords()}
+        self.assertNotIn(victim, ids)
+        self.assertEqual(len(ids), 59)
+
+
+class Interrupted(Exception):
+    pass
+
+
+class RotationResumeTest(support.VaultTestCase):
+    """Interrupted rotations are finished or abandoned on the next start"""
+
+    def setUp(self):
+        super().setUp()
+        self.passwords = {}
+        for i in range(30):
+            self.passwords[self.save(f"site{i}.example", password=f"pw{i}")] = f"pw{i}"
+
+    def _interrupt_copy(self, after=10):
+        """Rotate in chunks of 5 and stop once after entries are copied"""
+        self.vault.rekey_job.chunk_size = 5
+
+        def progress(copied):
+            if copied == after:
+                raise Interrupted()
+
+        with self.assertRaises(Interrupted):
+            self.vault.rotate_encryption_key(progress)
+        self.assertEqual(self.vault.rekey_job.pending()["phase"], "copy")
+
+    def assert_all_readable(self):
+        for entry_id, password in self.passwords.items():
+            self.assertEqual(self.vault.get_password(entry_id), password)
+        self.assertEqual(len(self.vault.get_all_passwords()), len(self.passwords))
+
+    def test_resume_after_copy_interrupted(self):
+        old_key = self.vault.config.get('auth', 'wrapped_key')
+        self._interrupt_copy()
+
+        self.reopen()
+        self.assertTrue(self.vault.resume_key_rotation())
+        self.assertIsNone(self.vault.rekey_job.pending())
+        self.assertNotEqual(self.vault.config.get('auth', 'wrapped_key'), old_key)
+        self.assert_all_readable()
+
+        # Entries were rewritten under the key a fresh unlock unwraps
+        self.reopen()
+        self.assert_all_readable()
+
+    def test_abandon_when_vault_changed(self):
+        old_key = self.vault.config.get('auth', 'wrapped_key')
+        self._interrupt_copy()
+
+        # Deleting an entry that was already copied breaks the resume order
+        copied = [entry["id"] for entry in self.vault.db_manager.iter_entries()][:10]
+        self.assertTrue(self.vault.delete_entry(copied[-1]))
+        del self.passwords[copied[-1]]
+
+        self.reopen()
+        self.assertFalse(self.vault.resume_key_rotation())
+        self.assertIsNone(self.vault.rekey_job.pending())
+        self.assertFalse(os.path.exists(self.vault.rekey_job.shadow_file))
+        self.assertEqual(self.vault.config.get('auth', 'wrapped_key'), old_key)
+        self.assert_all_readable()
+
+    def test_recover_interrupted_swap(self):
+        apply_auth_record = self.vault.auth_manager.apply_auth_record
+
+        def fail_once(record):
+            self.vault.auth_manager.apply_auth_record = apply_auth_record
+            raise Interrupted()
+
+        self.vault.auth_manager.apply_auth_record = fail_once
+        with self.assertRaises(Interrupted):
+            self.vault.rotate_encryption_key()
+        self.assertEqual(self.vault.rekey_job.pending()["phase"], "swap")
+
+        # Opening the vault finishes the swap before anyone logs in
+        self.reopen()
+        self.assertIsNone(self.vault.rekey_job.pending())
+        self.assertIsNone(self.vault.resume_key_rotation())
+        self.assert_all_readable()
+
+
+class SqliteRotationWriteTest(RotationWriteTest):
+    backend = "sqlite"
+
+
+class SqliteRotationResumeTest(RotationResumeTest):
+    backend = "sqlite"
+
+
+if __name__ == "__main__":
+    unittest.main()
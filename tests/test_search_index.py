@@ -0,0 +1,118 @@
+"""
+Tests for the in-memory search index
+"""
+
+import random
+import re
+import unittest
+
+import support  # noqa: F401
+
+import search_index
+from search_index import SearchIndex
+
+WORDS = ["mail", "gmail", "bank", "banking", "shop", "example", "login", "a", "ab", "com", "org", "ma"]
+
+
+def brute_force(entries, query, limit=None):
+    """Rank every entry by scoring each field directly"""
+    query = query.strip().lower()
+    if not query:
+        return []
+
+    scored = []
+    for order, entry in enumerate(entries):
+        best = 0
+        for name, weight in search_index.SEARCH_FIELDS:
+            value = str(entry.get(name) or '').lower()
+            if not value:
+                continue
+            words = [word for word in re.split(r"[^0-9a-z]+", value) if word]
+            if value == query:
+                kind = search_index.MATCH_EXACT
+            elif value.startswith(query):
+                kind = search_index.MATCH_PREFIX
+            elif any(word.startswith(query) for word in words):
+                kind = search_index.MATCH_WORD_PREFIX
+            elif query in value:
+                kind = search_index.MATCH_SUBSTRING
+            else:
+                continue
+            best = max(best, kind * 10 + weight)
+        if best:
+            scored.append((-best, order, entry["id"]))
+
+    ranked = [entry_id for _, _, entry_id in sorted(scored)]
+    return ranked if limit is None else ranked[:limit]
+
+
+def random_value(rnd):
+    """Build a field value from a few words and separators"""
+    parts = [rnd.choice(WORDS) for _ in range(rnd.randint(0, 3))]
+    return rnd.choice(["", ".", "-", "@", " "]).join(parts) + rnd.choice(["", ".com", "/login", "x"])
+
+
+class SearchIndexTest(unittest.TestCase):
+    def test_ranking_tiers(self):
+        index = SearchIndex()
+        index.build([
+            {"id": "substring", "website": "xgmailx"},
+            {"id": "word", "website": "my-gmail"},
+            {"id": "prefix", "website": "gmail.com"},
+            {"id": "exact_url", "url": "gmail"},
+            {"id": "exact", "website": "gmail"},
+        ])
+
+        self.assertEqual(
+            index.search("GMail "),
+            ["exact", "exact_url", "prefix", "word", "substring"]
+        )
+
+    def test_matches_brute_force(self):
+        rnd = random.Random(1234)
+        entries = [
+            {
+                "id": f"id{i}",
+                "website": random_value(rnd),
+                "username": random_value(rnd),
+                "url": random_value(rnd),
+            }
+            for i in range(400)
+        ]
+        index = SearchIndex()
+        index.build(entries)
+
+        # Removals and replacements go through the incremental paths
+        for entry in rnd.sample(entries, 60):
+            index.remove(entry["id"])
+            entries.remove(entry)
+        for entry in rnd.sample(entries, 30):
+            entries.remove(entry)
+            entry = dict(entry, website=random_value(rnd))
+            entries.append(entry)
+            index.add(entry)
+
+        queries = ["a", "m", "ma", "ab", "mai", "gmail", ".com", "/lo", "ing", "@", "zz", " ", "x"]
+        queries += [rnd.choice(WORDS)[:rnd.randint(1, 4)] for _ in range(30)]
+        for query in queries:
+            expected = brute_force(entries, query)
+            self.assertEqual(index.search(query), expected, query)
+            for limit in (1, 7, 50):
+                self.assertEqual(index.search(query, limit), expected[:limit], (query, limit))
+
+    def test_rebuild_after_many_removals(self):
+        entries = [{"id": f"id{i}", "website": f"site{i}.example"} for i in range(50)]
+        index = SearchIndex()
+        index.build(entries)
+
+        for entry in entries[:40]:
+            index.remove(entry["id"])
+        # Force the stale postings to be dropped
+        index._rebuild()
+
+        self.assertEqual(index.search("site", 5), [f"id{i}" for i in range(40, 45)])
+        self.assertEqual(index.search("site1"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+"""
+Tests for the log-structured store
+"""
+
+import os
+import tempfile
+import unittest
+
+import support  # noqa: F401
+
+from storage import RECORD_PUT, LogStore
+
+
+def value(i):
+    """Build a stored value like the ones the database writes"""
+    return {"data": b"data%d" % i, "meta": None, "created": "c", "modified": "m"}
+
+
+class LogStoreTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.log_file = os.path.join(self._tmp.name, "vault.log")
+        self.snapshot_file = os.path.join(self._tmp.name, "vault.dat")
+        self.store = None
+        self.addCleanup(self._close)
+
+    def _close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def open(self):
+        """Close the store if open and open it again from disk"""
+        self._close()
+        self.store = LogStore(self.log_file, self.snapshot_file, compact_min_records=1000000)
+        return self.store
+
+    def test_compact_while_snapshot_values_are_held(self):
+        store = self.open()
+        for i in range(10):
+            store.put(f"id{i}", value(i))
+        store.compact()
+
+        held = store.get("id3")
+        items = store.items()
+        old_snapshot = store.snapshot
+        mapping = old_snapshot._mmap
+        generation = old_snapshot.generation
+
+        store.put("id10", value(10))
+        store.compact()
+
+        # The swap went through and the old mapping is closed, which
+        # Windows requires before the file can be replaced
+        self.assertNotEqual(store.snapshot.generation, generation)
+        self.assertTrue(mapping.closed)
+
+        # Values read before the swap stay usable
+        self.assertEqual(held["data"], b"data3")
+        self.assertEqual(dict(items)["id9"]["data"], b"data9")
+
+        store = self.open()
+        self.assertEqual(len(store), 11)
+        self.assertEqual(store.get("id10")["data"], b"data10")
+
+    def test_torn_tail_is_dropped(self):
+        store = self.open()
+        for i in range(3):
+            store.put(f"id{i}", value(i))
+        store.close()
+        self.store = None
+
+        # A write cut short by a crash leaves part of a record
+        intact_size = os.path.getsize(self.log_file)
+        with open(self.log_file, 'ab') as f:
+            f.write(LogStore._encode(RECORD_PUT, "torn", value(9))[:-5])
+
+        store = self.open()
+        self.assertEqual(len(store), 3)
+        self.assertNotIn("torn", store)
+        self.assertEqual(os.path.getsize(self.log_file), intact_size)
+
+        # Writes after recovery land behind the last intact record
+        store.put("id3", value(3))
+        store = self.open()
+        self.assertEqual([entry_id for entry_id, _ in store.items()], ["id0", "id1", "id2", "id3"])
+
+    def test_corrupt_record_ends_the_log(self):
+        store = self.open()
+        store.put("id0", value(0))
+        store.put("id1", value(1))
+        store.close()
+        self.store = None
+
+        # Flip the last byte of the final record's payload
+        with open(self.log_file, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([last[0] ^ 0xFF]))
+
+        store = self.open()
+        self.assertIn("id0", store)
+        self.assertNotIn("id1", store)
+
+    def test_log_of_replaced_snapshot_is_discarded(self):
+        store = self.open()
+        store.put("old", value(0))
+        store.compact()
+        store.put("logged", value(1))
+        store.flush()
+        with open(self.log_file, 'rb') as f:
+            old_log = f.read()
+
+        store.replace_all([("new", value(2))])
+        store.close()
+        self.store = None
+
+        # A crash right after the snapshot rename leaves the old log behind
+        with open(self.log_file, 'wb') as f:
+            f.write(old_log)
+
+        store = self.open()
+        self.assertEqual([entry_id for entry_id, _ in store.items()], ["new"])
+
+        # The stale log is replaced, so it is not replayed later either
+        store.put("after", value(3))
+        store = self.open()
+        self.assertEqual([entry_id for entry_id, _ in store.items()], ["new", "after"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Tests for vault import and export
+"""
+
+import os
+import unittest
+
+import support
+
+import vault
+
+
+class ImportKeyTest(support.VaultTestCase):
+    def setUp(self):
+        super().setUp()
+        self.entry_id = self.save("example.com", password="secret")
+        self.export_file = os.path.join(self.dir, "export.dat")
+
+    def test_import_own_export(self):
+        self.assertTrue(self.vault.export_data(self.export_file))
+        self.save("later.example")
+
+        self.assertTrue(self.vault.import_data(self.export_file))
+        self.assertEqual(self.vault.get_password(self.entry_id), "secret")
+
+    def test_reject_export_from_before_rotation(self):
+        self.assertTrue(self.vault.export_data(self.export_file))
+        self.assertTrue(self.vault.rotate_encryption_key())
+        later_id = self.save("later.example", password="later")
+
+        with self.assertRaises(ValueError):
+            self.vault.import_data(self.export_file)
+
+        # The vault is left as it was
+        self.reopen()
+        self.assertEqual(self.vault.get_password(self.entry_id), "secret")
+        self.assertEqual(self.vault.get_password(later_id), "later")
+
+        # An export made after the rotation imports
+        self.assertTrue(self.vault.export_data(self.export_file))
+        self.assertTrue(self.vault.import_data(self.export_file))
+
+    def test_reject_export_of_another_vault(self):
+        other_dir = os.path.join(self.dir, "other")
+        other = vault.Vault(support.make_config(other_dir, self.backend), os.path.join(other_dir, "data"))
+        try:
+            self.assertTrue(other.create_account(support.PASSWORD))
+            self.assertIsNotNone(other.save_entry({"website": "other.example", "password": "pw"}))
+            self.assertTrue(other.export_data(self.export_file))
+        finally:
+            other.close()
+
+        with self.assertRaises(ValueError):
+            self.vault.import_data(self.export_file)
+        self.assertEqual(self.vault.get_password(self.entry_id), "secret")
+
+
+class SqliteImportKeyTest(ImportKeyTest):
+    backend = "sqlite"
+
+
+if __name__ == "__main__":
+    unittest.main()
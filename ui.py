@@ -7,6 +7,18 @@ from tkinter import messagebox, filedialog
 import os
 import threading
 
+import virtual_list
+import cache
+
+# Delay before a search runs after the last keystroke
+SEARCH_DEBOUNCE_MS = 200
+
+# Best matches shown for a search; a longer query narrows the rest down
+SEARCH_RESULT_LIMIT = 500
+
+# Delay before the typed password is scored
+STRENGTH_DEBOUNCE_MS = 150
+
 class UIManager:
     def __init__(self, root, app):
         """
@@ -16,10 +28,16 @@ class UIManager:
         self.app = app
         self.current_screen = None
         
-        # Password display tracking
-        self.password_labels = {}
-        self.password_values = {}
-        self.password_visible = {}
+        # Search state
+        self._search_after_id = None
+        self._search_generation = 0
+        
+        # Strength meter state, scored off the Tk thread like searches
+        self._strength_after_id = None
+        self._strength_generation = 0
+        
+        # Apply single entry changes instead of reloading the list
+        self.app.add_entry_listener(self.on_entry_changed)
         
         # Show initial screen
         self.show_login_screen()
@@ -183,9 +201,13 @@ class UIManager:
             ("📋 All Passwords", self.show_all_passwords),
             ("➕ Add New", self.show_add_password),
             ("🎲 Generator", self.show_generator),
+            ("🛡️ Security Audit", self.show_audit),
             ("⚙️ Settings", self.show_settings),
         ]
         
+        # Kept so a key rotation can hold the vault still
+        self.sidebar_buttons = []
+        
         for text, command in nav_items:
             btn = ctk.CTkButton(
                 self.sidebar,
@@ -197,6 +219,7 @@ class UIManager:
                 hover_color=("gray70", "gray30")
             )
             btn.pack(pady=5, padx=20, fill="x")
+            self.sidebar_buttons.append(btn)
         
         # Logout button
         logout_btn = ctk.CTkButton(
@@ -208,6 +231,7 @@ class UIManager:
             hover_color=("gray70", "gray30")
         )
         logout_btn.pack(side="bottom", pady=20, padx=20, fill="x")
+        self.sidebar_buttons.append(logout_btn)
     
     def _create_main_content(self):
         """Create main content area"""
@@ -243,6 +267,15 @@ class UIManager:
         # Content area
         self.content_area = ctk.CTkScrollableFrame(self.main_content)
         self.content_area.pack(fill="both", expand=True, padx=20, pady=20)
+        
+        # Password list, swapped in place of the content area
+        self.password_list = virtual_list.VirtualPasswordList(
+            self.main_content,
+            on_copy=lambda entry: self._copy_password(self.app.get_password(entry.get('id', ''))),
+            on_delete=self._delete_password,
+            get_password=self.app.get_password
+        )
+        self.list_shown = False
     
     def show_all_passwords(self):
         """Show all passwords"""
@@ -261,8 +294,7 @@ class UIManager:
             label.pack(pady=100)
             return
         
-        for password_data in passwords:
-            self._create_password_card(password_data)
+        self._show_password_list(passwords)
     
     def show_add_password(self):
         """Show add password form"""
@@ -326,6 +358,17 @@ class UIManager:
                 show_btn.pack(side="right")
                 
                 self.form_entries[field_name] = entry
+                entry.bind("<KeyRelease>", lambda e: self._update_strength_label())
+                
+                # Strength of the typed password
+                self.strength_label = ctk.CTkLabel(
+                    form_frame,
+                    text="",
+                    font=("Segoe UI", 12),
+                    anchor="w",
+                    justify="left"
+                )
+                self.strength_label.pack(fill="x", padx=(140, 30))
             else:
                 entry = ctk.CTkEntry(
                     frame,
@@ -467,6 +510,142 @@ class UIManager:
         # Generate initial password
         self._generate_password()
     
+    def show_audit(self):
+        """Show the password health audit"""
+        self.title_label.configure(text="Security Audit")
+        self._clear_content()
+        
+        status = ctk.CTkLabel(
+            self.content_area,
+            text="Checking passwords...",
+            font=("Segoe UI", 16),
+            text_color="gray"
+        )
+        status.pack(pady=100)
+        
+        # Same guard as search results, navigating away drops the report
+        generation = self._search_generation
+        
+        def audit_thread():
+            report = self.app.audit_vault()
+            self.root.after(0, lambda: self._show_audit_report(report, generation))
+        
+        threading.Thread(target=audit_thread, daemon=True).start()
+    
+    def _show_audit_report(self, report, generation):
+        """Render the audit report on the Tk thread"""
+        if generation != self._search_generation or self.current_screen != "main":
+            return
+        
+        self._clear_content()
+        
+        if report is None:
+            label = ctk.CTkLabel(
+                self.content_area,
+                text="The audit failed, see the log for details",
+                font=("Segoe UI", 16),
+                text_color="gray"
+            )
+            label.pack(pady=100)
+            return
+        
+        def describe(item):
+            return f"{item['website']}  ({item['username']})"
+        
+        sections = [
+            ("Reused passwords",
+             [", ".join(describe(item) for item in group) for group in report["reused"]]),
+            ("Similar passwords",
+             [", ".join(describe(item) for item in group) for group in report["similar"]]),
+            ("Weak passwords",
+             [f"{describe(item)}: {item['strength']}" + (f" - {item['warning']}" if item["warning"] else "")
+              for item in report["weak"]]),
+            ("Not changed in a long time",
+             [f"{describe(item)}: {item['age_days']} days" for item in report["stale"]]),
+        ]
+        
+        summary = ctk.CTkLabel(
+            self.content_area,
+            text=f"{report['total']} passwords checked",
+            font=("Segoe UI", 16, "bold")
+        )
+        summary.pack(pady=(10, 5), anchor="w", padx=20)
+        
+        breach_btn = ctk.CTkButton(
+            self.content_area,
+            text="Check Against Breach List...",
+            command=self._check_breaches,
+            font=("Segoe UI", 14)
+        )
+        breach_btn.pack(anchor="w", padx=20, pady=5)
+        
+        results = ctk.CTkScrollableFrame(self.content_area, corner_radius=10)
+        results.pack(fill="both", expand=True, padx=20, pady=10)
+        
+        for title, lines in sections:
+            heading = ctk.CTkLabel(
+                results,
+                text=f"{title} ({len(lines)})",
+                font=("Segoe UI", 14, "bold"),
+                anchor="w"
+            )
+            heading.pack(fill="x", padx=10, pady=(15, 5))
+            
+            text = "\n".join(lines) if lines else "None found"
+            body = ctk.CTkLabel(
+                results,
+                text=text,
+                font=("Segoe UI", 12),
+                anchor="w",
+                justify="left",
+                wraplength=700
+            )
+            body.pack(fill="x", padx=20)
+    
+    def _check_breaches(self):
+        """Look up stored passwords in a local breached password corpus"""
+        corpus_file = self.app.config.get('breach', 'corpus_file')
+        if not corpus_file or not os.path.exists(corpus_file):
+            corpus_file = filedialog.askopenfilename(
+                filetypes=[("Hash lists", "*.txt"), ("All files", "*.*")],
+                title="Sorted SHA-1 or NTLM Hash List"
+            )
+            if not corpus_file:
+                return
+            self.app.config.set('breach', 'corpus_file', corpus_file)
+        
+        def breach_thread():
+            report = self.app.check_breaches(corpus_file)
+            self.root.after(0, lambda: self._show_breach_report(report))
+        
+        threading.Thread(target=breach_thread, daemon=True).start()
+    
+    def _show_breach_report(self, report):
+        """Summarize the breach check on the Tk thread"""
+        if report is None:
+            messagebox.showerror("Error", "The breach check failed, see the log for details")
+            return
+        
+        breached = report["breached"]
+        if not breached:
+            messagebox.showinfo(
+                "Breach Check",
+                f"None of your {report['checked']} passwords were found in the breach list."
+            )
+            return
+        
+        lines = [
+            f"{item['website']} ({item['username']}): seen {item['count']} times"
+            for item in breached[:20]
+        ]
+        if len(breached) > 20:
+            lines.append(f"...and {len(breached) - 20} more")
+        messagebox.showwarning(
+            "Breach Check",
+            f"{len(breached)} of your {report['checked']} passwords appear in known breaches. "
+            "Change them:\n\n" + "\n".join(lines)
+        )
+    
     def show_settings(self):
         """Show settings"""
         self.title_label.configure(text="Settings")
@@ -486,6 +665,16 @@ class UIManager:
         )
         change_pass_btn.pack(pady=20, padx=50, fill="x")
         
+        # Rotate data key
+        rotate_key_btn = ctk.CTkButton(
+            settings_frame,
+            text="Rotate Encryption Key",
+            command=self._rotate_key,
+            height=45,
+            font=("Segoe UI", 14)
+        )
+        rotate_key_btn.pack(pady=20, padx=50, fill="x")
+        
         # Export
         export_btn = ctk.CTkButton(
             settings_frame,
@@ -516,95 +705,60 @@ class UIManager:
         )
         about_btn.pack(pady=20, padx=50, fill="x")
     
-    def _create_password_card(self, password_data):
-        """Create a password display card"""
-        card = ctk.CTkFrame(self.content_area, corner_radius=10)
-        card.pack(fill="x", padx=10, pady=5)
+    def _show_password_list(self, entries):
+        """Show entries in the virtualized password list"""
+        if not self.list_shown:
+            self.content_area.pack_forget()
+            self.password_list.pack(fill="both", expand=True, padx=20, pady=20)
+            self.list_shown = True
+        
+        self.password_list.set_entries(entries)
+    
+    def _on_search(self, event):
+        """Handle search input"""
+        # Restart the debounce timer on every keystroke
+        if self._search_after_id is not None:
+            self.root.after_cancel(self._search_after_id)
+            self._search_after_id = None
         
-        # Card content
-        content = ctk.CTkFrame(card, fg_color="transparent")
-        content.pack(fill="x", padx=20, pady=15)
+        # Invalidate searches still in flight
+        self._search_generation += 1
+        generation = self._search_generation
         
-        # Left side - Info
-        info_frame = ctk.CTkFrame(content, fg_color="transparent")
-        info_frame.pack(side="left", fill="both", expand=True)
+        search_term = self.search_var.get().lower()
         
-        # Website
-        website = ctk.CTkLabel(
-            info_frame,
-            text=password_data.get('website', 'Unknown'),
-            font=("Segoe UI", 18, "bold")
-        )
-        website.pack(anchor="w")
+        if not search_term:
+            self.show_all_passwords()
+            return
         
-        # Username
-        username = ctk.CTkLabel(
-            info_frame,
-            text=f"👤 {password_data.get('username', '')}",
-            font=("Segoe UI", 14)
+        self._search_after_id = self.root.after(
+            SEARCH_DEBOUNCE_MS,
+            lambda: self._start_search(search_term, generation)
         )
-        username.pack(anchor="w", pady=(5, 0))
+    
+    def _start_search(self, search_term, generation):
+        """Run search on a worker thread"""
+        self._search_after_id = None
         
-        # Password (initially hidden)
-        password_id = password_data.get('id', '')
-        if password_id:
-            password_label = ctk.CTkLabel(
-                info_frame,
-                text="🔒 ••••••••••",
-                font=("Segoe UI", 14)
-            )
-            password_label.pack(anchor="w", pady=(5, 0))
+        def search_thread():
+            # Skip queries superseded while waiting to start
+            if generation != self._search_generation:
+                return
             
-            # Store for toggling
-            self.password_labels[password_id] = password_label
-            self.password_values[password_id] = password_data.get('password', '')
-            self.password_visible[password_id] = False
-        
-        # Right side - Buttons
-        btn_frame = ctk.CTkFrame(content, fg_color="transparent")
-        btn_frame.pack(side="right")
-        
-        # Copy button
-        copy_btn = ctk.CTkButton(
-            btn_frame,
-            text="Copy",
-            width=80,
-            command=lambda p=password_data.get('password', ''): self._copy_password(p)
-        )
-        copy_btn.grid(row=0, column=0, padx=5)
-        
-        # Show button
-        if password_id:
-            show_btn = ctk.CTkButton(
-                btn_frame,
-                text="Show",
-                width=80,
-                command=lambda pid=password_id: self._toggle_password_display(pid)
+            matching = self.app.search_passwords(search_term, SEARCH_RESULT_LIMIT)
+            self.root.after(
+                0,
+                lambda: self._show_search_results(search_term, matching, generation)
             )
-            show_btn.grid(row=0, column=1, padx=5)
         
-        # Delete button
-        delete_btn = ctk.CTkButton(
-            btn_frame,
-            text="Delete",
-            width=80,
-            fg_color="red",
-            hover_color="darkred",
-            command=lambda pid=password_id: self._delete_password(pid)
-        )
-        delete_btn.grid(row=0, column=2, padx=5)
+        threading.Thread(target=search_thread, daemon=True).start()
     
-    def _on_search(self, event):
-        """Handle search input"""
-        search_term = self.search_var.get().lower()
-        
-        if not search_term:
-            self.show_all_passwords()
+    def _show_search_results(self, search_term, matching, generation):
+        """Render search results on the Tk thread"""
+        # Only the newest query is rendered
+        if generation != self._search_generation or self.current_screen != "main":
             return
         
-        # Filter passwords based on search term
-        matching = self.app.search_passwords(search_term)
-        
         self._clear_content()
         
         if not matching:
@@ -617,8 +771,33 @@ class UIManager:
             label.pack(pady=100)
             return
         
-        for password_data in matching:
-            self._create_password_card(password_data)
+        self._show_password_list(matching)
+    
+    def on_entry_changed(self, change, entry_id, entry):
+        """Apply a single entry change to the list on screen"""
+        if self.current_screen != "main" or self.title_label.cget("text") != "All Passwords":
+            return
+        
+        searching = bool(self.search_var.get())
+        
+        if change == cache.ENTRY_REMOVED:
+            if self.list_shown and self.password_list.remove_entry(entry_id):
+                if not self.password_list.entries:
+                    # Show the empty state
+                    if searching:
+                        self._on_search(None)
+                    else:
+                        self.show_all_passwords()
+        elif searching:
+            # Let the search index decide whether the entry matches
+            self._on_search(None)
+        elif not self.list_shown:
+            # Replaces the empty state with the list
+            self.show_all_passwords()
+        elif change == cache.ENTRY_ADDED:
+            self.password_list.insert_entry(entry)
+        elif change == cache.ENTRY_UPDATED:
+            self.password_list.update_entry(entry)
     
     def refresh_password_list(self):
         """Refresh the password list display"""
@@ -635,14 +814,19 @@ class UIManager:
     
     def _clear_content(self):
         """Clear content area"""
+        # Drop search results that have not been rendered yet
+        self._search_generation += 1
+        
         if hasattr(self, 'content_area'):
             for widget in self.content_area.winfo_children():
                 widget.destroy()
         
-        # Clear password tracking
-        self.password_labels.clear()
-        self.password_values.clear()
-        self.password_visible.clear()
+        # Swap the content area back in for the password list
+        if getattr(self, 'list_shown', False):
+            self.password_list.set_entries([])
+            self.password_list.pack_forget()
+            self.content_area.pack(fill="both", expand=True, padx=20, pady=20)
+            self.list_shown = False
     
     def _save_password(self):
         """Save password from form"""
@@ -669,12 +853,67 @@ class UIManager:
         for entry in self.form_entries.values():
             entry.delete(0, "end")
         self.notes_text.delete("1.0", "end")
+        self._update_strength_label()
     
     def _generate_for_field(self, entry_widget):
         """Generate password for a specific field"""
         password = self.app.generate_password()
         entry_widget.delete(0, "end")
         entry_widget.insert(0, password)
+        self._update_strength_label()
+    
+    def _update_strength_label(self):
+        """Score the password in the add form once typing pauses"""
+        if self._strength_after_id is not None:
+            self.root.after_cancel(self._strength_after_id)
+            self._strength_after_id = None
+        
+        # Invalidate estimates still in flight
+        self._strength_generation += 1
+        generation = self._strength_generation
+        
+        password = self.form_entries["password"].get()
+        if not password:
+            self.strength_label.configure(text="")
+            return
+        
+        # Site and username are the first things an attacker would try
+        user_inputs = (self.form_entries["website"].get(), self.form_entries["username"].get())
+        self._strength_after_id = self.root.after(
+            STRENGTH_DEBOUNCE_MS,
+            lambda: self._start_strength_estimate(password, user_inputs, generation)
+        )
+    
+    def _start_strength_estimate(self, password, user_inputs, generation):
+        """Estimate strength on a worker thread"""
+        self._strength_after_id = None
+        
+        def estimate_thread():
+            # Skip passwords changed while waiting to start
+            if generation != self._strength_generation:
+                return
+            
+            try:
+                result = self.app.estimate_strength(password, user_inputs)
+            except Exception as e:
+                print(f"Error estimating password strength: {e}")
+                return
+            self.root.after(0, lambda: self._show_strength(result, generation))
+        
+        threading.Thread(target=estimate_thread, daemon=True).start()
+    
+    def _show_strength(self, result, generation):
+        """Render a strength estimate on the Tk thread"""
+        # Only the newest password is shown, and only while the form is open
+        if generation != self._strength_generation or not self.strength_label.winfo_exists():
+            return
+        
+        colors = ("#e74c3c", "#e67e22", "#f1c40f", "#2ecc71", "#27ae60")
+        text = (f"Strength: {result['strength']} - cracked in "
+                f"{result['crack_times_display']['offline_slow_hash']} offline")
+        if result["warning"]:
+            text += f"\n{result['warning']}"
+        self.strength_label.configure(text=text, text_color=colors[result["score"]])
     
     def _toggle_field_visibility(self, entry_widget):
         """Toggle visibility of a password field"""
@@ -714,6 +953,53 @@ class UIManager:
         if new_password:
             self.app.change_master_password(new_password)
     
+    def _rotate_key(self):
+        """Re-encrypt all passwords under a new key"""
+        if not messagebox.askyesno(
+            "Rotate Encryption Key",
+            "This re-encrypts every password with a new key and may take a while. Continue?"
+        ):
+            return
+        
+        self.title_label.configure(text="Rotate Encryption Key")
+        self._clear_content()
+        
+        status = ctk.CTkLabel(
+            self.content_area,
+            text="Re-encrypting passwords...",
+            font=("Segoe UI", 16),
+            text_color="gray"
+        )
+        status.pack(pady=100)
+        
+        # Saves wait for the rotation to finish, so keep the user on the
+        # rotation screen instead of blocking the Tk thread on one
+        for btn in self.sidebar_buttons:
+            btn.configure(state="disabled")
+        
+        def show_progress(copied):
+            status.configure(text=f"Re-encrypted {copied} passwords...")
+        
+        def rotate_thread():
+            success = self.app.rotate_encryption_key(
+                progress=lambda copied: self.root.after(0, lambda: show_progress(copied))
+            )
+            self.root.after(0, lambda: self._finish_key_rotation(success))
+        
+        threading.Thread(target=rotate_thread, daemon=True).start()
+    
+    def _finish_key_rotation(self, success):
+        """Report the key rotation on the Tk thread"""
+        for btn in self.sidebar_buttons:
+            btn.configure(state="normal")
+        
+        if success:
+            messagebox.showinfo("Success", "Encryption key rotated successfully!")
+        else:
+            messagebox.showerror("Error", "Failed to rotate encryption key, see the log for details")
+        
+        self.show_settings()
+    
     def _export_passwords(self):
         """Export passwords"""
         file_path = filedialog.asksaveasfilename(
@@ -756,19 +1042,6 @@ class UIManager:
             self.app.copy_to_clipboard(password)
             messagebox.showinfo("Copied", "Password copied to clipboard!")
     
-    def _toggle_password_display(self, password_id):
-        """Toggle password visibility on card"""
-        if password_id in self.password_labels and password_id in self.password_values:
-            if self.password_visible.get(password_id, False):
-                # Hide password
-                self.password_labels[password_id].configure(text="🔒 ••••••••••")
-                self.password_visible[password_id] = False
-            else:
-                # Show password
-                password = self.password_values[password_id]
-                self.password_labels[password_id].configure(text=password)
-                self.password_visible[password_id] = True
-    
     def _delete_password(self, password_id):
         """Delete a password"""
         if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this password?"):
@@ -8,6 +8,8 @@ import base64
 import hashlib
 from datetime import datetime
 
+import storage
+
 class ConfigManager:
     def __init__(self, config_dir="."):
         """
@@ -51,16 +53,32 @@ class ConfigManager:
                 "clear_clipboard": True,
                 "clipboard_timeout": 30,
                 "auto_lock": True,
-                "lock_timeout": 300
+                "lock_timeout": 300,
+                "kdf": "pbkdf2",
+                "kdf_target_ms": 500,
+                "cipher": "aes-gcm"
             },
             "ui": {
                 "font_size": 12,
                 "font_family": "Segoe UI",
                 "animations": True
             },
+            "database": {
+                "backend": "log",
+                "flush_delay_ms": 50
+            },
+            "audit": {
+                "max_age_days": 365,
+                "weak_score": 2
+            },
+            "breach": {
+                "corpus_file": ""
+            },
             "auth": {
+                "version": 3,
                 "salt": "",
-                "password_hash": ""
+                "verifier": "",
+                "wrapped_key": ""
             }
         }
         
@@ -72,13 +90,15 @@ class ConfigManager:
     def _save_config(self, config=None):
         """
         Save configuration to file
+        
+        The file holds the wrapped vault key, so it is replaced atomically
+        rather than truncated and rewritten.
         """
         try:
             if config is None:
                 config = self.config
             
-            with open(self.config_file, 'w') as f:
-                json.dump(config, f, indent=2)
+            storage.atomic_write(self.config_file, json.dumps(config, indent=2).encode('utf-8'))
             
             return True
             
@@ -0,0 +1,552 @@
+"""
+Vault operations shared by the desktop app and the command line interface
+
+Nothing here imports a GUI toolkit, so it can run headless.
+"""
+
+import os
+import threading
+from itertools import islice
+
+# Import local modules
+import auth
+import database
+import password_generator
+import utils
+import cache
+import search_index
+import rekey
+import entry_cipher
+import audit
+
+# Entry fields stored in the metadata blob; everything else is secret
+METADATA_FIELDS = ("website", "username", "url")
+
+# Imported entries decrypted to check the file uses the current data key
+IMPORT_KEY_CHECK_ENTRIES = 3
+
+
+class Vault:
+    def __init__(self, config=None, data_dir="data"):
+        """
+        Initialize vault
+
+        Args:
+            config: ConfigManager, loaded from the working directory if None
+            data_dir: Directory holding the database files
+        """
+        self.config = config or utils.ConfigManager()
+        self.auth_manager = auth.AuthManager(self.config)
+        self.db_manager = database.open_database(self.config, data_dir)
+        self.rekey_job = rekey.RekeyJob(self.auth_manager, self.db_manager)
+        self.pass_generator = password_generator.PasswordGenerator()
+        self.entry_cache = cache.EntryCache()
+        self.search_index = search_index.SearchIndex()
+        # The index is built on first search, off the thread that unlocked
+        self._search_index_stale = True
+        self._search_index_lock = threading.Lock()
+        self.entry_listeners = []
+        self.auditor = audit.VaultAuditor(
+            self.auth_manager,
+            self.db_manager,
+            self.estimate_strength,
+            max_age_days=self.config.get('audit', 'max_age_days', audit.DEFAULT_MAX_AGE_DAYS),
+            weak_score=self.config.get('audit', 'weak_score', audit.DEFAULT_WEAK_SCORE)
+        )
+
+        # Session state
+        self.is_authenticated = False
+
+        # Complete a key rotation interrupted while swapping files
+        try:
+            self.rekey_job.recover()
+        except Exception as e:
+            print(f"Error recovering key rotation: {e}")
+
+    def has_account(self):
+        """
+        Check whether a master password has been set up
+        """
+        return bool(self.config.get('auth', 'salt'))
+
+    def create_account(self, password):
+        """
+        Create the vault with a master password and unlock it
+        """
+        success = self.auth_manager.create_account(password)
+        self.is_authenticated = bool(success)
+        return self.is_authenticated
+
+    def unlock(self, password):
+        """
+        Unlock the vault with the master password
+
+        Callers should follow a successful unlock with
+        resume_key_rotation.
+        """
+        success = self.auth_manager.authenticate(password)
+        self.is_authenticated = bool(success)
+        return self.is_authenticated
+
+    def resume_key_rotation(self):
+        """
+        Finish a data key rotation interrupted before its swap
+
+        Such a run needs the old data key, which is available again after
+        unlocking.
+
+        Returns:
+            bool: None if nothing was pending, True if the rotation was
+                completed, False if it had to be abandoned
+        """
+        if not self.rekey_job.pending():
+            return None
+
+        try:
+            return self.rekey_job.resume()
+        except Exception as e:
+            print(f"Error resuming key rotation: {e}")
+            return not self.rekey_job.abandon()
+
+    def _require_unlocked(self):
+        """Raise unless the vault is unlocked"""
+        if not self.is_authenticated:
+            raise ValueError("Not authenticated")
+
+    def add_entry_listener(self, callback):
+        """
+        Register a callback for entry changes
+
+        The callback receives the change (cache.ENTRY_ADDED, ENTRY_UPDATED
+        or ENTRY_REMOVED), the entry ID and the entry metadata, which is None
+        for removals.
+        """
+        self.entry_listeners.append(callback)
+
+    def _notify_entry_changed(self, change, entry_id, entry=None):
+        """Tell listeners about a single entry change"""
+        for callback in self.entry_listeners:
+            try:
+                callback(change, entry_id, dict(entry) if entry else None)
+            except Exception as e:
+                print(f"Error in entry listener: {e}")
+
+    def save_entry(self, password_data):
+        """
+        Save a new password entry
+
+        Returns:
+            str: New entry ID, or None if it could not be stored
+        """
+        self._require_unlocked()
+
+        # Split listing metadata from secrets
+        metadata = {
+            key: value for key, value in password_data.items()
+            if key in METADATA_FIELDS
+        }
+        secret_data = {
+            key: value for key, value in password_data.items()
+            if key not in METADATA_FIELDS
+        }
+
+        # Encrypt both parts separately, bound to the new entry ID. The
+        # write lock keeps a key rotation from switching keys in between.
+        entry_id = database.new_entry_id()
+        with self.db_manager.write_lock:
+            encrypted_meta = self.auth_manager.encrypt_data(
+                metadata, entry_cipher.associated_data(entry_id, "meta")
+            )
+            encrypted_data = self.auth_manager.encrypt_data(
+                secret_data, entry_cipher.associated_data(entry_id, "data")
+            )
+
+            # Save to database
+            entry_id = self.db_manager.save_entry(encrypted_data, encrypted_meta, entry_id)
+        if not entry_id:
+            return None
+
+        cached = dict(metadata)
+        cached["id"] = entry_id
+
+        # Update cache with the new entry
+        entry = self.db_manager.get_entry(entry_id)
+        if entry and self.entry_cache.loaded:
+            with self._search_index_lock:
+                self.entry_cache.put(entry_id, entry["modified"], cached)
+                if not self._search_index_stale:
+                    self.search_index.add(cached)
+
+        self._notify_entry_changed(cache.ENTRY_ADDED, entry_id, cached)
+        return entry_id
+
+    def get_all_passwords(self):
+        """
+        Get listing metadata of all password entries
+
+        Secrets are not included; use get_password_secrets for those.
+        """
+        try:
+            if not self.is_authenticated:
+                return []
+
+            # Decrypt entries only on first load
+            if not self.entry_cache.loaded:
+                self._sync_entry_cache()
+
+            return self.entry_cache.values()
+
+        except Exception as e:
+            print(f"Error loading passwords: {e}")
+            return []
+
+    def _decrypt_metadata_many(self, entries):
+        """
+        Decrypt the listing metadata of a batch of database entries
+
+        Returns:
+            tuple: (metadata dicts, dict of index -> error message)
+        """
+        # Legacy entries keep everything in one payload
+        tokens = []
+        associated_data = []
+        for entry in entries:
+            field = "meta" if entry.get("meta") is not None else "data"
+            tokens.append(entry[field])
+            associated_data.append(entry_cipher.associated_data(entry["id"], field))
+
+        payloads, errors = self.auth_manager.decrypt_many(tokens, associated_data=associated_data)
+
+        decrypted = []
+        for entry, payload in zip(entries, payloads):
+            if payload is None:
+                decrypted.append(None)
+                continue
+
+            metadata = {
+                key: value for key, value in payload.items()
+                if key in METADATA_FIELDS
+            }
+            metadata["id"] = entry["id"]  # Add entry ID
+            decrypted.append(metadata)
+
+        return decrypted, errors
+
+    def get_password_secrets(self, entry_id):
+        """
+        Decrypt the secret payload of a single entry
+
+        Returns:
+            dict: Secret fields such as password and notes, or None
+        """
+        try:
+            if not self.is_authenticated:
+                return None
+
+            entry = self.db_manager.get_entry(entry_id)
+            if not entry:
+                return None
+
+            payload = self.auth_manager.decrypt_data(
+                entry["data"], entry_cipher.associated_data(entry_id, "data")
+            )
+            return {
+                key: value for key, value in payload.items()
+                if key not in METADATA_FIELDS
+            }
+
+        except Exception as e:
+            print(f"Error decrypting entry: {e}")
+            return None
+
+    def get_password(self, entry_id):
+        """
+        Get the password of a single entry
+        """
+        secrets = self.get_password_secrets(entry_id)
+        return secrets.get("password", "") if secrets else ""
+
+    def has_entry(self, entry_id):
+        """
+        Check whether an entry ID exists
+        """
+        if not self.is_authenticated:
+            return False
+
+        if not self.entry_cache.loaded:
+            self._sync_entry_cache()
+
+        return self.entry_cache.get(entry_id) is not None
+
+    def get_entry(self, entry_id):
+        """
+        Get metadata and secrets of a single entry
+
+        Returns:
+            dict: All entry fields including the ID, or None
+        """
+        if not self.is_authenticated:
+            return None
+
+        if not self.entry_cache.loaded:
+            self._sync_entry_cache()
+
+        metadata = self.entry_cache.get(entry_id)
+        secrets = self.get_password_secrets(entry_id)
+        if metadata is None or secrets is None:
+            return None
+
+        metadata.update(secrets)
+        return metadata
+
+    def _sync_entry_cache(self):
+        """
+        Sync decrypted entry cache with the database
+        """
+        encrypted_entries = self.db_manager.get_all_entries()
+        failed = self.entry_cache.sync(encrypted_entries, self._decrypt_metadata_many)
+
+        for entry_id, error in failed.items():
+            print(f"Skipping corrupted entry {entry_id}: {error}")
+
+        with self._search_index_lock:
+            self._search_index_stale = True
+
+    def build_search_index(self):
+        """
+        Build the search index if entries were reloaded since it was built
+
+        Searches do this on first use; the app calls it from a background
+        thread after unlocking so large vaults do not make the first
+        search wait.
+        """
+        self._require_unlocked()
+
+        if not self.entry_cache.loaded:
+            self._sync_entry_cache()
+
+        with self._search_index_lock:
+            if self._search_index_stale:
+                self.search_index.build(self.entry_cache.values())
+                self._search_index_stale = False
+
+    def delete_entry(self, entry_id):
+        """
+        Delete a password entry
+        """
+        self._require_unlocked()
+
+        if not self.db_manager.delete_entry(entry_id):
+            return False
+
+        with self._search_index_lock:
+            self.entry_cache.remove(entry_id)
+            self.search_index.remove(entry_id)
+        self._notify_entry_changed(cache.ENTRY_REMOVED, entry_id)
+        return True
+
+    def search(self, search_term, limit=None):
+        """
+        Search password entries
+        """
+        try:
+            if not self.is_authenticated:
+                return []
+
+            # Build the index on first use
+            self.build_search_index()
+
+            matching_entries = []
+            for entry_id in self.search_index.search(search_term, limit):
+                entry = self.entry_cache.get(entry_id)
+                if entry:
+                    matching_entries.append(entry)
+
+            return matching_entries
+
+        except Exception as e:
+            print(f"Search error: {e}")
+            return []
+
+    def generate_password(self, length=16, use_upper=True, use_lower=True,
+                         use_digits=True, use_special=True):
+        """
+        Generate a random password
+        """
+        return self.pass_generator.generate(
+            length=length,
+            use_upper=use_upper,
+            use_lower=use_lower,
+            use_digits=use_digits,
+            use_special=use_special
+        )
+
+    def estimate_strength(self, password, user_inputs=()):
+        """
+        Estimate password strength, see strength.estimate_strength
+        """
+        return self.pass_generator.estimate_strength(password, user_inputs)
+
+    def audit(self):
+        """
+        Audit all entries for reused, similar, weak and stale passwords
+
+        Only entries changed since the last audit are decrypted and
+        rescored, see audit.VaultAuditor.
+        """
+        self._require_unlocked()
+        entries = self.get_all_passwords()
+        return self.auditor.audit(entries, self.entry_cache.modified_times())
+
+    def check_breaches(self, corpus_file=None):
+        """
+        Look up every stored password in a local breached password corpus
+
+        Args:
+            corpus_file: Sorted hash file, see breach.py; breach.corpus_file
+                from the config if None
+
+        Returns:
+            dict: checked count, hash_type and breached entry summaries
+                with the times each password was seen, most seen first
+        """
+        import breach
+
+        self._require_unlocked()
+
+        corpus_file = corpus_file or self.config.get('breach', 'corpus_file')
+        if not corpus_file:
+            raise ValueError("No breached password corpus configured")
+        corpus = breach.open_corpus(corpus_file)
+
+        entries = self.get_all_passwords()
+        encrypted = [self.db_manager.get_entry(entry["id"]) for entry in entries]
+        present = [
+            (entry, stored) for entry, stored in zip(entries, encrypted) if stored
+        ]
+        payloads, errors = self.auth_manager.decrypt_many(
+            [stored["data"] for _, stored in present],
+            associated_data=[entry_cipher.associated_data(entry["id"], "data") for entry, _ in present]
+        )
+        for index, error in errors.items():
+            print(f"Skipping corrupted entry {present[index][0]['id']}: {error}")
+
+        # Hash here, so passwords never leave this process; reused
+        # passwords are looked up once
+        hashes = {}
+        for (entry, _), payload in zip(present, payloads):
+            if payload and payload.get("password"):
+                key = breach.hash_password(payload["password"], corpus.hash_type)
+                hashes.setdefault(key, []).append(entry)
+
+        keys = list(hashes)
+        breached = []
+        for key, count in zip(keys, breach.lookup_many(corpus.path, keys)):
+            if count:
+                for entry in hashes[key]:
+                    breached.append({
+                        "id": entry["id"],
+                        "website": entry.get("website", ""),
+                        "username": entry.get("username", ""),
+                        "count": count
+                    })
+
+        breached.sort(key=lambda item: item["count"], reverse=True)
+        return {
+            "checked": sum(len(group) for group in hashes.values()),
+            "hash_type": corpus.hash_type,
+            "breached": breached
+        }
+
+    def change_master_password(self, new_password, kdf_params=None):
+        """
+        Change master password
+
+        Only re-wraps the data key, entries are left untouched. The KDF is
+        recalibrated from the security settings unless kdf_params is given.
+        """
+        self._require_unlocked()
+        return self.auth_manager.change_master_password(new_password, kdf_params)
+
+    def rotate_encryption_key(self, progress=None):
+        """
+        Re-encrypt all entries under a new data key
+
+        Decrypted entries are unchanged, so the cache stays valid.
+
+        Args:
+            progress: Called with the number of entries re-encrypted so far
+        """
+        self._require_unlocked()
+        return self.rekey_job.start(progress)
+
+    def export_data(self, file_path):
+        """
+        Export encrypted data to file
+        """
+        return self.db_manager.export_data(file_path)
+
+    def import_data(self, file_path):
+        """
+        Import encrypted data from file
+
+        Raises:
+            ValueError: If the entries are not encrypted with the current
+                data key, e.g. the file was exported before a key rotation
+        """
+        self._require_unlocked()
+
+        if not os.path.exists(file_path):
+            return False
+
+        with self.db_manager.write_lock:
+            self._check_import_key(database.read_export(file_path))
+
+            if not self.db_manager.import_data(file_path):
+                return False
+
+        # Only new or changed entries get decrypted
+        self._sync_entry_cache()
+        return True
+
+    def _check_import_key(self, data):
+        """
+        Check that the first imported entries decrypt with the current key
+
+        Raises:
+            ValueError: If none of them do
+        """
+        sample = [
+            dict(entry_data, id=entry_id)
+            for entry_id, entry_data in islice(data.items(), IMPORT_KEY_CHECK_ENTRIES)
+        ]
+        if not sample:
+            return
+
+        decrypted, _ = self._decrypt_metadata_many(sample)
+        if not any(decrypted):
+            raise ValueError(
+                "The file is not encrypted with the current key. Exports made "
+                "before the encryption key was rotated cannot be imported; "
+                "export the vault again."
+            )
+
+    def lock(self):
+        """
+        Commit buffered writes and drop keys and decrypted data
+        """
+        self.db_manager.flush()
+        self.is_authenticated = False
+        with self._search_index_lock:
+            self.entry_cache.clear()
+            self.search_index.clear()
+            self._search_index_stale = True
+        self.auditor.clear()
+        self.auth_manager.logout()
+
+    def close(self):
+        """
+        Lock the vault and close the database
+        """
+        self.lock()
+        self.db_manager.close()
@@ -0,0 +1,224 @@
+"""
+Compact binary vault snapshot format read through mmap
+
+Layout:
+    header       magic, version, flags, entry count, generation
+    offset table entry count x uint64 record offsets, insertion order
+    id table     entry count x uint32 record numbers, sorted by entry ID
+    records      per record: field lengths followed by the raw fields
+
+All integers are little-endian. Pages are only read from disk when a
+record is, and records are copied out of the mapping as they are read:
+no buffer into it outlives close(), so the file can be replaced right
+after, which Windows refuses while a mapping is open.
+
+The generation is a random number given to each snapshot; the log of
+changes made since the snapshot names it (see storage.LogStore). Version 1
+files have no generation and read as generation 0.
+"""
+
+import mmap
+import os
+import struct
+
+VAULT_MAGIC = b"SPVT"
+VAULT_VERSION = 2
+
+HEADER = struct.Struct("<4sHHQ")
+# Follows the header from version 2
+GENERATION = struct.Struct("<Q")
+OFFSET = struct.Struct("<Q")
+ID_SLOT = struct.Struct("<I")
+
+# Lengths of id, created, modified, data and meta
+RECORD_HEADER = struct.Struct("<HHHII")
+
+# Meta length marking a missing metadata blob
+NO_META = 0xFFFFFFFF
+
+
+def write_vault(path, items, generation=0):
+    """
+    Write entries to a vault file
+
+    Args:
+        path: Destination file path
+        items: Iterable of (entry_id, entry dict) pairs in insertion order
+        generation: Snapshot generation stored in the header
+    """
+    records = []
+    for entry_id, entry_data in items:
+        entry_id_bytes = entry_id.encode('utf-8')
+        created = entry_data["created"].encode('utf-8')
+        modified = entry_data["modified"].encode('utf-8')
+        data = entry_data["data"]
+        meta = entry_data.get("meta")
+
+        header = RECORD_HEADER.pack(
+            len(entry_id_bytes), len(created), len(modified), len(data),
+            NO_META if meta is None else len(meta)
+        )
+        records.append((entry_id_bytes, header, created, modified, data, meta))
+
+    count = len(records)
+    id_order = sorted(range(count), key=lambda i: records[i][0])
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(VAULT_MAGIC, VAULT_VERSION, 0, count))
+        f.write(GENERATION.pack(generation))
+
+        # Offset table
+        offset = HEADER.size + GENERATION.size + count * (OFFSET.size + ID_SLOT.size)
+        for entry_id_bytes, header, created, modified, data, meta in records:
+            f.write(OFFSET.pack(offset))
+            offset += (
+                len(header) + len(entry_id_bytes) + len(created) + len(modified) +
+                len(data) + (len(meta) if meta is not None else 0)
+            )
+
+        # ID table
+        for record_number in id_order:
+            f.write(ID_SLOT.pack(record_number))
+
+        # Records
+        for entry_id_bytes, header, created, modified, data, meta in records:
+            f.write(header)
+            f.write(entry_id_bytes)
+            f.write(created)
+            f.write(modified)
+            f.write(data)
+            if meta is not None:
+                f.write(meta)
+
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class VaultReader:
+    def __init__(self, path):
+        """
+        Open a vault file
+
+        A missing or empty file is treated as an empty vault.
+        """
+        self.path = path
+        self.count = 0
+        self.generation = 0
+        self._file = None
+        self._mmap = None
+
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return
+
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != VAULT_MAGIC or version not in (1, VAULT_VERSION):
+            self.close()
+            raise ValueError("Invalid vault file")
+
+        self._offset_table = HEADER.size
+        if version >= 2:
+            self.generation = GENERATION.unpack_from(self._mmap, HEADER.size)[0]
+            self._offset_table += GENERATION.size
+
+        self.count = count
+        self._id_table = self._offset_table + count * OFFSET.size
+
+    def __len__(self):
+        return self.count
+
+    def _record_offset(self, record_number):
+        """Get the file offset of a record"""
+        return OFFSET.unpack_from(self._mmap, self._offset_table + record_number * OFFSET.size)[0]
+
+    def _id_bytes(self, record_number):
+        """Get the raw entry ID of a record"""
+        offset = self._record_offset(record_number)
+        id_len = RECORD_HEADER.unpack_from(self._mmap, offset)[0]
+        start = offset + RECORD_HEADER.size
+        return self._mmap[start:start + id_len]
+
+    def entry_at(self, record_number):
+        """
+        Materialize a record
+
+        Returns:
+            tuple: (entry_id, entry dict)
+        """
+        offset = self._record_offset(record_number)
+        id_len, created_len, modified_len, data_len, meta_len = \
+            RECORD_HEADER.unpack_from(self._mmap, offset)
+
+        position = offset + RECORD_HEADER.size
+        fields = []
+        for length in (id_len, created_len, modified_len, data_len):
+            fields.append(self._mmap[position:position + length])
+            position += length
+
+        entry_id, created, modified, data = fields
+        meta = None
+        if meta_len != NO_META:
+            meta = self._mmap[position:position + meta_len]
+
+        return str(entry_id, 'utf-8'), {
+            "data": data,
+            "meta": meta,
+            "created": str(created, 'utf-8'),
+            "modified": str(modified, 'utf-8')
+        }
+
+    def find(self, entry_id):
+        """
+        Binary search the ID table
+
+        Returns:
+            int: Record number, or None if the entry is not in the vault
+        """
+        if not self.count:
+            return None
+
+        target = entry_id.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            record_number = ID_SLOT.unpack_from(self._mmap, self._id_table + middle * ID_SLOT.size)[0]
+            candidate = self._id_bytes(record_number)
+            if candidate == target:
+                return record_number
+            if candidate < target:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def __contains__(self, entry_id):
+        return self.find(entry_id) is not None
+
+    def get(self, entry_id):
+        """
+        Get an entry dict by ID
+        """
+        record_number = self.find(entry_id)
+        if record_number is None:
+            return None
+        return self.entry_at(record_number)[1]
+
+    def items(self):
+        """
+        Iterate (entry_id, entry dict) pairs in insertion order
+        """
+        for record_number in range(self.count):
+            yield self.entry_at(record_number)
+
+    def close(self):
+        """
+        Close the mapping and the file
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,293 @@
+"""
+Virtualized password list widget
+"""
+
+import math
+import tkinter
+import customtkinter as ctk
+
+# Height of one row slot including spacing
+ROW_HEIGHT = 110
+ROW_SPACING = 10
+
+# Extra rows kept around the visible window
+BUFFER_ROWS = 2
+
+HIDDEN_PASSWORD = "🔒 ••••••••••"
+
+
+class PasswordRow(ctk.CTkFrame):
+    def __init__(self, master, list_view):
+        """
+        Initialize a reusable password row
+        """
+        super().__init__(master, corner_radius=10, height=ROW_HEIGHT - ROW_SPACING)
+        self.list_view = list_view
+        self.entry = None
+
+        # Keep a fixed height so rows can be positioned arithmetically
+        self.pack_propagate(False)
+
+        # Card content
+        content = ctk.CTkFrame(self, fg_color="transparent")
+        content.pack(fill="x", padx=20, pady=15)
+
+        # Left side - Info
+        info_frame = ctk.CTkFrame(content, fg_color="transparent")
+        info_frame.pack(side="left", fill="both", expand=True)
+
+        self.website_label = ctk.CTkLabel(
+            info_frame,
+            text="",
+            font=("Segoe UI", 18, "bold")
+        )
+        self.website_label.pack(anchor="w")
+
+        self.username_label = ctk.CTkLabel(
+            info_frame,
+            text="",
+            font=("Segoe UI", 14)
+        )
+        self.username_label.pack(anchor="w", pady=(5, 0))
+
+        self.password_label = ctk.CTkLabel(
+            info_frame,
+            text=HIDDEN_PASSWORD,
+            font=("Segoe UI", 14)
+        )
+        self.password_label.pack(anchor="w", pady=(5, 0))
+
+        # Right side - Buttons
+        btn_frame = ctk.CTkFrame(content, fg_color="transparent")
+        btn_frame.pack(side="right")
+
+        copy_btn = ctk.CTkButton(
+            btn_frame,
+            text="Copy",
+            width=80,
+            command=lambda: self.list_view.on_copy(self.entry)
+        )
+        copy_btn.grid(row=0, column=0, padx=5)
+
+        show_btn = ctk.CTkButton(
+            btn_frame,
+            text="Show",
+            width=80,
+            command=lambda: self.list_view.toggle_password(self.entry)
+        )
+        show_btn.grid(row=0, column=1, padx=5)
+
+        delete_btn = ctk.CTkButton(
+            btn_frame,
+            text="Delete",
+            width=80,
+            fg_color="red",
+            hover_color="darkred",
+            command=lambda: self.list_view.on_delete(self.entry.get('id', ''))
+        )
+        delete_btn.grid(row=0, column=2, padx=5)
+
+    def show(self, entry, password=None):
+        """
+        Bind the row to an entry
+
+        Args:
+            entry: Entry metadata
+            password: Revealed password, or None to keep it hidden
+        """
+        self.entry = entry
+        self.website_label.configure(text=entry.get('website', 'Unknown'))
+        self.username_label.configure(text=f"👤 {entry.get('username', '')}")
+
+        if password is not None:
+            self.password_label.configure(text=password)
+        else:
+            self.password_label.configure(text=HIDDEN_PASSWORD)
+
+
+class VirtualPasswordList(ctk.CTkFrame):
+    def __init__(self, master, on_copy, on_delete, get_password, **kwargs):
+        """
+        Initialize virtualized list
+
+        Only enough rows to fill the viewport plus BUFFER_ROWS are created;
+        they are rebound to different entries while scrolling.
+
+        Args:
+            master: Parent widget
+            on_copy: Called with the entry when Copy is clicked
+            on_delete: Called with the entry ID when Delete is clicked
+            get_password: Called with the entry ID when Show is clicked
+        """
+        super().__init__(master, fg_color="transparent", **kwargs)
+        self.on_copy = on_copy
+        self.on_delete = on_delete
+        self.get_password = get_password
+
+        self.entries = []
+        self.rows = []
+
+        # entry_id -> revealed password, only for rows the user un-hid
+        self.visible_passwords = {}
+        self.scroll_offset = 0
+        self.viewport_height = 1
+
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self.viewport.pack(side="left", fill="both", expand=True, padx=10)
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.viewport.bind("<Configure>", self._on_resize)
+        self._bind_mousewheel(self.viewport)
+
+    def set_entries(self, entries):
+        """
+        Replace the list contents
+        """
+        self.entries = entries
+        self.visible_passwords.clear()
+        self.scroll_offset = 0
+        self._render()
+
+    def _index_of(self, entry_id):
+        """Get the list position of an entry, or None"""
+        for index, entry in enumerate(self.entries):
+            if entry.get('id') == entry_id:
+                return index
+        return None
+
+    def insert_entry(self, entry, index=None):
+        """
+        Insert a single entry, at the end by default
+        """
+        if index is None:
+            index = len(self.entries)
+        self.entries.insert(index, entry)
+        self._render()
+
+    def update_entry(self, entry):
+        """
+        Replace a single entry in place
+
+        Returns:
+            bool: False if the entry is not in the list
+        """
+        index = self._index_of(entry.get('id'))
+        if index is None:
+            return False
+
+        self.entries[index] = entry
+        self._render()
+        return True
+
+    def remove_entry(self, entry_id):
+        """
+        Remove a single entry
+
+        Returns:
+            bool: False if the entry is not in the list
+        """
+        index = self._index_of(entry_id)
+        if index is None:
+            return False
+
+        del self.entries[index]
+        self.visible_passwords.pop(entry_id, None)
+        self._render()
+        return True
+
+    def toggle_password(self, entry):
+        """
+        Toggle password visibility for an entry
+        """
+        entry_id = entry.get('id', '')
+        if entry_id in self.visible_passwords:
+            del self.visible_passwords[entry_id]
+        else:
+            self.visible_passwords[entry_id] = self.get_password(entry_id)
+        self._render()
+
+    def _content_height(self):
+        """Get total height of all rows"""
+        return len(self.entries) * ROW_HEIGHT
+
+    def _max_offset(self):
+        """Get the largest valid scroll offset"""
+        return max(0, self._content_height() - self.viewport_height)
+
+    def _ensure_rows(self):
+        """Create enough rows to cover the viewport"""
+        needed = math.ceil(self.viewport_height / ROW_HEIGHT) + BUFFER_ROWS
+        while len(self.rows) < needed:
+            row = PasswordRow(self.viewport, self)
+            self._bind_mousewheel(row)
+            self.rows.append(row)
+
+    def _render(self):
+        """Bind rows to the entries in the visible window"""
+        self.scroll_offset = min(max(self.scroll_offset, 0), self._max_offset())
+        self._ensure_rows()
+
+        first_index = self.scroll_offset // ROW_HEIGHT
+        for slot, row in enumerate(self.rows):
+            index = first_index + slot
+            if index >= len(self.entries):
+                row.place_forget()
+                continue
+
+            entry = self.entries[index]
+            row.show(entry, self.visible_passwords.get(entry.get('id', '')))
+            row.place(x=0, y=index * ROW_HEIGHT - self.scroll_offset, relwidth=1.0)
+
+        # Update scrollbar position
+        total = self._content_height()
+        if total <= self.viewport_height:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(
+                self.scroll_offset / total,
+                (self.scroll_offset + self.viewport_height) / total
+            )
+
+    def _scroll_to(self, offset):
+        """Scroll to a pixel offset"""
+        offset = min(max(int(offset), 0), self._max_offset())
+        if offset != self.scroll_offset:
+            self.scroll_offset = offset
+            self._render()
+
+    def _on_scrollbar(self, action, value, unit=None):
+        """Handle scrollbar drag and clicks"""
+        if action == "moveto":
+            self._scroll_to(float(value) * self._content_height())
+        elif action == "scroll":
+            step = self.viewport_height if unit == "pages" else ROW_HEIGHT
+            direction = 1 if float(value) > 0 else -1
+            self._scroll_to(self.scroll_offset + direction * step)
+
+    def _on_resize(self, event):
+        """Handle viewport size changes"""
+        self.viewport_height = max(event.height, 1)
+        self._render()
+
+    def _on_mousewheel(self, event):
+        """Handle mouse wheel scrolling"""
+        if getattr(event, "num", None) == 4:
+            delta = -1
+        elif getattr(event, "num", None) == 5:
+            delta = 1
+        elif event.delta:
+            delta = -1 if event.delta > 0 else 1
+        else:
+            return
+        self._scroll_to(self.scroll_offset + delta * ROW_HEIGHT // 2)
+
+    def _bind_mousewheel(self, widget):
+        """Bind mouse wheel events on a widget and its children"""
+        # Bind on the raw tkinter widgets; CTk widgets forward bind() to
+        # an inner canvas which is also one of their children
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            tkinter.Misc.bind(widget, sequence, self._on_mousewheel, "+")
+        for child in widget.winfo_children():
+            self._bind_mousewheel(child)
@@ -0,0 +1,122 @@
+"""
+Passphrase word lists, stored compactly
+
+Lists live in dictionaries/<name>.txt. Lines are either EFF style, dice
+rolls then the word ("11111\\tabacus"), or a bare word; lines starting with
+"#" are comments. A list is kept as one string holding every word plus an
+array of word offsets, so loading a large list creates no per-word
+objects. Lists load on first use and stay cached for the process.
+"""
+
+import math
+import os
+import threading
+from array import array
+
+DICTIONARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dictionaries")
+
+# Five dice rolls per word, as in the EFF large list
+DEFAULT_WORDLIST = "diceware"
+
+_lock = threading.Lock()
+# name -> WordList
+_loaded = {}
+
+
+class WordList:
+    def __init__(self, name, text, offsets):
+        """
+        Initialize word list
+
+        Args:
+            name: List name
+            text: All words, concatenated
+            offsets: Start of each word in text, plus the end of the text
+        """
+        self.name = name
+        self._text = text
+        self._offsets = offsets
+
+    @classmethod
+    def from_words(cls, name, words):
+        """
+        Build from a sequence of words
+
+        Words are lowercased and duplicates dropped, so every index names a
+        different word and entropy_bits is exact.
+
+        Raises:
+            ValueError: If fewer than two distinct words are left
+        """
+        seen = set()
+        unique = []
+        for word in words:
+            word = word.strip().lower()
+            if word and word not in seen:
+                seen.add(word)
+                unique.append(word)
+
+        if len(unique) < 2:
+            raise ValueError(f"Word list {name} needs at least two distinct words")
+
+        offsets = array('I', [0])
+        for word in unique:
+            offsets.append(offsets[-1] + len(word))
+        return cls(name, "".join(unique), offsets)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        return self._text[self._offsets[index]:self._offsets[index + 1]]
+
+    @property
+    def entropy_bits(self):
+        """Entropy of one uniformly chosen word"""
+        return math.log2(len(self))
+
+
+def list_path(name):
+    """
+    Get the file of a packaged list, or name itself if it is a path
+    """
+    if os.sep in name or (os.altsep and os.altsep in name) or name.endswith(".txt"):
+        return name
+    return os.path.join(DICTIONARY_DIR, name + ".txt")
+
+
+def read_words(path):
+    """
+    Read the words of a list file
+
+    Returns:
+        list: Words in file order
+    """
+    words = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            # "11111\tword" or "11111 word" in EFF lists
+            fields = line.split()
+            words.append(fields[-1])
+    return words
+
+
+def load(name=DEFAULT_WORDLIST):
+    """
+    Get a word list, reading it on first use
+
+    Args:
+        name: Packaged list name or path to a list file
+
+    Raises:
+        IOError: If the list file cannot be read
+        ValueError: If it holds fewer than two distinct words
+    """
+    with _lock:
+        wordlist = _loaded.get(name)
+        if wordlist is None:
+            wordlist = _loaded[name] = WordList.from_words(name, read_words(list_path(name)))
+        return wordlist